@@ -0,0 +1,310 @@
+from qgis.core import QgsApplication, QgsFeatureRequest, QgsProviderRegistry
+from qgis.PyQt.QtCore import QVariant
+import os
+import sqlite3
+import time
+
+from .core.backends import SAMPLE_SIZE
+from .core.cache import MatchCache
+from .core.criteria import load_criteria
+from .core.engine import CBMS_GEOID_FIELD, CHECKED_FIELDS, FAC_NAME_FIELD, SECTOR_FIELD, gpkg_row_count, iter_errors
+from .core.fts import FtsIndex
+from .core.metrics import (
+    ERROR_FEATURES, FEATURES, GEOMETRY_FETCH, INDEX_SYNC, ITERATION, MATCHING, WRITING, RunMetrics)
+from .core.parallel import parallel_iter_errors, parallel_iter_gpkg_errors
+from .core.pushdown import candidate_filter
+from .error_layer import ERROR_BATCH_SIZE, error_feature
+
+# Criteria shipped with the plugin
+DEFAULT_CRITERIA_PATH = os.path.join(os.path.dirname(__file__), "validation_criteria.json")
+
+# How often (in features) progress is reported and cancellation checked
+REPORT_INTERVAL = 2000
+
+# Providers filtering candidate errors on the database server. On local
+# files (GeoPackage), evaluating the filter costs about as much as matching
+# every name in Python, see scripts/benchmark.py.
+PUSHDOWN_PROVIDERS = ('postgres',)
+
+
+def load_plugin_criteria(path=None):
+    """Load compiled criteria, cached in the QGIS settings directory.
+
+    The compiled criteria are reused until the file changes, also across
+    QGIS sessions.
+
+    :param path: Criteria JSON file, defaults to the one shipped with the plugin.
+    """
+    cache_dir = os.path.join(QgsApplication.qgisSettingsDirPath(), "error_list_checker")
+    return load_criteria(path or DEFAULT_CRITERIA_PATH, cache_dir)
+
+
+def gpkg_source(layer):
+    """Return ``(path, table)`` if ``layer`` is a plain GeoPackage table, else None.
+
+    Such layers can be read directly by worker processes with sqlite3.
+    Layers with unsaved edits are left out: the file does not hold those
+    edits yet.
+    """
+    if layer is None or layer.providerType() != 'ogr' or layer.subsetString() or layer.isModified():
+        return None
+    parts = QgsProviderRegistry.instance().decodeUri('ogr', layer.source())
+    path = parts.get('path') or ''
+    if not path.lower().endswith('.gpkg') or not os.path.isfile(path):
+        return None
+    return path, parts.get('layerName') or None
+
+
+def pushdown_filter(layer, criteria):
+    """Return an expression selecting the candidate errors of a database layer.
+
+    QGIS compiles it to SQL run by the provider, so only candidate rows are
+    transferred. Returns None for other layers or when the criteria cannot
+    be expressed.
+    """
+    if layer is None or layer.providerType() not in PUSHDOWN_PROVIDERS:
+        return None
+    return candidate_filter(criteria, 'qgis', FAC_NAME_FIELD, SECTOR_FIELD)
+
+
+def full_text_index(layer):
+    """Return the full-text index of a plain GeoPackage layer, else None.
+
+    See gpkg_source() for the layers left out.
+    """
+    gpkg = gpkg_source(layer)
+    if gpkg is None:
+        return None
+    return FtsIndex(*gpkg)
+
+
+def fingerprint_store_path():
+    """Return the default fingerprint store, in the QGIS settings directory."""
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), "error_list_checker", "fingerprints.sqlite")
+
+
+def plain_value(value):
+    """Convert a NULL attribute to None so records can be sent to other processes."""
+    return None if isinstance(value, QVariant) else value
+
+
+def sample_names(source, fields, size=SAMPLE_SIZE):
+    """Return the facility names of the first ``size`` features of a source.
+
+    Used to pick the fastest matcher backend for the data at hand.
+    """
+    if fields.indexOf(FAC_NAME_FIELD) < 0:
+        return []
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setSubsetOfAttributes([FAC_NAME_FIELD], fields)
+    request.setLimit(size)
+    return [plain_value(feature[FAC_NAME_FIELD]) for feature in source.getFeatures(request)]
+
+
+class ErrorCheckEngine:
+    """Scans a feature source against the criteria and writes out the errors.
+
+    This is the QGIS side of core/engine.py, shared by the dialog's background
+    task and the Processing algorithm. It reads ``source`` twice: once for the
+    checked attributes only, then by fid for the geometry of each batch of
+    errors, which is handed to ``writer`` (see error_layer.py). The time
+    spent in each of these stages is kept in ``metrics`` (core/metrics.py).
+    """
+
+    def __init__(self, source, fields, criteria, writer, match_cache=None, workers=1, gpkg=None,
+                 source_name=None, fingerprints=None, backend=None, pushdown=None, feature_count=None,
+                 fts_index=None):
+        """Constructor.
+
+        :param source: Feature source to check, e.g. a
+            QgsVectorLayerFeatureSource or a QgsProcessingFeatureSource.
+        :param fields: Fields of ``source``.
+        :param criteria: Compiled validation criteria.
+        :param writer: Error list writer receiving the error features.
+        :param match_cache: Match memoization shared across runs, if any.
+        :param workers: Number of processes matching in parallel (1 = in process).
+        :param gpkg: ``(path, table)`` from gpkg_source() when the source is a
+            plain GeoPackage table, so parallel workers can read it themselves.
+        :param source_name: Name stored in the source_layer field of the errors.
+        :param fingerprints: core.fingerprint.FingerprintSession of this source, to
+            reuse the verdicts of features unchanged since the last run (in
+            process runs only).
+        :param backend: core.backends.MatcherBackend matching in process, if
+            not the criteria's own matcher.
+        :param pushdown: Expression from pushdown_filter() restricting the
+            scan to candidate errors. Ignored with ``fingerprints``, which
+            need to see every feature.
+        :param feature_count: Number of features of ``source``, reported as
+            processed when only candidates were read.
+        :param fts_index: core.fts.FtsIndex of the GeoPackage table behind
+            ``source``, to read only candidate errors found through it.
+            Ignored with ``fingerprints``; if the index cannot be used, the
+            source is scanned as usual.
+
+        :raises ValueError: ``fields`` lacks one of the checked fields.
+        """
+        missing = [name for name in CHECKED_FIELDS if fields.indexOf(name) < 0]
+        if missing:
+            raise ValueError(f"{source_name or 'Layer'} is missing the field(s): {', '.join(missing)}")
+
+        self.source = source
+        self.fields = fields
+        self.criteria = criteria
+        self.writer = writer
+        self.match_cache = match_cache or MatchCache()
+        self.match_cache.bind(criteria, backend)
+        self.workers = max(1, workers)
+        self.gpkg = gpkg
+        self.source_name = source_name
+        self.fingerprints = fingerprints
+        self.pushdown = None if fingerprints else pushdown
+        self.fts_index = None if fingerprints else fts_index
+        self.feature_count = feature_count
+
+        self.pending = []  # core.engine.ErrorRow
+        self.error_count = 0
+        self.processed = 0
+        self.elapsed = 0.0
+        self.metrics = RunMetrics()
+
+    def run(self, is_canceled=lambda: False, on_progress=None):
+        """Check every feature of the source.
+
+        :param is_canceled: Callable returning True when the run must stop.
+        :param on_progress: Optional callable receiving ``(processed, elapsed)``
+            every REPORT_INTERVAL features and once at the end.
+
+        The caller finishes the writer, which may be shared by several engines.
+
+        :returns: False if the run was canceled.
+        :rtype: bool
+        """
+        self.is_canceled = is_canceled
+        return self.scan(on_progress)
+
+    def scan(self, on_progress):
+        """Match every feature, reading only the checked attributes."""
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes(CHECKED_FIELDS, self.fields)
+        if self.pushdown:
+            request.setFilterExpression(self.pushdown)
+
+        # The clock includes the index sync, one of the stages subtracted
+        # from the elapsed time to get the matching time below
+        start = time.perf_counter()
+        if self.fts_index:
+            try:
+                with self.metrics.stage(INDEX_SYNC):
+                    self.fts_index.sync()
+            except (sqlite3.Error, OSError) as e:
+                self.metrics.info['index_error'] = str(e)
+                self.fts_index = None
+
+        self.canceled = False
+
+        def checked(rows):
+            """Add ``rows`` to the processed count, reporting progress and stopping when canceled.
+
+            :returns: True if the run was canceled.
+            """
+            previous = self.processed
+            self.processed += rows
+            if self.processed // REPORT_INTERVAL == previous // REPORT_INTERVAL:
+                return False
+            if self.is_canceled():
+                self.canceled = True
+                return True
+            if on_progress:
+                on_progress(self.processed, time.perf_counter() - start)
+            return False
+
+        def counted(rows):
+            for row in rows:
+                yield row
+                if checked(1):
+                    return
+
+        def records():
+            return counted(
+                (feature.id(), plain_value(feature[CBMS_GEOID_FIELD]),
+                 plain_value(feature[FAC_NAME_FIELD]), plain_value(feature[SECTOR_FIELD]))
+                for feature in self.metrics.timed(self.source.getFeatures(request), ITERATION))
+
+        if self.pushdown:
+            # Only candidates come back, few enough to match in process
+            errors = iter_errors(records(), self.match_cache.match)
+        elif self.fts_index:
+            # The index finds the candidates, read straight from the GeoPackage
+            errors = iter_errors(
+                counted(self.metrics.timed(self.fts_index.iter_candidates(self.criteria), ITERATION)),
+                self.match_cache.match)
+        elif self.workers > 1 and self.gpkg:
+            # Workers read and match their own fid ranges of the GeoPackage
+            errors = parallel_iter_gpkg_errors(
+                self.gpkg[0], self.criteria, self.gpkg[1], self.workers, on_partition=checked)
+        elif self.workers > 1:
+            errors = parallel_iter_errors(records(), self.criteria, self.workers)
+        elif self.fingerprints:
+            errors = self.fingerprints.iter_errors(records(), self.match_cache.match)
+        else:
+            errors = iter_errors(records(), self.match_cache.match)
+
+        for error in errors:
+            self.pending.append(error)
+            if len(self.pending) >= ERROR_BATCH_SIZE:
+                if self.is_canceled() or not self.flush():
+                    errors.close()
+                    return False
+        if self.canceled:
+            return False
+        if self.fingerprints and self.workers == 1:
+            self.fingerprints.commit()
+        # Only candidates were counted along the way
+        if self.pushdown:
+            self.metrics.count('candidates', self.processed)
+            if self.feature_count is not None:
+                self.processed = self.feature_count
+        elif self.fts_index:
+            self.metrics.count('candidates', self.processed)
+            self.processed = gpkg_row_count(self.fts_index.path, self.fts_index.table)
+
+        if not self.flush():
+            return False
+        self.elapsed = time.perf_counter() - start
+        # Whatever was not spent reading or writing went into matching
+        # (in worker processes, reading is part of it too)
+        self.metrics.add(MATCHING, max(0.0, self.elapsed - sum(self.metrics.stages.values())))
+        self.metrics.count(FEATURES, self.processed)
+        self.metrics.count('errors', self.error_count)
+        if on_progress:
+            on_progress(self.processed, self.elapsed)
+        return True
+
+    def flush(self):
+        """Fetch geometry by fid for the pending errors and write them out."""
+        if not self.pending:
+            return True
+        centroids = {}
+        request = QgsFeatureRequest()
+        request.setFilterFids([error.fid for error in self.pending])
+        request.setSubsetOfAttributes([])
+        with self.metrics.stage(GEOMETRY_FETCH):
+            for feature in self.source.getFeatures(request):
+                if self.is_canceled():
+                    return False
+                if feature.hasGeometry():
+                    centroids[feature.id()] = feature.geometry().centroid()
+
+        fields = self.writer.fields
+        with self.metrics.stage(ERROR_FEATURES):
+            batch = [
+                error_feature(fields, error, self.source_name, centroids.get(error.fid))
+                for error in self.pending
+            ]
+        with self.metrics.stage(WRITING):
+            self.writer.add_features(batch)
+        self.error_count += len(batch)
+        self.pending = []
+        return True
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""QGIS-independent building blocks of the Error List Checker.
+
+The names below are imported from their modules on first use, so loading
+the plugin (or one module of this package) does not load them all.
+"""
+
+from importlib import import_module
+
+# Public name -> module defining it
+_EXPORTS = {
+    'CompiledCriteria': 'criteria',
+    'ErrorListDiff': 'diff',
+    'ErrorRow': 'engine',
+    'FingerprintStore': 'fingerprint',
+    'FtsIndex': 'fts',
+    'KeywordMatcher': 'matcher',
+    'MatchCache': 'cache',
+    'MatcherBackend': 'backends',
+    'NameIndex': 'delta',
+    'RunMetrics': 'metrics',
+    'build_remark': 'engine',
+    'changed_keywords': 'delta',
+    'check_gpkg': 'engine',
+    'check_gpkg_indexed': 'fts',
+    'check_rows': 'engine',
+    'choose_backend': 'backends',
+    'clear_cache': 'criteria',
+    'iter_errors': 'engine',
+    'keyed_diff': 'diff',
+    'layer_key': 'fingerprint',
+    'load_criteria': 'criteria',
+    'normalize_name': 'matcher',
+    'parallel_check_gpkg': 'parallel',
+    'parallel_iter_errors': 'parallel',
+    'parallel_iter_gpkg_errors': 'parallel',
+    'select_backend': 'backends',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(import_module('.' + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
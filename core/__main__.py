@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Command line error check of a GeoPackage, without QGIS.
+
+Usage::
+
+    python -m error_list_checker.core layer_SF.gpkg [--table NAME]
+        [--criteria validation_criteria.json] [--output errors.csv] [--pushdown | --fts]
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+from .criteria import load_criteria
+from .engine import check_gpkg
+from .fts import check_gpkg_indexed
+
+DEFAULT_CRITERIA = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'validation_criteria.json')
+
+
+def main(argv=None):
+    """Run the check and write the errors as CSV."""
+    parser = argparse.ArgumentParser(
+        prog='error_list_checker.core',
+        description='Check the sectors of a GeoPackage _SF layer.')
+    parser.add_argument('gpkg', help='GeoPackage to check')
+    parser.add_argument('--table', help='feature table (default: the only one)')
+    parser.add_argument('--criteria', default=DEFAULT_CRITERIA,
+                        help='validation criteria JSON file')
+    parser.add_argument('--output', help='CSV file to write (default: stdout)')
+    parser.add_argument('--pushdown', action='store_true',
+                        help='let SQLite select the candidate rows first')
+    parser.add_argument('--fts', action='store_true',
+                        help='find the candidate rows through a full-text '
+                             'index kept next to the GeoPackage')
+    arguments = parser.parse_args(argv)
+
+    criteria = load_criteria(arguments.criteria)
+    if arguments.fts:
+        errors = check_gpkg_indexed(arguments.gpkg, criteria, arguments.table)
+    else:
+        errors = check_gpkg(arguments.gpkg, criteria, arguments.table,
+                            pushdown=arguments.pushdown)
+
+    output = open(arguments.output, 'w', newline='', encoding='utf-8') \
+        if arguments.output else sys.stdout
+    try:
+        writer = csv.writer(output)
+        writer.writerow(['fid', 'cbms_geoid', 'recommended_sector', 'remark'])
+        writer.writerows(errors)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print('Errors detected: %d' % len(errors), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
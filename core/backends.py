@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Interchangeable implementations of the keyword matching step.
+
+Every backend gives exactly the same ``(sector, keyword)`` as
+:meth:`CompiledCriteria.match_normalized`; they only differ in speed, which
+depends on the number of keywords and on the names being checked. Rather
+than guessing, :func:`select_backend` times each backend on a sample of the
+actual names and picks the fastest one that agrees with the reference.
+"""
+
+import re
+import time
+
+from .criteria import TOKEN
+from .matcher import normalize_name
+from .tokens import tokenize
+
+DEFAULT_BACKEND = 'aho-corasick'
+# Backend setting that picks the fastest backend with select_backend
+AUTO = 'auto'
+# Names timed by select_backend, and how often
+SAMPLE_SIZE = 2000
+BENCHMARK_REPEAT = 3
+
+
+def _contains_phrase(tokens, phrase):
+    """Return True if ``phrase`` occurs as consecutive items of ``tokens``."""
+    size = len(phrase)
+    first = phrase[0]
+    return any(
+        token == first and tuple(tokens[position:position + size]) == phrase
+        for position, token in enumerate(tokens))
+
+
+class MatcherBackend:
+    """Base class of the matching backends.
+
+    :cvar name: Name of the backend in settings and run metrics.
+    """
+
+    name = None
+
+    def __init__(self, criteria):
+        """Constructor.
+
+        :param criteria: Compiled criteria to match with.
+        :type criteria: CompiledCriteria
+        """
+        self.criteria = criteria
+
+    @classmethod
+    def supports(cls, criteria):
+        """Return True if the backend can match with ``criteria``."""
+        return True
+
+    def match_normalized(self, name):
+        """Return ``(sector, keyword)`` for an already normalized name, or None."""
+        raise NotImplementedError
+
+    def match(self, value):
+        """Return ``(sector, keyword)`` for a facility name, or None."""
+        return self.match_normalized(normalize_name(value))
+
+
+class AhoCorasickBackend(MatcherBackend):
+    """The compiled criteria's own automaton (plus token index if needed)."""
+
+    name = 'aho-corasick'
+
+    def __init__(self, criteria):
+        super().__init__(criteria)
+        self.match_normalized = criteria.match_normalized
+
+
+class NaiveBackend(MatcherBackend):
+    """Tests every keyword in priority order; fine for few keywords."""
+
+    name = 'naive'
+
+    def __init__(self, criteria):
+        super().__init__(criteria)
+        # (keyword, phrase tokens or None for substring keywords, result)
+        self._patterns = [
+            (normalize_name(keyword), tuple(tokenize(normalize_name(keyword))) if mode == TOKEN else None,
+             (sector, keyword))
+            for (sector, keyword), mode in zip(criteria.patterns, criteria.modes)]
+
+    def match_normalized(self, name):
+        tokens = None
+        for keyword, phrase, result in self._patterns:
+            if phrase is None:
+                if keyword in name:
+                    return result
+            elif phrase:
+                if tokens is None:
+                    tokens = tokenize(name)
+                if _contains_phrase(tokens, phrase):
+                    return result
+        return None
+
+
+class RegexBackend(MatcherBackend):
+    """One compiled alternation per category, then its keywords in order."""
+
+    name = 'regex'
+
+    def __init__(self, criteria):
+        super().__init__(criteria)
+        self._categories = []
+        category = None
+        for (sector, keyword), mode in zip(criteria.patterns, criteria.modes):
+            normalized = normalize_name(keyword)
+            if mode == TOKEN:
+                phrase = tokenize(normalized)
+                if not phrase:
+                    continue
+                pattern = r'(?<!\w)%s(?!\w)' % r'\W+'.join(re.escape(token) for token in phrase)
+            else:
+                pattern = re.escape(normalized)
+            if category is None or category[0] != sector:
+                category = (sector, [])
+                self._categories.append(category)
+            category[1].append((pattern, (sector, keyword)))
+        self._categories = [
+            (re.compile('|'.join(pattern for pattern, _ in keywords)),
+             [(re.compile(pattern), result) for pattern, result in keywords])
+            for _, keywords in self._categories]
+
+    def match_normalized(self, name):
+        for category, keywords in self._categories:
+            if category.search(name):
+                for keyword, result in keywords:
+                    if keyword.search(name):
+                        return result
+        return None
+
+
+class TokenIndexBackend(MatcherBackend):
+    """Only the token index; for criteria whose keywords are all whole-word."""
+
+    name = 'token-index'
+
+    @classmethod
+    def supports(cls, criteria):
+        return all(mode == TOKEN for mode in criteria.modes)
+
+    def __init__(self, criteria):
+        super().__init__(criteria)
+        self._match_priority = criteria.token_matcher.match_priority
+        self._patterns = criteria.patterns
+
+    def match_normalized(self, name):
+        priority = self._match_priority(name)
+        return None if priority is None else self._patterns[priority]
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (AhoCorasickBackend, RegexBackend, NaiveBackend, TokenIndexBackend)
+}
+
+
+def create_backend(name, criteria):
+    """Return the backend called ``name`` for ``criteria``.
+
+    :raises ValueError: The backend is unknown or does not support ``criteria``.
+    """
+    backend = BACKENDS.get(name)
+    if backend is None:
+        raise ValueError('Unknown matcher backend: %s' % name)
+    if not backend.supports(criteria):
+        raise ValueError('The %s matcher backend does not support these criteria' % name)
+    return backend(criteria)
+
+
+def select_backend(criteria, names, repeat=BENCHMARK_REPEAT):
+    """Return the fastest backend giving the reference results on ``names``.
+
+    :param criteria: Compiled criteria.
+    :type criteria: CompiledCriteria
+
+    :param names: Sample of facility name values of the data to check.
+    :type names: iterable
+
+    :param repeat: Timing runs per backend; the best one is kept.
+    :type repeat: int
+
+    :returns: ``(backend, timings)`` with the seconds each agreeing backend
+        took to match the sample once.
+    :rtype: tuple
+    """
+    names = [normalize_name(name) for name in names]
+    if not names:
+        return create_backend(DEFAULT_BACKEND, criteria), {}
+    reference = [criteria.match_normalized(name) for name in names]
+    backends = {}
+    timings = {}
+    for name, backend_class in BACKENDS.items():
+        if not backend_class.supports(criteria):
+            continue
+        backend = backend_class(criteria)
+        match = backend.match_normalized
+        if [match(value) for value in names] != reference:
+            continue
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for value in names:
+                match(value)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        backends[name] = backend
+        timings[name] = best
+    return backends[min(timings, key=timings.get)], timings
+
+
+def choose_backend(name, criteria, names=()):
+    """Return ``(backend, timings)`` for a backend setting.
+
+    :param name: A key of :data:`BACKENDS`, or :data:`AUTO` to benchmark the
+        backends on ``names``.
+    :raises ValueError: See :func:`create_backend`.
+    """
+    if name == AUTO:
+        return select_backend(criteria, names)
+    return create_backend(name, criteria), {}
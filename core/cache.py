@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Memoization of match results per distinct facility name.
+
+Facility names repeat heavily within a layer ("Barangay Health Center",
+"Elementary School", ...), so the result of matching a normalized name is
+kept in a bounded LRU cache. The cache belongs to one criteria version and
+is dropped as soon as different criteria are bound to it.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+from .matcher import normalize_name
+
+DEFAULT_MAXSIZE = 100000
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses currsize maxsize')
+
+
+class MatchCache:
+    """Bounded LRU of normalized name -> ``(sector, keyword)`` or None."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        """Constructor.
+
+        :param maxsize: Maximum number of distinct names kept.
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self.version = None
+        self.backend = None
+        self._match = None
+        self._match_normalized = None
+
+    def bind(self, criteria, backend=None):
+        """Use ``criteria`` for matching, clearing results of other versions.
+
+        :param criteria: Compiled criteria.
+        :type criteria: CompiledCriteria
+
+        :param backend: Matcher backend (see core/backends.py) computing the
+            results not cached yet. None keeps the bound backend, or the
+            criteria's own matcher for a new version.
+        :type backend: MatcherBackend
+        """
+        if self._match is None or criteria.version != self.version:
+            self.version = criteria.version
+            self.backend = None
+            self._match_normalized = criteria.match_normalized
+            self._match = lru_cache(maxsize=self.maxsize)(self._lookup)
+        if backend is not None and backend is not self.backend:
+            # Every backend gives the same results, so cached ones stay valid
+            self.backend = backend
+            self._match_normalized = backend.match_normalized
+
+    def _lookup(self, name):
+        return self._match_normalized(name)
+
+    def match(self, value):
+        """Return ``(sector, keyword)`` for a facility name, or None.
+
+        :param value: Facility name attribute value.
+        :type value: object
+        """
+        return self._match(normalize_name(value))
+
+    def info(self):
+        """Return cumulative hit and miss counters since the last bind.
+
+        :rtype: CacheInfo
+        """
+        if self._match is None:
+            return CacheInfo(0, 0, 0, self.maxsize)
+        info = self._match.cache_info()
+        return CacheInfo(info.hits, info.misses, info.currsize, info.maxsize)
+
+    def clear(self):
+        """Drop every memoized result and reset the counters."""
+        if self._match is not None:
+            self._match.cache_clear()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Loading and caching of the compiled validation criteria.
+
+Keywords match anywhere in a facility name by default. A category with
+``"match": "token"``, or a keyword given as ``{"keyword": "park", "match":
+"token"}``, only matches whole words instead (see core/tokens.py).
+
+Compiling ``validation_criteria.json`` into a :class:`CompiledCriteria` is
+done once per distinct file content. The result is kept in memory for the
+life of the process and pickled to an optional cache directory so that new
+QGIS sessions can skip the compilation as well.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+from .matcher import KeywordMatcher, _better, normalize_name
+from .tokens import TokenMatcher, tokenize
+
+# Bump when the pickled layout of CompiledCriteria changes.
+CACHE_FORMAT = 2
+
+# Match modes of a keyword
+SUBSTRING = 'substring'
+TOKEN = 'token'
+MATCH_MODES = (SUBSTRING, TOKEN)
+
+# Absolute criteria path -> (mtime_ns, CompiledCriteria)
+_COMPILED = {}
+
+
+def category_keywords(category):
+    """Return ``(keyword, mode)`` for the keywords of a category, in order.
+
+    :param category: One entry of the criteria ``categories`` list.
+    :type category: dict
+
+    :raises KeyError: The category or a keyword object lacks ``keywords`` or
+        ``keyword``.
+    :raises ValueError: A ``match`` mode is unknown.
+    """
+    category_mode = category.get('match', SUBSTRING)
+    keywords = []
+    for entry in category['keywords']:
+        if isinstance(entry, dict):
+            keyword, mode = entry['keyword'], entry.get('match', category_mode)
+        else:
+            keyword, mode = entry, category_mode
+        if mode not in MATCH_MODES:
+            raise ValueError('Unknown match mode %r for keyword %r' % (mode, keyword))
+        keywords.append((keyword, mode))
+    return keywords
+
+
+def keyword_terms(keyword, mode):
+    """Return the texts a normalized name contains whenever ``keyword`` matches.
+
+    A substring keyword is its own only term. A whole-word keyword needs each
+    of its tokens, in whatever way they are separated in the name ("health
+    center" also matches "Health-Center"), so its terms are its tokens; it
+    has none, and never matches, without any word character.
+
+    :param keyword: Keyword as written in the criteria.
+    :type keyword: str
+
+    :param mode: One of :data:`MATCH_MODES`.
+    :type mode: str
+
+    :rtype: list
+    """
+    keyword = normalize_name(keyword)
+    if mode == TOKEN:
+        return tokenize(keyword)
+    return [keyword]
+
+
+class CompiledCriteria:
+    """Validation criteria prepared for matching.
+
+    :ivar version: SHA-1 of the criteria file content, used to key any cache
+        derived from these criteria.
+    :ivar categories: ``(sector, keywords)`` pairs in file order, with the
+        keywords normalized.
+    :ivar sector_index: Sector name -> position of its category.
+    :ivar patterns: ``(sector, keyword)`` of every keyword in priority order.
+    :ivar modes: Match mode of each entry of :attr:`patterns`.
+    :ivar matcher: Automaton over the substring keywords.
+    :ivar token_matcher: Index of the whole-word keywords.
+    """
+
+    def __init__(self, validation_criteria, version=None):
+        """Compile parsed criteria.
+
+        :param validation_criteria: Parsed criteria with a ``categories`` list.
+        :type validation_criteria: dict
+
+        :param version: Content hash of the source file, if known.
+        :type version: str
+        """
+        if version is None:
+            version = hashlib.sha1(json.dumps(
+                validation_criteria, sort_keys=True).encode('utf-8')
+            ).hexdigest()
+        self.version = version
+        self.categories = []
+        self.sector_index = {}
+        self.patterns = []
+        self.modes = []
+        for category in validation_criteria['categories']:
+            sector = category['sector']
+            keywords = category_keywords(category)
+            self.sector_index.setdefault(sector, len(self.categories))
+            self.categories.append((
+                sector, [normalize_name(keyword) for keyword, _ in keywords]))
+            for keyword, mode in keywords:
+                self.patterns.append((sector, keyword))
+                self.modes.append(mode)
+
+        # Priorities of the automaton are positions among the substring
+        # keywords; map them back to positions in self.patterns
+        self._substring_priorities = [
+            priority for priority, mode in enumerate(self.modes) if mode == SUBSTRING]
+        self.matcher = KeywordMatcher(
+            (self.patterns[priority][1], self.patterns[priority][0])
+            for priority in self._substring_priorities)
+        self.token_matcher = TokenMatcher(
+            (keyword, priority) for priority, ((_, keyword), mode)
+            in enumerate(zip(self.patterns, self.modes)) if mode == TOKEN)
+
+    @property
+    def sectors(self):
+        """Sectors in category order."""
+        return [sector for sector, _ in self.categories]
+
+    def match(self, value):
+        """Return ``(sector, keyword)`` for a facility name, or None.
+
+        :param value: Facility name attribute value.
+        :type value: object
+        """
+        return self.match_normalized(normalize_name(value))
+
+    def match_normalized(self, name):
+        """Return ``(sector, keyword)`` for an already normalized name.
+
+        :param name: Name as returned by :func:`normalize_name`.
+        :type name: str
+        """
+        priority = self.matcher.match_priority(name)
+        if priority is not None:
+            priority = self._substring_priorities[priority]
+        if self.token_matcher:
+            priority = _better(priority, self.token_matcher.match_priority(name, priority))
+        if priority is None:
+            return None
+        return self.patterns[priority]
+
+
+def _cache_file(path, cache_dir):
+    """Return the pickle path used to cache the criteria at ``path``."""
+    key = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, 'criteria-%s.pickle' % key)
+
+
+def _read_disk_cache(cache_path, version):
+    """Return the cached criteria for ``version``, or None."""
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            cached = pickle.load(cache_file)
+    except (OSError, pickle.PickleError, EOFError, AttributeError,
+            ImportError, ValueError):
+        return None
+    if (isinstance(cached, dict) and cached.get('format') == CACHE_FORMAT
+            and cached.get('version') == version):
+        return cached.get('criteria')
+    return None
+
+
+def _write_disk_cache(cache_path, criteria):
+    """Best-effort write of ``criteria`` to ``cache_path``."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = cache_path + '.tmp'
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump({
+                'format': CACHE_FORMAT,
+                'version': criteria.version,
+                'criteria': criteria,
+            }, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, cache_path)
+    except (OSError, pickle.PickleError):
+        # The on-disk cache is only an optimization
+        pass
+
+
+def load_criteria(path, cache_dir=None):
+    """Return the compiled criteria for the JSON file at ``path``.
+
+    The in-memory copy is reused while the file's mtime is unchanged. When
+    the mtime moves, the content hash decides whether a recompilation is
+    needed, first looking in ``cache_dir`` for a copy compiled by an earlier
+    session.
+
+    :param path: Path to ``validation_criteria.json``.
+    :type path: str
+
+    :param cache_dir: Directory for the on-disk cache, or None to disable it.
+    :type cache_dir: str
+
+    :returns: The compiled criteria.
+    :rtype: CompiledCriteria
+
+    :raises OSError: The file cannot be read.
+    :raises ValueError: The file is not valid JSON.
+    :raises KeyError: The file has no ``categories``, ``keywords`` or
+        ``sector`` entries.
+    :raises ValueError: A ``match`` mode is unknown.
+    """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _COMPILED.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'rb') as json_file:
+        content = json_file.read()
+    version = hashlib.sha1(content).hexdigest()
+
+    if cached and cached[1].version == version:
+        criteria = cached[1]
+    else:
+        cache_path = _cache_file(path, cache_dir) if cache_dir else None
+        criteria = cache_path and _read_disk_cache(cache_path, version)
+        if not criteria:
+            criteria = CompiledCriteria(
+                json.loads(content.decode('utf-8')), version)
+            if cache_path:
+                _write_disk_cache(cache_path, criteria)
+
+    _COMPILED[path] = (mtime, criteria)
+    return criteria
+
+
+def clear_cache():
+    """Forget every criteria compiled in this process."""
+    _COMPILED.clear()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""Re-evaluation of only the features affected by a criteria edit.
+
+When keywords are added, removed or moved between sectors, only names that
+contain one of those keywords can get a different verdict. This module
+finds those keywords by diffing two compiled criteria, and finds the
+features whose names contain them through an n-gram index over the names.
+Whole-word keywords are looked up by their tokens, which a matching name
+contains but not necessarily as one piece ("Health-Center").
+"""
+
+from .criteria import keyword_terms
+from .matcher import normalize_name
+
+# Length of the n-grams indexed by NameIndex
+GRAM_SIZE = 3
+
+
+def keyword_entries(criteria):
+    """Return ``{(mode, normalized keyword): (priority, sector, keyword)}``.
+
+    A keyword listed more than once with the same match mode keeps its
+    first entry, as in the matchers.
+
+    :param criteria: Compiled validation criteria.
+    :type criteria: CompiledCriteria
+    """
+    entries = {}
+    for (sector, keyword), mode in zip(criteria.patterns, criteria.modes):
+        key = (mode, normalize_name(keyword))
+        if key not in entries:
+            entries[key] = (len(entries), sector, keyword)
+    return entries
+
+
+def _longest_increasing(keys, ranks):
+    """Return the keys forming a longest subsequence of increasing rank."""
+    tails = []  # index into keys of the last element of each run length
+    parents = [None] * len(keys)
+    for index, key in enumerate(keys):
+        rank = ranks[key]
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if ranks[keys[tails[middle]]] < rank:
+                low = middle + 1
+            else:
+                high = middle
+        parents[index] = tails[low - 1] if low else None
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+    kept = set()
+    index = tails[-1] if tails else None
+    while index is not None:
+        kept.add(keys[index])
+        index = parents[index]
+    return kept
+
+
+def changed_keywords(old, new):
+    """Return ``(mode, normalized keyword)`` of the keywords whose verdicts may differ.
+
+    These are the keywords added or removed (or whose match mode changed),
+    those whose sector or spelling changed, and the fewest keywords whose
+    relative order must have changed. Names containing none of them keep
+    exactly the same verdict.
+
+    :param old: Criteria the current verdicts were computed with.
+    :type old: CompiledCriteria
+
+    :param new: Criteria to apply.
+    :type new: CompiledCriteria
+
+    :returns: Pairs to look up with :meth:`NameIndex.fids_matching`.
+    :rtype: set
+    """
+    old_entries, new_entries = keyword_entries(old), keyword_entries(new)
+    changed = set(old_entries).symmetric_difference(new_entries)
+    common = [
+        key for key in sorted(
+            set(old_entries).intersection(new_entries),
+            key=lambda key: old_entries[key][0])
+        if old_entries[key][1:] == new_entries[key][1:]]
+    changed.update(
+        key for key in old_entries
+        if key in new_entries
+        and old_entries[key][1:] != new_entries[key][1:])
+    new_ranks = {key: new_entries[key][0] for key in common}
+    kept = _longest_increasing(common, new_ranks)
+    changed.update(key for key in common if key not in kept)
+    return changed
+
+
+class NameIndex:
+    """Inverted n-gram index from facility names to feature ids.
+
+    Names repeat heavily, so n-grams point to distinct normalized names,
+    and each name to the set of features carrying it.
+    """
+
+    def __init__(self, records=()):
+        """Constructor.
+
+        :param records: Optional iterable of ``(fid, fac_name)`` to index.
+        """
+        self._fid_names = {}
+        self._name_fids = {}
+        self._grams = {}
+        for fid, name in records:
+            self.add(fid, name)
+
+    def __len__(self):
+        return len(self._fid_names)
+
+    def fids(self):
+        """Return the indexed feature ids."""
+        return self._fid_names.keys()
+
+    @staticmethod
+    def _grams_of(name):
+        return {name[index:index + GRAM_SIZE]
+                for index in range(len(name) - GRAM_SIZE + 1)}
+
+    def add(self, fid, value):
+        """Index (or re-index) the name of a feature."""
+        name = normalize_name(value)
+        if self._fid_names.get(fid) == name:
+            return
+        self.remove(fid)
+        self._fid_names[fid] = name
+        fids = self._name_fids.get(name)
+        if fids is None:
+            fids = self._name_fids[name] = set()
+            for gram in self._grams_of(name):
+                self._grams.setdefault(gram, set()).add(name)
+        fids.add(fid)
+
+    def remove(self, fid):
+        """Forget a feature."""
+        name = self._fid_names.pop(fid, None)
+        if name is None:
+            return
+        fids = self._name_fids[name]
+        fids.discard(fid)
+        if not fids:
+            del self._name_fids[name]
+            for gram in self._grams_of(name):
+                names = self._grams[gram]
+                names.discard(name)
+                if not names:
+                    del self._grams[gram]
+
+    def names_containing(self, keyword):
+        """Return the distinct indexed names containing ``keyword``."""
+        keyword = normalize_name(keyword)
+        if len(keyword) < GRAM_SIZE:
+            return {name for name in self._name_fids if keyword in name}
+        postings = []
+        for gram in self._grams_of(keyword):
+            names = self._grams.get(gram)
+            if not names:
+                return set()
+            postings.append(names)
+        postings.sort(key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        return {name for name in candidates if keyword in name}
+
+    def fids_containing(self, keywords):
+        """Return the features whose name contains any of ``keywords``."""
+        fids = set()
+        for keyword in keywords:
+            for name in self.names_containing(keyword):
+                fids.update(self._name_fids[name])
+        return fids
+
+    def fids_matching(self, keywords):
+        """Return the features whose name may be matched by any of ``keywords``.
+
+        :param keywords: ``(mode, keyword)`` pairs, e.g. from
+            :func:`changed_keywords`.
+        :type keywords: iterable
+        """
+        fids = set()
+        for mode, keyword in keywords:
+            terms = keyword_terms(keyword, mode)
+            if not terms:
+                continue
+            # Names holding every term, longest (usually rarest) terms first
+            names = None
+            for term in sorted(terms, key=len, reverse=True):
+                found = self.names_containing(term)
+                names = found if names is None else names & found
+                if not names:
+                    break
+            for name in names:
+                fids.update(self._name_fids[name])
+        return fids
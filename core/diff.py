@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Keyed diff of two versions of an error list.
+
+Rerunning a check mostly finds the errors of the previous run again, so
+the existing list is brought up to date instead of being replaced: rows
+are paired by key (the source layer and ``cbms_geoid`` of the error), new
+errors are inserted, resolved ones deleted and paired rows whose values
+changed updated.
+"""
+
+from collections import deque, namedtuple
+
+ErrorListDiff = namedtuple('ErrorListDiff', 'inserts deletes updates')
+
+
+def keyed_diff(old, new):
+    """Return the changes turning ``old`` into ``new``.
+
+    Rows sharing a key are paired in the order they come in.
+
+    :param old: Iterable of ``(row id, key, values)`` of the current list.
+    :type old: iterable
+
+    :param new: Iterable of ``(key, values, item)`` of the list to reach.
+    :type new: iterable
+
+    :returns: The ``item`` of each new row without an old one (inserts),
+        ids of the old rows left without a new one (deletes), and
+        ``(row id, item)`` of paired rows whose values differ (updates).
+    :rtype: ErrorListDiff
+    """
+    rows = {}
+    for row_id, key, values in old:
+        rows.setdefault(key, deque()).append((row_id, values))
+    inserts = []
+    updates = []
+    for key, values, item in new:
+        paired = rows.get(key)
+        if paired:
+            row_id, old_values = paired.popleft()
+            if old_values != values:
+                updates.append((row_id, item))
+        else:
+            inserts.append(item)
+    deletes = [row_id for paired in rows.values() for row_id, _ in paired]
+    return ErrorListDiff(inserts, deletes, updates)
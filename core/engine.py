@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""QGIS-free error check engine.
+
+The functions here work on plain records so the check can run anywhere
+Python does: on any iterable of ``(cbms_geoid, fac_name, sector)`` tuples,
+or straight on a GeoPackage table read with :mod:`sqlite3`.
+"""
+
+import os
+import sqlite3
+from collections import namedtuple
+from urllib.parse import quote
+
+from .cache import MatchCache
+from .pushdown import candidate_filter
+
+# Attribute fields read from the _SF layer
+CBMS_GEOID_FIELD = 'cbms_geoid'
+FAC_NAME_FIELD = 'fac_name'
+SECTOR_FIELD = 'sector'
+CHECKED_FIELDS = [CBMS_GEOID_FIELD, FAC_NAME_FIELD, SECTOR_FIELD]
+
+ErrorRow = namedtuple('ErrorRow', 'fid cbms_geoid recommended_sector remark')
+
+
+def build_remark(sector_value, matched_sector, keyword_matched):
+    """Return the remark explaining why a feature is in the error list."""
+    if sector_value is None:
+        sector_value = 'NULL'
+    return (
+        f"Incorrect sector: '{sector_value}'. Recommended sector is "
+        f"'{matched_sector}' based on the keyword '{keyword_matched}'. "
+        f"Please verify and update the sector.")
+
+
+def iter_errors(records, match):
+    """Yield an :class:`ErrorRow` for each record with a mismatched sector.
+
+    :param records: Iterable of ``(fid, cbms_geoid, fac_name, sector)``.
+    :type records: iterable
+
+    :param match: Callable returning ``(sector, keyword)`` or None for a
+        facility name, e.g. ``CompiledCriteria.match`` or ``MatchCache.match``.
+    :type match: callable
+    """
+    for fid, cbms_geoid, fac_name_value, sector_value in records:
+        # First category in file order wins, then first keyword in list order
+        result = match(fac_name_value)
+        if result and result[0] != sector_value:
+            matched_sector, keyword_matched = result
+            yield ErrorRow(
+                fid, cbms_geoid, matched_sector,
+                build_remark(sector_value, matched_sector, keyword_matched))
+
+
+def _match_function(criteria, match_cache):
+    """Return the match callable for ``criteria``, memoized if requested."""
+    if match_cache is None:
+        match_cache = MatchCache()
+    match_cache.bind(criteria)
+    return match_cache.match
+
+
+def check_rows(rows, criteria, match_cache=None):
+    """Check plain ``(cbms_geoid, fac_name, sector)`` tuples.
+
+    The ``fid`` of each returned error is the position of its row.
+
+    :param rows: Iterable of ``(cbms_geoid, fac_name, sector)``.
+    :type rows: iterable
+
+    :param criteria: Compiled validation criteria.
+    :type criteria: CompiledCriteria
+
+    :param match_cache: Memoization to reuse across calls, if any.
+    :type match_cache: MatchCache
+
+    :returns: Errors in row order.
+    :rtype: list
+    """
+    records = (
+        (index, cbms_geoid, fac_name_value, sector_value)
+        for index, (cbms_geoid, fac_name_value, sector_value)
+        in enumerate(rows))
+    return list(iter_errors(records, _match_function(criteria, match_cache)))
+
+
+def _quote(identifier):
+    """Quote an SQLite identifier."""
+    return '"%s"' % identifier.replace('"', '""')
+
+
+def connect_readonly(path):
+    """Open a read-only SQLite connection to the GeoPackage at ``path``."""
+    return sqlite3.connect(
+        'file:%s?mode=ro' % quote(os.path.abspath(path)), uri=True)
+
+
+def gpkg_feature_table(connection, table=None):
+    """Return ``(table, fid column)`` of a GeoPackage feature table.
+
+    :param connection: Open connection to the GeoPackage.
+    :type connection: sqlite3.Connection
+
+    :param table: Table name, or None to use the only feature table.
+    :type table: str
+
+    :raises ValueError: The table cannot be determined.
+    """
+    if table is None:
+        tables = [row[0] for row in connection.execute(
+            "SELECT table_name FROM gpkg_contents "
+            "WHERE data_type = 'features'")]
+        if len(tables) != 1:
+            raise ValueError(
+                'GeoPackage has %d feature tables, please name one: %s'
+                % (len(tables), ', '.join(tables)))
+        table = tables[0]
+    columns = connection.execute(
+        'PRAGMA table_info(%s)' % _quote(table)).fetchall()
+    if not columns:
+        raise ValueError('No table named %s' % table)
+    names = [column[1] for column in columns]
+    missing = [name for name in CHECKED_FIELDS if name not in names]
+    if missing:
+        raise ValueError(
+            'Layer is missing the field(s): %s' % ', '.join(missing))
+    primary_keys = [column[1] for column in columns if column[5]]
+    fid_column = primary_keys[0] if len(primary_keys) == 1 else 'rowid'
+    return table, fid_column
+
+
+def gpkg_row_count(path, table=None):
+    """Return the number of rows of a GeoPackage feature table."""
+    connection = connect_readonly(path)
+    try:
+        table, _ = gpkg_feature_table(connection, table)
+        return connection.execute(
+            'SELECT count(*) FROM %s' % _quote(table)).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def iter_gpkg_records(path, table=None, where=None, parameters=()):
+    """Yield ``(fid, cbms_geoid, fac_name, sector)`` from a GeoPackage.
+
+    Only the checked columns are read; geometry blobs are never touched.
+
+    :param path: GeoPackage file.
+    :type path: str
+
+    :param table: Feature table, or None to use the only one.
+    :type table: str
+
+    :param where: Optional SQL condition restricting the rows read.
+    :type where: str
+
+    :param parameters: Parameters bound to ``where``.
+    :type parameters: tuple
+    """
+    connection = connect_readonly(path)
+    try:
+        table, fid_column = gpkg_feature_table(connection, table)
+        sql = 'SELECT %s, %s FROM %s' % (
+            _quote(fid_column),
+            ', '.join(_quote(name) for name in CHECKED_FIELDS),
+            _quote(table))
+        if where:
+            sql += ' WHERE ' + where
+        sql += ' ORDER BY %s' % _quote(fid_column)
+        for row in connection.execute(sql, parameters):
+            yield row
+    finally:
+        connection.close()
+
+
+def check_gpkg(path, criteria, table=None, match_cache=None, pushdown=False):
+    """Check a GeoPackage feature table without QGIS.
+
+    :param path: GeoPackage file.
+    :type path: str
+
+    :param criteria: Compiled validation criteria.
+    :type criteria: CompiledCriteria
+
+    :param table: Feature table, or None to use the only one.
+    :type table: str
+
+    :param match_cache: Memoization to reuse across calls, if any.
+    :type match_cache: MatchCache
+
+    :param pushdown: Let SQLite select the candidate rows (see
+        core/pushdown.py), so only those are read and matched in Python.
+    :type pushdown: bool
+
+    :returns: Errors in fid order, ``fid`` being the GeoPackage feature id.
+    :rtype: list
+    """
+    where = None
+    if pushdown:
+        where = candidate_filter(criteria, 'sqlite', FAC_NAME_FIELD, SECTOR_FIELD)
+    return list(iter_errors(
+        iter_gpkg_records(path, table, where),
+        _match_function(criteria, match_cache)))
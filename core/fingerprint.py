@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Persistent per-feature fingerprints to skip unchanged features.
+
+A sidecar SQLite database remembers, for every feature of every checked
+layer, a hash of its ``fac_name`` and ``sector`` together with the match
+verdict and the criteria version it was computed with. On the next run a
+feature whose hash is unchanged reuses its stored verdict instead of being
+matched again; only new and edited features are matched and written back.
+"""
+
+import hashlib
+import os
+import sqlite3
+
+from .engine import ErrorRow, build_remark
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    layer TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    sector TEXT,
+    keyword TEXT,
+    PRIMARY KEY (layer, feature)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS layers (
+    layer TEXT PRIMARY KEY,
+    criteria TEXT NOT NULL
+);
+"""
+
+
+def layer_key(source):
+    """Return the store key of a layer from its (public) source string."""
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def fingerprint(fac_name_value, sector_value):
+    """Return the hash of the checked attributes of a feature."""
+    return hashlib.blake2b(
+        ('%s\x1f%s' % (fac_name_value, sector_value)).encode('utf-8'),
+        digest_size=8).digest()
+
+
+class FingerprintStore:
+    """Sidecar SQLite database of feature fingerprints.
+
+    The store only keeps the path; every :class:`FingerprintSession` opens
+    its own connection, so sessions can run on worker threads.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+
+        :param path: SQLite file, created on first use.
+        :type path: str
+        """
+        self.path = path
+
+    def connect(self):
+        """Open a connection with the schema in place."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def session(self, layer, criteria, key_by_geoid=False):
+        """Start a run over one layer.
+
+        :param layer: Layer key, see :func:`layer_key`.
+        :type layer: str
+
+        :param criteria: Compiled criteria used for this run.
+        :type criteria: CompiledCriteria
+
+        :param key_by_geoid: Key features by cbms_geoid instead of fid.
+        :type key_by_geoid: bool
+
+        :rtype: FingerprintSession
+        """
+        return FingerprintSession(self, layer, criteria.version, key_by_geoid)
+
+
+class FingerprintSession:
+    """One run over one layer, reusing and then updating its fingerprints."""
+
+    def __init__(self, store, layer, version, key_by_geoid=False):
+        self.store = store
+        self.layer = layer
+        self.version = version
+        self.key_by_geoid = key_by_geoid
+        self.reused = 0
+        self.matched = 0
+        self._previous = None
+        self._changed = []
+        self._seen = set()
+
+    def load(self):
+        """Read the fingerprints stored for this layer and criteria version."""
+        connection = self.store.connect()
+        try:
+            row = connection.execute(
+                'SELECT criteria FROM layers WHERE layer = ?',
+                (self.layer,)).fetchone()
+            if row is None or row[0] != self.version:
+                # Verdicts of other criteria cannot be reused
+                return {}
+            return {
+                feature: (digest, (sector, keyword) if sector is not None else None)
+                for feature, digest, sector, keyword in connection.execute(
+                    'SELECT feature, digest, sector, keyword '
+                    'FROM fingerprints WHERE layer = ?', (self.layer,))}
+        finally:
+            connection.close()
+
+    def iter_errors(self, records, match):
+        """Like :func:`engine.iter_errors`, reusing unchanged verdicts.
+
+        :param records: Iterable of ``(fid, cbms_geoid, fac_name, sector)``.
+        :param match: Callable matching the features whose fingerprint changed.
+        """
+        if self._previous is None:
+            self._previous = self.load()
+        previous = self._previous
+        for fid, cbms_geoid, fac_name_value, sector_value in records:
+            key = str(cbms_geoid if self.key_by_geoid else fid)
+            self._seen.add(key)
+            digest = fingerprint(fac_name_value, sector_value)
+            stored = previous.get(key)
+            if stored is not None and stored[0] == digest:
+                result = stored[1]
+                self.reused += 1
+            else:
+                result = match(fac_name_value)
+                self.matched += 1
+                self._changed.append((
+                    self.layer, key, digest,
+                    result[0] if result else None,
+                    result[1] if result else None))
+            if result and result[0] != sector_value:
+                matched_sector, keyword_matched = result
+                yield ErrorRow(
+                    fid, cbms_geoid, matched_sector,
+                    build_remark(sector_value, matched_sector, keyword_matched))
+
+    def commit(self):
+        """Write changed fingerprints and forget features no longer present.
+
+        Only call this after every record has been read; an interrupted run
+        must not be committed.
+        """
+        previous = self._previous or {}
+        vanished = [(self.layer, key) for key in previous
+                    if key not in self._seen]
+        connection = self.store.connect()
+        try:
+            with connection:
+                if not previous:
+                    connection.execute(
+                        'DELETE FROM fingerprints WHERE layer = ?',
+                        (self.layer,))
+                connection.executemany(
+                    'DELETE FROM fingerprints WHERE layer = ? AND feature = ?',
+                    vanished)
+                connection.executemany(
+                    'INSERT OR REPLACE INTO fingerprints '
+                    'VALUES (?, ?, ?, ?, ?)', self._changed)
+                connection.execute(
+                    'INSERT OR REPLACE INTO layers VALUES (?, ?)',
+                    (self.layer, self.version))
+        finally:
+            connection.close()
+        self._previous = None
+        self._changed = []
+        self._seen = set()
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""Full-text index of facility names for repeated checks of a GeoPackage.
+
+An SQLite FTS5 table with the ``trigram`` tokenizer holds ``fac_name`` keyed
+by fid, so every criteria keyword can be looked up as a substring query
+instead of scanning all rows in Python. Hits are combined in priority order
+(the first keyword found for a fid wins, as in the matcher) and only rows
+whose sector differs from their first hit are read back and matched in
+Python, which keeps the final word.
+
+The index lives either in a sidecar file next to the GeoPackage, brought up
+to date by comparing it with the table whenever the file changed, or inside
+the GeoPackage itself, maintained by triggers. Triggers make every writer of
+that GeoPackage need an SQLite with FTS5, so the sidecar is the default.
+"""
+
+import os
+import sqlite3
+
+from .criteria import TOKEN, keyword_terms
+from .engine import (
+    CHECKED_FIELDS, FAC_NAME_FIELD, SECTOR_FIELD, _match_function, _quote, connect_readonly,
+    gpkg_feature_table, iter_errors)
+from .matcher import normalize_name
+
+# Bump when the sidecar layout changes; older sidecars are rebuilt
+INDEX_FORMAT = 1
+SIDECAR_SUFFIX = '.fts'
+# Shortest keyword the trigram tokenizer can look up
+TRIGRAM = 3
+
+
+def fts5_available():
+    """Return True if this SQLite supports FTS5 with the trigram tokenizer."""
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute("CREATE VIRTUAL TABLE probe USING fts5(name, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+
+
+def _phrase(keyword):
+    """Return an FTS5 query matching ``keyword`` as a substring."""
+    return '"%s"' % keyword.replace('"', '""')
+
+
+def _file_signature(path):
+    """Return a string that changes whenever the GeoPackage is written."""
+    parts = []
+    for name in (path, path + '-wal'):
+        try:
+            stat = os.stat(name)
+        except OSError:
+            continue
+        parts.append('%d:%d' % (stat.st_size, stat.st_mtime_ns))
+    return '/'.join(parts)
+
+
+class FtsIndex:
+    """Trigram index of the facility names of one GeoPackage table."""
+
+    def __init__(self, path, table=None, inside=False, index_path=None):
+        """Constructor.
+
+        :param path: GeoPackage file.
+        :type path: str
+
+        :param table: Feature table, or None to use the only one.
+        :type table: str
+
+        :param inside: Keep the index in the GeoPackage, maintained by
+            triggers, instead of in a sidecar file.
+        :type inside: bool
+
+        :param index_path: Sidecar file, by default the GeoPackage path
+            followed by the table name, if given, and ``.fts``.
+        :type index_path: str
+        """
+        self.path = os.path.abspath(path)
+        self.table = table
+        self.inside = inside
+        self.index_path = index_path or (
+            '%s.%s%s' % (self.path, table, SIDECAR_SUFFIX) if table else self.path + SIDECAR_SUFFIX)
+        self.indexed = 0  # Rows (re)indexed by the last sync()
+
+    def connect(self):
+        """Open a connection to the GeoPackage with the index reachable.
+
+        :returns: ``(connection, table, fid column, schema, index table)``.
+        """
+        if self.inside:
+            connection = sqlite3.connect(self.path, timeout=30)
+        else:
+            connection = connect_readonly(self.path)
+            connection.execute('ATTACH DATABASE ? AS idx', (self.index_path,))
+        try:
+            table, fid_column = gpkg_feature_table(connection, self.table)
+        except Exception:
+            connection.close()
+            raise
+        if self.inside:
+            return connection, table, fid_column, 'main', 'fts_%s_%s' % (table, FAC_NAME_FIELD)
+        return connection, table, fid_column, 'idx', 'fts_names'
+
+    def sync(self, force=False):
+        """Create the index if needed and bring it up to date.
+
+        :param force: Compare the sidecar with the table even if the
+            GeoPackage file looks unchanged.
+        :type force: bool
+
+        :returns: Number of rows added to or replaced in the index.
+        :rtype: int
+        """
+        connection, table, fid_column, _, index_table = self.connect()
+        try:
+            with connection:
+                if self.inside:
+                    self.indexed = self._sync_inside(connection, table, fid_column, index_table)
+                else:
+                    self.indexed = self._sync_sidecar(connection, table, fid_column, force)
+        finally:
+            connection.close()
+        return self.indexed
+
+    def _sync_inside(self, connection, table, fid_column, index_table):
+        if connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index_table,)).fetchone():
+            return 0
+        values = {
+            'index': _quote(index_table),
+            'table': _quote(table),
+            'fid': _quote(fid_column),
+            'name': _quote(FAC_NAME_FIELD),
+            'insert': _quote(index_table + '_insert'),
+            'delete': _quote(index_table + '_delete'),
+            'update': _quote(index_table + '_update'),
+        }
+        connection.executescript("""
+            CREATE VIRTUAL TABLE %(index)s USING fts5(
+                %(name)s, content=%(table)s, content_rowid=%(fid)s, tokenize='trigram');
+            INSERT INTO %(index)s(%(index)s) VALUES ('rebuild');
+            CREATE TRIGGER %(insert)s AFTER INSERT ON %(table)s BEGIN
+                INSERT INTO %(index)s(rowid, %(name)s) VALUES (new.%(fid)s, new.%(name)s);
+            END;
+            CREATE TRIGGER %(delete)s AFTER DELETE ON %(table)s BEGIN
+                INSERT INTO %(index)s(%(index)s, rowid, %(name)s) VALUES ('delete', old.%(fid)s, old.%(name)s);
+            END;
+            CREATE TRIGGER %(update)s AFTER UPDATE OF %(fid)s, %(name)s ON %(table)s BEGIN
+                INSERT INTO %(index)s(%(index)s, rowid, %(name)s) VALUES ('delete', old.%(fid)s, old.%(name)s);
+                INSERT INTO %(index)s(rowid, %(name)s) VALUES (new.%(fid)s, new.%(name)s);
+            END;
+        """ % values)
+        return connection.execute('SELECT count(*) FROM %s' % values['table']).fetchone()[0]
+
+    def _sync_sidecar(self, connection, table, fid_column, force):
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS idx.fts_meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE VIRTUAL TABLE IF NOT EXISTS idx.fts_names USING fts5(fac_name, tokenize='trigram');
+        """)
+        meta = dict(connection.execute('SELECT key, value FROM idx.fts_meta'))
+        source = '%s/%s/%s' % (INDEX_FORMAT, table, fid_column)
+        signature = _file_signature(self.path)
+        if meta.get('source') != source:
+            connection.execute('DELETE FROM idx.fts_names')
+        elif meta.get('signature') == signature and not force:
+            return 0
+
+        # Drop index rows of deleted or renamed features, then (re)add the
+        # features the index does not have with the current name
+        values = {'table': _quote(table), 'fid': _quote(fid_column), 'name': _quote(FAC_NAME_FIELD)}
+        connection.execute("""
+            DELETE FROM idx.fts_names WHERE rowid IN (
+                SELECT n.rowid FROM idx.fts_names AS n LEFT JOIN main.%(table)s AS t ON t.%(fid)s = n.rowid
+                WHERE t.%(fid)s IS NULL OR t.%(name)s IS NOT n.fac_name)
+        """ % values)
+        indexed = connection.execute("""
+            INSERT INTO idx.fts_names (rowid, fac_name)
+            SELECT t.%(fid)s, t.%(name)s FROM main.%(table)s AS t
+            WHERE NOT EXISTS (SELECT 1 FROM idx.fts_names AS n WHERE n.rowid = t.%(fid)s)
+        """ % values).rowcount
+        connection.executemany('INSERT OR REPLACE INTO idx.fts_meta VALUES (?, ?)', [
+            ('source', source), ('signature', signature)])
+        return indexed
+
+    def iter_candidates(self, criteria):
+        """Yield ``(fid, cbms_geoid, fac_name, sector)`` of the possible errors.
+
+        Call :meth:`sync` first. Rows come in fid order.
+
+        :param criteria: Compiled validation criteria.
+        :type criteria: CompiledCriteria
+        """
+        connection, table, fid_column, schema, index_table = self.connect()
+        index = '%s.%s' % (schema, _quote(index_table))
+        try:
+            connection.executescript("""
+                CREATE TEMP TABLE hits (fid INTEGER PRIMARY KEY, priority INTEGER NOT NULL);
+                CREATE TEMP TABLE sectors (priority INTEGER PRIMARY KEY, sector TEXT);
+            """)
+            connection.executemany('INSERT INTO temp.sectors VALUES (?, ?)', [
+                (priority, sector) for priority, (sector, _) in enumerate(criteria.patterns)])
+
+            # Hits in priority order: each fid keeps its first keyword. A
+            # whole-word keyword is looked up as all of its words, wherever
+            # they are in the name (see core.criteria.keyword_terms)
+            seen = set()
+            for priority, ((_, keyword), mode) in enumerate(zip(criteria.patterns, criteria.modes)):
+                terms = keyword_terms(keyword, mode)
+                if not terms or (mode, tuple(terms)) in seen:
+                    continue
+                seen.add((mode, tuple(terms)))
+                conditions, parameters = [], [priority]
+                long_terms = [term for term in terms if len(term) >= TRIGRAM]
+                if long_terms:
+                    conditions.append('%s MATCH ?' % _quote(index_table))
+                    parameters.append(' AND '.join(_phrase(term) for term in long_terms))
+                for term in terms:
+                    if len(term) < TRIGRAM:
+                        # Too short for trigrams: FTS5 scans its own copy of the names
+                        like = "%s LIKE ? ESCAPE '\\'" % _quote(FAC_NAME_FIELD)
+                        if not term.isascii():
+                            # LIKE folds ASCII case only: take every non-ASCII
+                            # name, as core.pushdown does
+                            like = "(%s OR %s GLOB '*[^ -~]*')" % (like, _quote(FAC_NAME_FIELD))
+                        conditions.append(like)
+                        parameters.append('%' + term.replace('\\', '\\\\').replace('%', '\\%')
+                                          .replace('_', '\\_') + '%')
+                connection.execute(
+                    'INSERT OR IGNORE INTO temp.hits SELECT rowid, ? FROM %s WHERE %s'
+                    % (index, ' AND '.join(conditions)), parameters)
+            # NULL names are matched as the text "None" in Python
+            null_match = criteria.match(None)
+            if null_match is not None:
+                connection.execute(
+                    'INSERT OR IGNORE INTO temp.hits SELECT %s, ? FROM main.%s WHERE %s IS NULL'
+                    % (_quote(fid_column), _quote(table), _quote(FAC_NAME_FIELD)),
+                    (criteria.patterns.index(null_match),))
+
+            sql = 'SELECT %s FROM main.%s AS t JOIN temp.hits AS h ON h.fid = t.%s' % (
+                ', '.join(['t.' + _quote(fid_column)] + ['t.' + _quote(name) for name in CHECKED_FIELDS]),
+                _quote(table), _quote(fid_column))
+            if TOKEN not in criteria.modes and all(
+                    normalize_name(keyword).isascii() for _, keyword in criteria.patterns):
+                # The first hit is then the verdict: skip rows that agree with it
+                sql += (' JOIN temp.sectors AS s ON s.priority = h.priority'
+                        ' WHERE t.%(sector)s IS NULL OR t.%(sector)s <> s.sector' % {'sector': _quote(SECTOR_FIELD)})
+            sql += ' ORDER BY t.%s' % _quote(fid_column)
+            for row in connection.execute(sql):
+                yield row
+        finally:
+            connection.close()
+
+
+def check_gpkg_indexed(path, criteria, table=None, match_cache=None, inside=False):
+    """Check a GeoPackage table through its full-text index.
+
+    The index is created or brought up to date first; see :class:`FtsIndex`.
+    Gives the same errors as :func:`core.engine.check_gpkg`.
+
+    :rtype: list
+    """
+    index = FtsIndex(path, table, inside)
+    index.sync()
+    return list(iter_errors(index.iter_candidates(criteria), _match_function(criteria, match_cache)))
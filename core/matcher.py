@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Multi-keyword matcher used to recommend a sector for a facility name.
+
+The validation criteria are an ordered list of categories, each with an
+ordered list of keywords. A facility name belongs to the first category (in
+file order) that has a keyword contained in the name, and the keyword
+reported is the first one (in list order) of that category that matched.
+
+Rather than testing every keyword against every name, all keywords are
+compiled into a single Aho-Corasick automaton so each name is scanned once,
+character by character, whatever the number of keywords.
+"""
+
+from collections import deque
+
+
+def normalize_name(value):
+    """Return the case-folded text a facility name is matched on.
+
+    :param value: Attribute value read from the layer (may be NULL/None).
+    :type value: object
+
+    :returns: Lower-cased string representation of ``value``.
+    :rtype: str
+    """
+    return str(value).lower()
+
+
+def _better(first, second):
+    """Return the lower of two optional priorities."""
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return min(first, second)
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over the keywords of the validation criteria.
+
+    Every keyword is given a priority equal to its position in the criteria
+    (categories in file order, then keywords in list order). Each automaton
+    state stores the best (lowest) priority of all keywords ending at that
+    state or at any of its suffix states, so scanning a name only needs to
+    keep the minimum seen so far.
+    """
+
+    def __init__(self, patterns):
+        """Build the automaton.
+
+        :param patterns: Iterable of ``(keyword, sector)`` pairs in priority
+            order.
+        :type patterns: iterable
+        """
+        self.patterns = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]
+
+        for keyword, sector in patterns:
+            priority = len(self.patterns)
+            self.patterns.append((sector, keyword))
+            state = 0
+            for char in normalize_name(keyword):
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                state = next_state
+            # A keyword listed twice keeps its first (highest) priority.
+            if self._best[state] is None:
+                self._best[state] = priority
+
+        self._build_failure_links()
+
+    @classmethod
+    def from_criteria(cls, validation_criteria):
+        """Build a matcher from the parsed ``validation_criteria.json``.
+
+        :param validation_criteria: Parsed criteria with a ``categories`` list.
+        :type validation_criteria: dict
+
+        :returns: A compiled matcher.
+        :rtype: KeywordMatcher
+        """
+        return cls(
+            (keyword, category['sector'])
+            for category in validation_criteria['categories']
+            for keyword in category['keywords']
+        )
+
+    def _build_failure_links(self):
+        """Compute failure links breadth-first and fold suffix outputs."""
+        goto, fail, best = self._goto, self._fail, self._best
+        queue = deque(goto[0].values())
+        # States one level deep fail back to the root, so they inherit the
+        # root output (only set by an empty keyword) before the walk starts.
+        for state in queue:
+            best[state] = _better(best[state], best[0])
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(char, 0)
+                best[child] = _better(best[child], best[fail[child]])
+
+    def match_priority(self, name):
+        """Return the priority of the best keyword contained in ``name``.
+
+        :param name: Already normalized facility name.
+        :type name: str
+
+        :returns: Index into :attr:`patterns`, or None when nothing matched.
+        :rtype: int
+        """
+        goto, fail, best = self._goto, self._fail, self._best
+        found = best[0]
+        if found == 0:
+            return found
+        state = 0
+        for char in name:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            priority = best[state]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                if found == 0:
+                    break
+        return found
+
+    def match(self, value):
+        """Return the recommended sector and keyword for a facility name.
+
+        :param value: Facility name attribute value.
+        :type value: object
+
+        :returns: ``(sector, keyword)`` or None when no keyword matched.
+        :rtype: tuple
+        """
+        priority = self.match_priority(normalize_name(value))
+        if priority is None:
+            return None
+        return self.patterns[priority]
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Per-stage timings and counts of a check run.
+
+A run is split into stages (criteria load, feature iteration, matching,
+error feature construction, ...). Each stage accumulates wall time, so that
+a slow run can be told apart as I/O-bound on the data provider or CPU-bound
+in the matching. Stages timed from several threads add up their time.
+"""
+
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+CRITERIA_LOAD = 'criteria_load'
+BACKEND_SELECTION = 'backend_selection'
+INDEX_SYNC = 'index_sync'
+ITERATION = 'iteration'
+MATCHING = 'matching'
+GEOMETRY_FETCH = 'geometry_fetch'
+ERROR_FEATURES = 'error_features'
+WRITING = 'writing'
+LAYER_ADD = 'layer_add'
+STYLING = 'styling'
+
+# Count the features per second of each stage are computed from
+FEATURES = 'features'
+# Stages that go through every feature, reported in features per second
+PER_FEATURE_STAGES = (ITERATION, MATCHING)
+
+
+class RunMetrics:
+    """Stage timings and counts of one run, reported as text or JSON."""
+
+    def __init__(self, **info):
+        """Constructor.
+
+        :param info: Extra values stored with the metrics, e.g. layer names.
+        """
+        self.info = info
+        self.stages = {}
+        self.counts = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        """Add ``seconds`` to the time of ``stage``."""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name, value=1):
+        """Add ``value`` to the count ``name``."""
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def merge(self, other):
+        """Add the stage times and counts of ``other`` to these."""
+        for stage, seconds in other.stages.items():
+            self.add(stage, seconds)
+        for name, value in other.counts.items():
+            self.count(name, value)
+
+    @contextmanager
+    def stage(self, stage):
+        """Time the body of a ``with`` block as ``stage``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def timed(self, iterable, stage):
+        """Yield from ``iterable``, timing only the time spent producing items."""
+        iterator = iter(iterable)
+        clock = time.perf_counter
+        elapsed = 0.0
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += clock() - start
+                yield item
+        finally:
+            self.add(stage, elapsed)
+
+    def rates(self):
+        """Return features per second of the stages going through every feature."""
+        features = self.counts.get(FEATURES)
+        if not features:
+            return {}
+        return {stage: features / seconds for stage, seconds in self.stages.items()
+                if stage in PER_FEATURE_STAGES and seconds > 0}
+
+    def as_dict(self):
+        """Return the metrics as a JSON serializable dict."""
+        rates = self.rates()
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'info': self.info,
+            'counts': dict(self.counts),
+            'stages': {
+                stage: {'seconds': round(seconds, 6), 'features_per_second': round(rates[stage], 1)}
+                if stage in rates else {'seconds': round(seconds, 6)}
+                for stage, seconds in self.stages.items()
+            },
+        }
+
+    def summary(self):
+        """Return a short human readable report, one stage per line."""
+        rates = self.rates()
+        values = list(self.info.items()) + list(self.counts.items())
+        lines = [', '.join('%s: %s' % (name, value) for name, value in values)]
+        for stage, seconds in self.stages.items():
+            line = '%s: %.3f s' % (stage, seconds)
+            if stage in rates:
+                line += ' (%s features/s)' % format(round(rates[stage]), ',')
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def write_jsonl(self, path):
+        """Append the metrics of this run as one line of a JSON-lines file."""
+        with open(path, 'a', encoding='utf-8') as output:
+            output.write(json.dumps(self.as_dict(), default=str) + '\n')
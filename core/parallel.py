@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Multi-process error check for very large layers.
+
+Two strategies are offered, both returning errors in a deterministic order:
+
+* :func:`parallel_check_gpkg` splits a GeoPackage table into fid ranges and
+  lets every worker process read and match its own range through sqlite3,
+  so reading scales with the number of workers too.
+* :func:`parallel_iter_errors` matches chunks of records read by the caller
+  (e.g. from a QGIS feature iterator) in worker processes.
+
+Workers are started with the ``spawn`` method and a plain Python
+interpreter, since forking or re-launching a QGIS process is not safe.
+"""
+
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count, islice
+
+from .cache import MatchCache
+from .engine import _quote, connect_readonly, gpkg_feature_table, iter_errors
+from .engine import iter_gpkg_records
+
+# Records per chunk sent to a worker by parallel_iter_errors
+DEFAULT_CHUNK_SIZE = 20000
+
+
+def default_workers():
+    """Return the number of worker processes to use by default."""
+    return os.cpu_count() or 1
+
+
+def python_executable():
+    """Return a Python interpreter able to run the worker processes.
+
+    Inside QGIS ``sys.executable`` may be the QGIS binary itself, so look
+    for the interpreter shipped next to it.
+    """
+    name = os.path.basename(sys.executable).lower()
+    if name.startswith('python'):
+        return sys.executable
+    candidates = ['python.exe', 'pythonw.exe'] if os.name == 'nt' \
+        else ['python3', 'python']
+    for directory in (sys.exec_prefix, os.path.join(sys.exec_prefix, 'bin')):
+        for candidate in candidates:
+            path = os.path.join(directory, candidate)
+            if os.path.isfile(path):
+                return path
+    return sys.executable
+
+
+def spawn_context():
+    """Return a ``spawn`` multiprocessing context using a plain interpreter."""
+    context = multiprocessing.get_context('spawn')
+    context.set_executable(python_executable())
+    return context
+
+
+def fid_partitions(path, parts, table=None):
+    """Split a GeoPackage table into contiguous fid ranges.
+
+    Rows are dealt into ranges of about the same size in one ordered pass
+    (``ntile``), so fids may have gaps.
+
+    :param path: GeoPackage file.
+    :type path: str
+
+    :param parts: Number of ranges wanted.
+    :type parts: int
+
+    :param table: Feature table, or None to use the only one.
+    :type table: str
+
+    :returns: ``(first fid, last fid)`` inclusive ranges in fid order.
+    :rtype: list
+    """
+    connection = connect_readonly(path)
+    try:
+        table, fid_column = gpkg_feature_table(connection, table)
+        fid, table = _quote(fid_column), _quote(table)
+        bounds = connection.execute(
+            'SELECT min(%s), max(%s) FROM (SELECT %s, ntile(?) OVER (ORDER BY %s) AS part FROM %s)'
+            ' GROUP BY part ORDER BY part' % (fid, fid, fid, fid, table),
+            (max(1, parts),)).fetchall()
+    finally:
+        connection.close()
+    if not bounds:
+        return []
+    starts = [first for first, _ in bounds]
+    ends = [start - 1 for start in starts[1:]] + [bounds[-1][1]]
+    return list(zip(starts, ends))
+
+
+def _check_fid_range(path, table, first, last, criteria):
+    """Worker: check the rows of one fid range.
+
+    :returns: Number of rows read and their errors.
+    """
+    connection = connect_readonly(path)
+    try:
+        _, fid_column = gpkg_feature_table(connection, table)
+    finally:
+        connection.close()
+    cache = MatchCache()
+    cache.bind(criteria)
+    # zip() draws from ``read`` once per record, so it ends up counting them
+    read = count()
+    records = (record for record, _ in zip(iter_gpkg_records(
+        path, table, '%s BETWEEN ? AND ?' % _quote(fid_column),
+        (first, last)), read))
+    errors = list(iter_errors(records, cache.match))
+    return next(read), errors
+
+
+def parallel_iter_gpkg_errors(path, criteria, table=None, workers=None,
+                              mp_context=None, on_partition=None):
+    """Check a GeoPackage table with worker processes reading fid ranges.
+
+    :param path: GeoPackage file.
+    :type path: str
+
+    :param criteria: Compiled validation criteria.
+    :type criteria: CompiledCriteria
+
+    :param table: Feature table, or None to use the only one.
+    :type table: str
+
+    :param workers: Number of worker processes (default: CPU count).
+    :type workers: int
+
+    :param mp_context: Multiprocessing context (default: spawn_context()).
+
+    :param on_partition: Optional callable receiving the number of rows of
+        each fid range once its errors have been yielded, e.g. to report
+        progress. Returning True stops the check there.
+
+    :returns: Generator of errors in fid order, exactly as
+        :func:`engine.check_gpkg` would return them.
+    """
+    workers = workers or default_workers()
+    connection = connect_readonly(path)
+    try:
+        table, _ = gpkg_feature_table(connection, table)
+    finally:
+        connection.close()
+    # A few ranges per worker evens out unequal match costs
+    partitions = fid_partitions(path, workers * 4, table)
+    with ProcessPoolExecutor(
+            workers, mp_context=mp_context or spawn_context()) as executor:
+        futures = [
+            executor.submit(_check_fid_range, path, table, first, last,
+                            criteria)
+            for first, last in partitions]
+        try:
+            for future in futures:
+                rows, errors = future.result()
+                for error in errors:
+                    yield error
+                if on_partition and on_partition(rows):
+                    return
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def parallel_check_gpkg(path, criteria, table=None, workers=None,
+                        mp_context=None):
+    """Return the errors of :func:`parallel_iter_gpkg_errors` as a list."""
+    return list(parallel_iter_gpkg_errors(
+        path, criteria, table, workers, mp_context))
+
+
+def _check_chunk(records, criteria):
+    """Worker: check one chunk of records."""
+    cache = MatchCache()
+    cache.bind(criteria)
+    return list(iter_errors(records, cache.match))
+
+
+def parallel_iter_errors(records, criteria, workers=None,
+                         chunk_size=DEFAULT_CHUNK_SIZE, mp_context=None):
+    """Match records in worker processes, yielding errors in input order.
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    however long ``records`` is.
+
+    :param records: Iterable of ``(fid, cbms_geoid, fac_name, sector)``
+        with plain Python values.
+    :type records: iterable
+
+    :param criteria: Compiled validation criteria.
+    :type criteria: CompiledCriteria
+
+    :param workers: Number of worker processes (default: CPU count).
+    :type workers: int
+
+    :param chunk_size: Records sent to a worker at once.
+    :type chunk_size: int
+
+    :param mp_context: Multiprocessing context (default: spawn_context()).
+    """
+    workers = workers or default_workers()
+    records = iter(records)
+    with ProcessPoolExecutor(
+            workers, mp_context=mp_context or spawn_context()) as executor:
+        in_flight = []
+        try:
+            while True:
+                while len(in_flight) < workers * 2:
+                    chunk = list(islice(records, chunk_size))
+                    if not chunk:
+                        break
+                    in_flight.append(
+                        executor.submit(_check_chunk, chunk, criteria))
+                if not in_flight:
+                    return
+                for error in in_flight.pop(0).result():
+                    yield error
+        finally:
+            for future in in_flight:
+                future.cancel()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Candidate filters evaluated by the data provider instead of Python.
+
+Most features have the right sector, so for database-backed layers it is
+cheaper to let the database return only the rows that may be errors. The
+criteria are translated into a condition that is true for every row whose
+name contains a keyword of another sector than the row's own, e.g. for
+SQLite/GeoPackage::
+
+    CASE WHEN "fac_name" LIKE '%hospital%' ESCAPE '\\' OR ... THEN
+        "sector" IS NULL OR "sector" <> '01_HEALTHCARE'
+    WHEN ... ELSE 0 END
+
+The filter only selects candidates: the returned rows are still matched in
+Python, so results are those of a full scan. When the database cannot
+reproduce the Python verdict, the filter is widened rather than risk
+missing an error: a whole-word keyword selects every name containing all
+of its words, however they are separated, and any sector. When a keyword
+has non-ASCII characters, whose case the database may fold otherwise,
+every non-ASCII name is a candidate too; the ``qgis`` dialect has no such
+condition, so no filter is made for those criteria.
+"""
+
+from .criteria import TOKEN, keyword_terms
+
+# How each dialect spells the parts of the filter
+DIALECTS = {
+    # GeoPackage / SpatiaLite through SQLite: LIKE folds ASCII case only
+    'sqlite': {
+        'like': "{column} LIKE {pattern} ESCAPE '\\'",
+        'false': '0',
+        'non_ascii': "{column} GLOB '*[^ -~]*'",
+    },
+    'postgres': {
+        'like': "{column} ILIKE {pattern} ESCAPE '\\'",
+        'false': 'FALSE',
+        'non_ascii': "{column} ~ '[^ -~]'",
+    },
+    # QGIS expressions, compiled to provider SQL by QGIS where supported
+    'qgis': {
+        'like': "{column} ILIKE {pattern}",
+        'false': 'FALSE',
+        'non_ascii': None,
+    },
+}
+
+
+def quote_identifier(name):
+    """Quote a column name."""
+    return '"%s"' % name.replace('"', '""')
+
+
+def quote_literal(value):
+    """Quote a string literal."""
+    return "'%s'" % value.replace("'", "''")
+
+
+def _like_pattern(keyword, dialect):
+    """Return the quoted LIKE pattern finding ``keyword`` anywhere, or None."""
+    if dialect == 'qgis':
+        if any(char in keyword for char in '%_\\'):
+            return None
+        return quote_literal('%' + keyword + '%')
+    escaped = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return quote_literal('%' + escaped + '%')
+
+
+def candidate_filter(criteria, dialect, name_column, sector_column):
+    """Return a condition selecting every row that may be an error.
+
+    :param criteria: Compiled validation criteria.
+    :type criteria: CompiledCriteria
+
+    :param dialect: One of :data:`DIALECTS`.
+    :type dialect: str
+
+    :param name_column: Column holding the facility names.
+    :type name_column: str
+
+    :param sector_column: Column holding the sectors.
+    :type sector_column: str
+
+    :returns: The condition, or None when it cannot be expressed in
+        ``dialect`` (every row must then be checked).
+    :rtype: str
+    """
+    syntax = DIALECTS[dialect]
+    name = quote_identifier(name_column)
+    sector = quote_identifier(sector_column)
+
+    keywords = []  # (terms, sector) of each keyword, without repeats
+    seen = set()
+    for (keyword_sector, keyword), mode in zip(criteria.patterns, criteria.modes):
+        terms = keyword_terms(keyword, mode)
+        if terms and (mode, tuple(terms)) not in seen:
+            seen.add((mode, tuple(terms)))
+            keywords.append((terms, keyword_sector))
+    likes = []
+    for terms, _ in keywords:
+        # A name matching the keyword contains each of its terms
+        conditions = []
+        for term in terms:
+            pattern = _like_pattern(term, dialect)
+            if pattern is None:
+                return None
+            conditions.append(syntax['like'].format(column=name, pattern=pattern))
+        likes.append(conditions[0] if len(conditions) == 1 else '(%s)' % ' AND '.join(conditions))
+
+    first = []
+    if not all(term.isascii() for terms, _ in keywords for term in terms):
+        # The database may fold the case of other characters differently
+        if syntax['non_ascii'] is None:
+            return None
+        first.append(syntax['non_ascii'].format(column=name))
+    # NULL names are matched as the text "None" in Python
+    null_match = criteria.match(None)
+    if null_match is not None:
+        first.append('%s IS NULL' % name)
+
+    if TOKEN in criteria.modes:
+        # A keyword found as a substring may not be a whole word, so which
+        # category wins is only known in Python: any keyword is a candidate
+        return ' OR '.join(first + likes) if first or likes else syntax['false']
+
+    # Consecutive keywords of one sector share a WHEN, in priority order
+    branches = []
+    for like, (_, keyword_sector) in zip(likes, keywords):
+        if branches and branches[-1][1] == keyword_sector:
+            branches[-1][0].append(like)
+        else:
+            branches.append(([like], keyword_sector))
+    whens = ['WHEN %s THEN 1 = 1' % ' OR '.join(first)] if first else []
+    whens += [
+        'WHEN %s THEN %s IS NULL OR %s <> %s' % (
+            ' OR '.join(conditions), sector, sector, quote_literal(keyword_sector))
+        for conditions, keyword_sector in branches]
+    if not whens:
+        return syntax['false']
+    return 'CASE %s ELSE %s END' % (' '.join(whens), syntax['false'])
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Whole-word matcher for keywords that must not match inside other words.
+
+Substring matching finds "park" in "Parking" and "bus" in "Business". A
+keyword in token mode only matches whole words of the facility name: the
+name is split into word tokens once, and each token is looked up in a hash
+index of the keywords' first tokens, so the cost grows with the number of
+words in the name rather than with the number of keywords. Multi-word
+keywords ("health center") match the same words in sequence.
+"""
+
+import re
+
+from .matcher import normalize_name
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+
+def tokenize(name):
+    """Return the word tokens of an already normalized name.
+
+    Punctuation and hyphens separate tokens, so "Agro-Industry" and
+    "agro industry" give the same tokens.
+    """
+    return TOKEN_PATTERN.findall(name)
+
+
+class TokenMatcher:
+    """Hash index of keywords by their first token.
+
+    Priorities are given by the caller, so that token and substring keywords
+    can share one priority order (see core/criteria.py).
+    """
+
+    def __init__(self, patterns):
+        """Build the index.
+
+        :param patterns: Iterable of ``(keyword, priority)`` pairs. Keywords
+            without any word character can never match and are skipped.
+        :type patterns: iterable
+        """
+        self._index = {}
+        for keyword, priority in patterns:
+            tokens = tokenize(normalize_name(keyword))
+            if tokens:
+                self._index.setdefault(tokens[0], []).append((priority, tuple(tokens[1:])))
+        for entries in self._index.values():
+            entries.sort()
+
+    def __bool__(self):
+        return bool(self._index)
+
+    def match_priority(self, name, limit=None):
+        """Return the best priority of a keyword in ``name``, if below ``limit``.
+
+        :param name: Already normalized facility name.
+        :type name: str
+
+        :param limit: Priority already found by another matcher; only better
+            (lower) priorities are looked for.
+        :type limit: int
+
+        :returns: The priority found, or None.
+        :rtype: int
+        """
+        index = self._index
+        tokens = TOKEN_PATTERN.findall(name)
+        found = limit
+        for position, token in enumerate(tokens):
+            entries = index.get(token)
+            if entries is None:
+                continue
+            for priority, rest in entries:
+                if found is not None and priority >= found:
+                    break
+                if not rest or tuple(tokens[position + 1:position + 1 + len(rest)]) == rest:
+                    found = priority
+                    break
+        return None if found == limit else found
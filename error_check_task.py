@@ -0,0 +1,113 @@
+from qgis.core import QgsTask, QgsVectorLayerFeatureSource
+from qgis.PyQt.QtCore import pyqtSignal
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from .check_engine import ErrorCheckEngine, full_text_index, gpkg_source, pushdown_filter
+from .core.fingerprint import layer_key
+from .core.metrics import RunMetrics
+from .error_layer import SharedErrorListWriter
+
+# Layers scanned at the same time when checking several layers
+MAX_LAYER_THREADS = 4
+
+
+class ErrorCheckTask(QgsTask):
+    """Background task that scans _SF layers and writes out the errors.
+
+    The task only reads from feature source snapshots of the layers, so it is
+    safe to run off the GUI thread. With several layers, one engine per layer
+    runs in a thread pool, all sharing the compiled criteria, the match cache
+    and one writer, so the errors end up in a single merged list with a
+    source_layer column; the ``workers`` processes are then split between
+    the layers checked at the same time. Errors are handed to ``writer`` in batches (see
+    error_layer.py); the error layer itself is created by the caller once
+    ``taskCompleted`` is emitted. Stage timings of all layers are merged
+    into ``metrics`` once the run is over. With ``fts``, GeoPackage layers
+    without unsaved edits are checked through a full-text index of their
+    facility names (see core/fts.py).
+    """
+
+    # Human readable progress, e.g. "12000 / 50000 features, 8000 features/s, ETA 5s"
+    statusChanged = pyqtSignal(str)
+
+    def __init__(self, layers, criteria, writer, match_cache, workers=1, fingerprint_store=None, metrics=None,
+                 backend=None, fts=False):
+        names = ", ".join(layer.name() for layer in layers)
+        super().__init__(f"Error List Check: {names}", QgsTask.CanCancel)
+        self.layer_names = [layer.name() for layer in layers]
+        # Only used back on the main thread, once the task is over
+        self.layers = list(layers)
+        self.criteria = criteria
+        self.match_cache = match_cache
+        self.metrics = metrics or RunMetrics()
+        self.writer = SharedErrorListWriter(writer) if len(layers) > 1 else writer
+        self.total = sum(max(layer.featureCount(), 0) for layer in layers)
+        self.threads = min(MAX_LAYER_THREADS, len(layers))
+        # Worker processes are shared out between the layers checked at once
+        workers = max(1, workers // self.threads)
+        # Feature sources must be created on the main thread
+        self.engines = [
+            ErrorCheckEngine(
+                QgsVectorLayerFeatureSource(layer), layer.fields(), criteria, self.writer, match_cache,
+                workers, gpkg_source(layer) if workers > 1 else None, layer.name(),
+                fingerprint_store.session(layer_key(layer.publicSource()), criteria) if fingerprint_store else None,
+                backend, pushdown_filter(layer, criteria), layer.featureCount(),
+                full_text_index(layer) if fts else None)
+            for layer in layers
+        ]
+        self.progress_lock = threading.Lock()
+        self.start = None
+        self.exception = None
+        # Lookups in the shared match cache over the whole task; the engines'
+        # own counts overlap when layers are checked at the same time
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def error_count(self):
+        return sum(engine.error_count for engine in self.engines)
+
+    @property
+    def reused(self):
+        """Features whose stored verdict was reused from an earlier run."""
+        return sum(engine.fingerprints.reused for engine in self.engines if engine.fingerprints)
+
+    def run(self):
+        self.start = time.perf_counter()
+        info_before = self.match_cache.info()
+        try:
+            if len(self.engines) == 1:
+                return self.engines[0].run(self.isCanceled, self.report)
+            with ThreadPoolExecutor(self.threads) as executor:
+                futures = [
+                    executor.submit(engine.run, self.isCanceled, self.report)
+                    for engine in self.engines
+                ]
+                # Every layer must finish for the merged list to be complete
+                return all([future.result() for future in futures])
+        except Exception as e:
+            self.exception = e
+            self.cancel()
+            return False
+        finally:
+            self.writer.finish()
+            for engine in self.engines:
+                self.metrics.merge(engine.metrics)
+            info_after = self.match_cache.info()
+            self.cache_hits = info_after.hits - info_before.hits
+            self.cache_misses = info_after.misses - info_before.misses
+
+    def report(self, *args):
+        """Update the task progress and emit throughput and ETA over all layers."""
+        with self.progress_lock:
+            processed = sum(engine.processed for engine in self.engines)
+            elapsed = time.perf_counter() - self.start
+        if self.total > 0:
+            self.setProgress(min(100.0, 100.0 * processed / self.total))
+        rate = processed / elapsed if elapsed > 0 else 0.0
+        status = f"{processed} / {max(self.total, processed)} features, {rate:,.0f} features/s"
+        if rate and self.total > processed:
+            status += f", ETA {(self.total - processed) / rate:.0f}s"
+        self.statusChanged.emit(status)
@@ -0,0 +1,374 @@
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFeature,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsMapLayer,
+    QgsPalLayerSettings,
+    QgsPointClusterRenderer,
+    QgsUnitTypes,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+from collections import namedtuple
+import os
+import threading
+
+ERROR_LAYER_NAME = "Error List"
+ERROR_LAYER_CRS = "EPSG:4326"
+# Custom property of an error layer naming the layers it lists errors of
+SOURCES_PROPERTY = "error_list_checker/sources"
+
+# Number of error features handed to a provider or file writer at once
+ERROR_BATCH_SIZE = 5000
+
+# Output formats offered for the error list: label -> OGR driver (None = memory)
+OUTPUT_FORMATS = {
+    "Temporary layer": None,
+    "GeoPackage": "GPKG",
+    "FlatGeobuf": "FlatGeobuf",
+}
+OUTPUT_EXTENSIONS = {
+    "GPKG": "gpkg",
+    "FlatGeobuf": "fgb",
+}
+
+STYLE_PATH = os.path.join(os.path.dirname(__file__), "error-list-style.qml")
+
+# Rendering settings of an error list:
+#   max_labels: labels drawn per rule and map render at most (0 = all)
+#   label_obstacles: whether labels avoid each other's points
+#   min_scale: layer hidden when zoomed out past 1:min_scale (0 = never)
+StyleOptions = namedtuple('StyleOptions', 'max_labels label_obstacles min_scale')
+
+# Settings by size of the error list, as (from error count, options)
+STYLE_TIERS = [
+    (0, StyleOptions(0, True, 0)),
+    (20000, StyleOptions(2000, True, 0)),
+    (200000, StyleOptions(1000, False, 250000)),
+]
+
+# Fields holding the label text of render-optimized error lists, by the
+# label expression of error-list-style.qml they replace
+ERROR_LABEL_FIELD = "error_label"
+RECOMMEND_LABEL_FIELD = "recommend_label"
+LABEL_FIELDS = {
+    "'ERROR: ' || \"cbms_geoid\"": ERROR_LABEL_FIELD,
+    "'RECOMMEND: ' || \"recommended_sector\"": RECOMMEND_LABEL_FIELD,
+}
+
+# Errors from which render-optimized error lists draw their points clustered
+CLUSTER_THRESHOLD = 100000
+# Distance (in millimeters on screen) within which points are clustered
+CLUSTER_DISTANCE = 4
+
+# Memory layer holding the parsed QML, as (file mtime, layer)
+_style_template = None
+
+
+def error_fields(labels=False):
+    """Return the attribute schema of the Error List layer.
+
+    :param labels: Add the fields holding the label text, see LABEL_FIELDS.
+    """
+    fields = QgsFields()
+    fields.append(QgsField("cbms_geoid", QVariant.String))
+    fields.append(QgsField("recommended_sector", QVariant.String))
+    fields.append(QgsField("remark", QVariant.String))
+    fields.append(QgsField("source_layer", QVariant.String))
+    fields.append(QgsField("source_fid", QVariant.LongLong))
+    if labels:
+        fields.append(QgsField(ERROR_LABEL_FIELD, QVariant.String))
+        fields.append(QgsField(RECOMMEND_LABEL_FIELD, QVariant.String))
+    return fields
+
+
+def label_text(prefix, value):
+    """Return ``prefix || value`` as the labeling expression would, NULL included."""
+    if value is None or isinstance(value, QVariant):
+        return None
+    return prefix + str(value)
+
+
+def error_feature(fields, error, source_name, geometry=None):
+    """Build the Error List feature of a core.engine.ErrorRow.
+
+    :param fields: Fields of the error list, from error_fields().
+    :param error: The error found for a source feature.
+    :param source_name: Name of the layer the source feature belongs to.
+    :param geometry: Point to place the error at, if any.
+    """
+    feature = QgsFeature(fields)
+    attributes = [error.cbms_geoid, error.recommended_sector, error.remark, source_name, error.fid]
+    if fields.indexOf(ERROR_LABEL_FIELD) >= 0:
+        attributes += [
+            label_text("ERROR: ", error.cbms_geoid),
+            label_text("RECOMMEND: ", error.recommended_sector)]
+    feature.setAttributes(attributes)
+    if geometry is not None:
+        feature.setGeometry(geometry)
+    return feature
+
+
+def sources_key(layers):
+    """Return the SOURCES_PROPERTY value of an error list of ``layers``."""
+    return ",".join(sorted(layer.id() for layer in layers))
+
+
+def style_options(feature_count):
+    """Return the StyleOptions of the tier ``feature_count`` falls in."""
+    options = STYLE_TIERS[0][1]
+    for minimum, tier_options in STYLE_TIERS:
+        if feature_count >= minimum:
+            options = tier_options
+    return options
+
+
+def style_template():
+    """Return a layer styled with error-list-style.qml, parsed only once.
+
+    The file is read again only if it changed on disk.
+
+    :raises IOError: The QML file is missing or invalid.
+    """
+    global _style_template
+    try:
+        mtime = os.stat(STYLE_PATH).st_mtime_ns
+    except OSError:
+        raise IOError("Failed to find the QML style file.")
+    if _style_template is None or _style_template[0] != mtime:
+        layer = QgsVectorLayer(f"Point?crs={ERROR_LAYER_CRS}", ERROR_LAYER_NAME, "memory")
+        message, ok = layer.loadNamedStyle(
+            STYLE_PATH, categories=QgsMapLayer.Symbology | QgsMapLayer.Labeling)
+        if not ok:
+            raise IOError(f"Failed to load the QML style file: {message}")
+        _style_template = (mtime, layer)
+    return _style_template[1]
+
+
+def style_error_layer(layer, feature_count=None, cluster_threshold=None):
+    """Apply the Error List style to ``layer``, tuned to its size.
+
+    Clones the renderer and labeling of :func:`style_template` instead of
+    parsing the QML for every new error layer. Labels are read from the
+    LABEL_FIELDS of the layer, if it has them, instead of being evaluated
+    on every repaint.
+
+    :param layer: Error list layer.
+    :param feature_count: Number of errors, by default the layer's own count.
+    :param cluster_threshold: Number of errors from which points are drawn
+        with a point cluster renderer, None to never cluster them.
+    """
+    template = style_template()
+    if feature_count is None:
+        feature_count = layer.featureCount()
+    options = style_options(feature_count)
+    renderer = template.renderer().clone()
+    if cluster_threshold is not None and feature_count >= cluster_threshold:
+        cluster_renderer = QgsPointClusterRenderer()
+        cluster_renderer.setEmbeddedRenderer(renderer)
+        cluster_renderer.setTolerance(CLUSTER_DISTANCE)
+        cluster_renderer.setToleranceUnit(QgsUnitTypes.RenderMillimeters)
+        renderer = cluster_renderer
+    layer.setRenderer(renderer)
+    field_names = layer.fields().names()
+    labeling = template.labeling()
+    if labeling is not None:
+        labeling = labeling.clone()
+        for rule in labeling.rootRule().children():
+            settings = rule.settings()
+            if settings is None:
+                continue
+            settings = QgsPalLayerSettings(settings)
+            label_field = LABEL_FIELDS.get(settings.fieldName) if settings.isExpression else None
+            if label_field in field_names:
+                settings.fieldName = label_field
+                settings.isExpression = False
+            settings.limitNumLabels = options.max_labels > 0
+            if options.max_labels:
+                settings.maxNumLabels = options.max_labels
+            obstacles = settings.obstacleSettings()
+            obstacles.setIsObstacle(options.label_obstacles)
+            settings.setObstacleSettings(obstacles)
+            rule.setSettings(settings)
+        layer.setLabeling(labeling)
+    layer.setLabelsEnabled(template.labelsEnabled())
+    layer.setScaleBasedVisibility(options.min_scale > 0)
+    if options.min_scale:
+        layer.setMinimumScale(options.min_scale)
+    layer.triggerRepaint()
+
+
+class MemoryErrorListWriter:
+    """Collects error features and loads them into a memory layer.
+
+    Features are kept in RAM until :meth:`create_layer` is called on the main
+    thread, where they are added to the provider in batches. With
+    ``render_optimized``, the label text is stored in the LABEL_FIELDS and
+    the layer gets a spatial index, for lists too large to draw otherwise.
+    """
+
+    def __init__(self, render_optimized=False):
+        self.fields = error_fields(render_optimized)
+        self.render_optimized = render_optimized
+        self.features = []
+
+    def add_features(self, features):
+        self.features.extend(features)
+
+    def take_features(self):
+        """Return the collected features, leaving the writer empty."""
+        features, self.features = self.features, []
+        return features
+
+    def finish(self):
+        pass
+
+    def discard(self):
+        """Drop the features of a run that did not complete."""
+        self.features = []
+
+    def create_layer(self):
+        layer = QgsVectorLayer(f"Point?crs={ERROR_LAYER_CRS}", ERROR_LAYER_NAME, "memory")
+        provider = layer.dataProvider()
+        provider.addAttributes(self.fields.toList())
+        layer.updateFields()
+        for start in range(0, len(self.features), ERROR_BATCH_SIZE):
+            provider.addFeatures(self.features[start:start + ERROR_BATCH_SIZE], QgsFeatureSink.FastInsert)
+        self.features = []
+        if self.render_optimized:
+            provider.createSpatialIndex()
+        layer.updateExtents()
+        return layer
+
+
+class SinkErrorListWriter:
+    """Writes error features to an existing feature sink.
+
+    Used by the Processing algorithm, where the output sink (and so the file
+    format and location) is chosen by the framework.
+    """
+
+    def __init__(self, sink, fields):
+        self.sink = sink
+        self.fields = fields
+
+    def add_features(self, features):
+        if not self.sink.addFeatures(features, QgsFeatureSink.FastInsert):
+            raise IOError("Cannot write to the output layer")
+
+    def finish(self):
+        pass
+
+
+class SharedErrorListWriter:
+    """Serializes access to a writer fed by several threads at once.
+
+    Used when several layers are checked concurrently into one merged
+    error list; each batch is written in one piece.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.fields = writer.fields
+        self.lock = threading.Lock()
+
+    def add_features(self, features):
+        with self.lock:
+            self.writer.add_features(features)
+
+    def finish(self):
+        with self.lock:
+            self.writer.finish()
+
+    def create_layer(self):
+        return self.writer.create_layer()
+
+    def take_features(self):
+        return self.writer.take_features()
+
+    def discard(self):
+        self.writer.discard()
+
+
+class FileErrorListWriter:
+    """Streams error features to a GeoPackage or FlatGeobuf file.
+
+    The writer can be fed from a background task; only the batch being
+    written is held in memory. The finished file is loaded as the Error List
+    layer, so results also survive a QGIS restart. Both formats are written
+    with a spatial index; ``render_optimized`` also stores the label text
+    in the LABEL_FIELDS.
+
+    Features go to a ``.partial`` file next to ``path``, moved over it by
+    :meth:`create_layer`: a layer still reading ``path`` (the error list of
+    the previous run) keeps it open, which Windows does not allow to
+    overwrite. Release such a layer before calling :meth:`create_layer`.
+    """
+
+    def __init__(self, path, driver, transform_context, render_optimized=False):
+        self.path = path
+        root, extension = os.path.splitext(path)
+        self.partial_path = f"{root}.partial{extension}"
+        self.driver = driver
+        self.fields = error_fields(render_optimized)
+        self.layer_name = "error_list"
+
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.driverName = driver
+        options.fileEncoding = "UTF-8"
+        options.layerName = self.layer_name
+        options.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteFile
+        options.layerOptions = ["SPATIAL_INDEX=YES"]
+        self.writer = QgsVectorFileWriter.create(
+            self.partial_path,
+            self.fields,
+            QgsWkbTypes.Point,
+            QgsCoordinateReferenceSystem(ERROR_LAYER_CRS),
+            transform_context,
+            options,
+        )
+        if self.writer.hasError() != QgsVectorFileWriter.NoError:
+            raise IOError(f"Cannot create {path}: {self.writer.errorMessage()}")
+
+    def add_features(self, features):
+        if not self.writer.addFeatures(features, QgsFeatureSink.FastInsert):
+            raise IOError(f"Cannot write to {self.path}: {self.writer.errorMessage()}")
+
+    def finish(self):
+        # Deleting the writer flushes and closes the file
+        if self.writer is not None:
+            del self.writer
+            self.writer = None
+
+    def discard(self):
+        """Delete the partial file of a run that did not complete."""
+        self.finish()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def create_layer(self):
+        """Move the finished file over ``path`` and load it.
+
+        :raises IOError: ``path`` is held by another program or layer, or
+            cannot be loaded.
+        """
+        try:
+            if self.driver == "GPKG":
+                # The journal of the previous file would be applied to the new one
+                for suffix in ("-wal", "-shm"):
+                    if os.path.exists(self.path + suffix):
+                        os.remove(self.path + suffix)
+            os.replace(self.partial_path, self.path)
+        except OSError as e:
+            raise IOError(f"Cannot replace {os.path.basename(self.path)}, is it open elsewhere? ({e})")
+        uri = self.path
+        if self.driver == "GPKG":
+            uri = f"{self.path}|layername={self.layer_name}"
+        layer = QgsVectorLayer(uri, ERROR_LAYER_NAME, "ogr")
+        if not layer.isValid():
+            raise IOError(f"Cannot load {os.path.basename(self.path)} as the error list")
+        return layer
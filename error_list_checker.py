@@ -1,23 +1,30 @@
 from qgis.PyQt.QtWidgets import QAction, QToolBar
-from qgis.core import QgsProject
-from .error_list_checker_dialog import ErrorListCheckerDialog
+from qgis.core import QgsApplication, QgsProject
+from .error_list_checker_provider import ErrorListCheckerProvider
+from .plugin_icon import plugin_icon
 import os
-from qgis.PyQt.QtGui import QIcon  # Import QIcon to use for icons
 
 class ErrorListChecker:
     def __init__(self, iface):
         self.iface = iface
         self.plugin_dir = os.path.dirname(__file__)
-        self.dlg = ErrorListCheckerDialog(self.iface)
         self.menu = 'GMD Plugins'
         self.dialog = None
         self.action = None
         self.toolbar = None  # Initialize toolbar variable
+        self.provider = None
+
+    def initProcessing(self):
+        # Also called on its own by qgis_process, without initGui
+        if self.provider:
+            return
+        self.provider = ErrorListCheckerProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
 
     def initGui(self):
-        # Load the icon for the action
-        icon_path = os.path.join(self.plugin_dir, 'icon.png')  # Path to your icon
-        self.action = QAction(QIcon(icon_path), "Error List Checker", self.iface.mainWindow())
+        self.initProcessing()
+
+        self.action = QAction(plugin_icon(), "Error List Checker", self.iface.mainWindow())
         self.action.triggered.connect(self.run)
 
         # Create or get the custom toolbar
@@ -33,8 +40,13 @@ class ErrorListChecker:
     def unload(self):
         self.iface.removePluginMenu(self.menu, self.action)
         self.toolbar.removeAction(self.action)  # Remove action from the toolbar
+        if self.provider:
+            QgsApplication.processingRegistry().removeProvider(self.provider)
+            self.provider = None
 
     def run(self):
         if not self.dialog:
+            # Built on first use so QGIS starts without the dialog, the engine or the criteria
+            from .error_list_checker_dialog import ErrorListCheckerDialog
             self.dialog = ErrorListCheckerDialog(self.iface)
         self.dialog.show()
@@ -0,0 +1,190 @@
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingOutputNumber,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingFeatureSourceDefinition,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterNumber,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QCoreApplication
+
+from .core.backends import AUTO, BACKENDS, choose_backend
+
+
+class ErrorListCheckAlgorithm(QgsProcessingAlgorithm):
+    """Processing algorithm running the same check as the dialog.
+
+    Usable from the toolbox, the Graphical Modeler, batch mode and
+    ``qgis_process run errorlistchecker:errorlistcheck``.
+    """
+
+    INPUT = 'INPUT'
+    CRITERIA = 'CRITERIA'
+    WORKERS = 'WORKERS'
+    FINGERPRINTS = 'FINGERPRINTS'
+    MATCHER = 'MATCHER'
+    MATCHERS = [AUTO] + list(BACKENDS)
+    FULL_TEXT_INDEX = 'FULL_TEXT_INDEX'
+    OUTPUT = 'OUTPUT'
+    ERROR_COUNT = 'ERROR_COUNT'
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def createInstance(self):
+        return ErrorListCheckAlgorithm()
+
+    def name(self):
+        return 'errorlistcheck'
+
+    def displayName(self):
+        return self.tr('Error List Check')
+
+    def shortHelpString(self):
+        return self.tr(
+            'Checks the facility names (fac_name) of an _SF layer against the '
+            'validation criteria keywords and lists the features whose sector '
+            'does not match the recommended one. Leave the criteria file empty '
+            'to use the criteria shipped with the plugin. With more than one '
+            'worker process, matching is split across processes; plain '
+            'GeoPackage inputs are then also read in parallel by fid range. '
+            'A fingerprint store (SQLite file, created if missing) lets '
+            'single-process runs skip features unchanged since the previous '
+            'run of the same layer. The matcher picks the implementation of '
+            'the keyword matching; "auto" times them on a sample of the '
+            'input and uses the fastest. The full-text index option finds the '
+            'candidate errors of GeoPackage inputs through an FTS5 index of the '
+            'facility names, kept next to the GeoPackage and updated on each run.')
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(QgsProcessingParameterFeatureSource(
+            self.INPUT,
+            self.tr('Input layer'),
+            [QgsProcessing.TypeVector]))
+        self.addParameter(QgsProcessingParameterFile(
+            self.CRITERIA,
+            self.tr('Validation criteria file'),
+            extension='json',
+            optional=True))
+        self.addParameter(QgsProcessingParameterNumber(
+            self.WORKERS,
+            self.tr('Worker processes'),
+            QgsProcessingParameterNumber.Integer,
+            defaultValue=1,
+            minValue=1))
+        # A destination, as the store is created if missing and written by each run
+        self.addParameter(QgsProcessingParameterFileDestination(
+            self.FINGERPRINTS,
+            self.tr('Fingerprint store'),
+            fileFilter=self.tr('SQLite files (*.sqlite)'),
+            optional=True,
+            createByDefault=False))
+        self.addParameter(QgsProcessingParameterEnum(
+            self.MATCHER,
+            self.tr('Matcher'),
+            options=self.MATCHERS,
+            defaultValue=0))
+        self.addParameter(QgsProcessingParameterBoolean(
+            self.FULL_TEXT_INDEX,
+            self.tr('Use full-text index (GeoPackage)'),
+            defaultValue=False))
+        self.addParameter(QgsProcessingParameterFeatureSink(
+            self.OUTPUT,
+            self.tr('Error List'),
+            QgsProcessing.TypeVectorPoint))
+        self.addOutput(QgsProcessingOutputNumber(
+            self.ERROR_COUNT,
+            self.tr('Number of errors')))
+
+    def processAlgorithm(self, parameters, context, feedback):
+        # Imported here rather than at plugin load, when QGIS lists the algorithm
+        from .check_engine import (
+            ErrorCheckEngine, full_text_index, gpkg_source, load_plugin_criteria, pushdown_filter, sample_names)
+        from .core.fingerprint import FingerprintStore, layer_key
+        from .error_layer import ERROR_LAYER_CRS, SinkErrorListWriter, error_fields
+
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+        if source is None:
+            raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
+
+        criteria_path = self.parameterAsFile(parameters, self.CRITERIA, context)
+        try:
+            criteria = load_plugin_criteria(criteria_path or None)
+        except Exception as e:
+            raise QgsProcessingException(f"Failed to load JSON file: {e}")
+
+        fields = error_fields()
+        sink, dest_id = self.parameterAsSink(
+            parameters, self.OUTPUT, context, fields,
+            QgsWkbTypes.Point, QgsCoordinateReferenceSystem(ERROR_LAYER_CRS))
+        if sink is None:
+            raise QgsProcessingException(self.invalidSinkError(parameters, self.OUTPUT))
+
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+        gpkg = None
+        fts_index = None
+        definition = parameters[self.INPUT]
+        if not (isinstance(definition, QgsProcessingFeatureSourceDefinition)
+                and definition.selectedFeaturesOnly):
+            layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+            if workers > 1:
+                gpkg = gpkg_source(layer)
+            if self.parameterAsBoolean(parameters, self.FULL_TEXT_INDEX, context):
+                fts_index = full_text_index(layer)
+
+        fingerprints = None
+        fingerprint_path = self.parameterAsFileOutput(parameters, self.FINGERPRINTS, context)
+        if fingerprint_path:
+            layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+            source_key = layer.publicSource() if layer else str(parameters[self.INPUT])
+            fingerprints = FingerprintStore(fingerprint_path).session(layer_key(source_key), criteria)
+
+        matcher = self.MATCHERS[self.parameterAsEnum(parameters, self.MATCHER, context)]
+        try:
+            backend, timings = choose_backend(
+                matcher, criteria, sample_names(source, source.fields()) if matcher == AUTO else ())
+            engine = ErrorCheckEngine(
+                source, source.fields(), criteria, SinkErrorListWriter(sink, fields),
+                workers=workers, gpkg=gpkg, source_name=source.sourceName(),
+                fingerprints=fingerprints, backend=backend,
+                pushdown=pushdown_filter(self.parameterAsVectorLayer(parameters, self.INPUT, context), criteria),
+                feature_count=source.featureCount(), fts_index=fts_index)
+        except ValueError as e:
+            raise QgsProcessingException(str(e))
+        engine.metrics.info['backend'] = backend.name
+        feedback.pushInfo(f"Matcher: {backend.name}")
+        if timings:
+            feedback.pushDebugInfo("Matcher timings: " + ", ".join(
+                f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items()))
+
+        total = source.featureCount()
+
+        def on_progress(processed, elapsed):
+            if total > 0:
+                feedback.setProgress(100.0 * processed / total)
+
+        writer = engine.writer
+        try:
+            engine.run(feedback.isCanceled, on_progress)
+        finally:
+            writer.finish()
+        feedback.pushInfo(
+            f"Errors detected: {engine.error_count} in {engine.processed} features "
+            f"({engine.processed / engine.elapsed if engine.elapsed else 0:,.0f} features/s)")
+
+        feedback.pushDebugInfo(f"Run metrics:\n{engine.metrics.summary()}")
+        if fingerprints:
+            feedback.pushInfo(f"Unchanged features reusing their previous verdict: {fingerprints.reused}")
+
+        results = {self.OUTPUT: dest_id, self.ERROR_COUNT: engine.error_count}
+        if fingerprint_path:
+            results[self.FINGERPRINTS] = fingerprint_path
+        return results
@@ -1,14 +1,30 @@
-from qgis.PyQt.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QPushButton, QMessageBox
-from qgis.core import QgsProject, QgsVectorLayer, QgsField, QgsFeature
-from qgis.PyQt.QtCore import QVariant, QSettings
+from qgis.PyQt.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QPushButton, QMessageBox, QProgressBar, QSpinBox, QCheckBox
+from qgis.core import Qgis, QgsApplication, QgsMessageLog, QgsProject, QgsVectorLayer
+from qgis.gui import QgsFileWidget
+from qgis.PyQt.QtCore import QSettings
 from qgis.PyQt.QtGui import QColor
-import os
-import json
+
+from .core.cache import DEFAULT_MAXSIZE, MatchCache
+from .check_engine import fingerprint_store_path, load_plugin_criteria, sample_names
+from .core.backends import AUTO, BACKENDS, SAMPLE_SIZE, create_backend, select_backend
+from .core.fingerprint import FingerprintStore
+from .core.metrics import BACKEND_SELECTION, CRITERIA_LOAD, LAYER_ADD, STYLING, RunMetrics
+from .core.parallel import default_workers
+from .error_check_task import ErrorCheckTask
+from .error_layer import (
+    CLUSTER_THRESHOLD, ERROR_LAYER_CRS, OUTPUT_EXTENSIONS, OUTPUT_FORMATS, SOURCES_PROPERTY, FileErrorListWriter,
+    MemoryErrorListWriter, sources_key, style_error_layer)
+from .live_validation import LiveValidator, supports_live_validation, update_error_list
 
 class ErrorListCheckerDialog(QDialog):
     def __init__(self, iface):
         super().__init__()
         self.iface = iface  # Save iface for later use
+        self.task = None  # Running ErrorCheckTask, if any
+        self.live_validators = {}  # source layer id -> LiveValidator
+        # Per-name match results, kept across runs until the criteria change
+        self.match_cache = MatchCache(int(QSettings().value("error_list_checker/match_cache_size", DEFAULT_MAXSIZE)))
+        self.auto_backends = {}  # criteria version -> backend picked by benchmark
         self.setWindowTitle('Error List Checker')
         self.setFixedWidth(300)  # Set the width of the dialog to 300 pixels
 
@@ -21,12 +37,102 @@ class ErrorListCheckerDialog(QDialog):
         self.layout.addWidget(self.label_layer)
         self.combo_layers = QComboBox()
         self.layout.addWidget(self.combo_layers)
+        self.check_all_layers = QCheckBox('Check all _SF layers')
+        self.check_all_layers.toggled.connect(lambda checked: self.combo_layers.setEnabled(not checked))
+        self.layout.addWidget(self.check_all_layers)
+
+        # Output of the error list
+        self.label_output = QLabel('Save Error List to:')
+        self.layout.addWidget(self.label_output)
+        self.combo_output = QComboBox()
+        self.combo_output.addItems(list(OUTPUT_FORMATS))
+        self.layout.addWidget(self.combo_output)
+        self.output_file = QgsFileWidget()
+        self.output_file.setStorageMode(QgsFileWidget.SaveFile)
+        self.layout.addWidget(self.output_file)
+        self.combo_output.currentTextChanged.connect(self.update_output_widgets)
+
+        # Worker processes for very large layers (1 = check inside QGIS)
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel('Worker processes:'))
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(1, default_workers())
+        workers_layout.addWidget(self.spin_workers)
+        self.layout.addLayout(workers_layout)
+
+        # Matching implementation; "auto" benchmarks them on the layer's names
+        backend_layout = QHBoxLayout()
+        backend_layout.addWidget(QLabel('Matcher:'))
+        self.combo_backend = QComboBox()
+        self.combo_backend.addItems([AUTO] + list(BACKENDS))
+        backend_layout.addWidget(self.combo_backend)
+        self.layout.addLayout(backend_layout)
+
+        # Reuse the verdicts of features unchanged since the previous run
+        self.check_fingerprints = QCheckBox('Skip features unchanged since last run')
+        self.layout.addWidget(self.check_fingerprints)
+
+        # Find candidate errors of GeoPackage layers through a full-text index
+        self.check_fts = QCheckBox('Use full-text index (GeoPackage)')
+        self.layout.addWidget(self.check_fts)
+
+        # Re-validate edited features into the error list as they change
+        self.check_live = QCheckBox('Update error list while editing')
+        self.layout.addWidget(self.check_live)
+
+        # Stored label text and spatial index, clustered points for big lists
+        self.check_render = QCheckBox('Optimize rendering of large error lists')
+        self.layout.addWidget(self.check_render)
+        cluster_layout = QHBoxLayout()
+        cluster_layout.addWidget(QLabel('Cluster points from (errors):'))
+        self.spin_cluster = QSpinBox()
+        self.spin_cluster.setRange(1, 100000000)
+        self.spin_cluster.setSingleStep(10000)
+        cluster_layout.addWidget(self.spin_cluster)
+        self.layout.addLayout(cluster_layout)
+
+        # Optional JSON-lines file receiving the stage timings of each run
+        self.layout.addWidget(QLabel('Run metrics file (optional):'))
+        self.metrics_file = QgsFileWidget()
+        self.metrics_file.setStorageMode(QgsFileWidget.SaveFile)
+        self.metrics_file.setFilter("JSON lines (*.jsonl)")
+        self.layout.addWidget(self.metrics_file)
+
+        settings = QSettings()
+        self.combo_output.setCurrentText(settings.value("error_list_checker/output_format", "Temporary layer"))
+        self.output_file.setFilePath(settings.value("error_list_checker/output_path", ""))
+        self.spin_workers.setValue(int(settings.value("error_list_checker/workers", 1)))
+        self.combo_backend.setCurrentText(settings.value("error_list_checker/matcher_backend", AUTO))
+        # Choosing "auto" again benchmarks again on the next run
+        self.combo_backend.currentTextChanged.connect(lambda name: self.auto_backends.clear())
+        self.check_live.setChecked(settings.value("error_list_checker/live", False, type=bool))
+        self.check_render.setChecked(settings.value("error_list_checker/render_optimized", False, type=bool))
+        self.spin_cluster.setValue(int(settings.value("error_list_checker/cluster_threshold", CLUSTER_THRESHOLD)))
+        self.check_render.toggled.connect(self.spin_cluster.setEnabled)
+        self.spin_cluster.setEnabled(self.check_render.isChecked())
+        self.check_fingerprints.setChecked(settings.value("error_list_checker/fingerprints", False, type=bool))
+        self.check_fts.setChecked(settings.value("error_list_checker/fts", False, type=bool))
+        self.metrics_file.setFilePath(settings.value("error_list_checker/metrics_path", ""))
+        self.update_output_widgets()
 
         # Run Button
         self.run_button = QPushButton('Run Check')
         self.run_button.clicked.connect(self.run_error_check)
         self.layout.addWidget(self.run_button)
 
+        # Progress of the background check
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setVisible(False)
+        self.layout.addWidget(self.progress_bar)
+        self.status_label = QLabel()
+        self.status_label.setVisible(False)
+        self.layout.addWidget(self.status_label)
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.clicked.connect(self.cancel_error_check)
+        self.cancel_button.setVisible(False)
+        self.layout.addWidget(self.cancel_button)
+
         # Add version label at the bottom
         version_label = QLabel("GMD | Version: 1.1")
         self.layout.addWidget(version_label)
@@ -54,101 +160,318 @@ class ErrorListCheckerDialog(QDialog):
         else:
             self.label_layer.setText("Select a Layer:")
 
+    def update_output_widgets(self):
+        """Only ask for a file path when the error list is saved to disk."""
+        driver = OUTPUT_FORMATS.get(self.combo_output.currentText())
+        self.output_file.setVisible(driver is not None)
+        if driver:
+            extension = OUTPUT_EXTENSIONS[driver]
+            self.output_file.setFilter(f"{self.combo_output.currentText()} (*.{extension})")
+
+    def create_writer(self):
+        """Return the error list writer for the chosen output, or None if invalid."""
+        output_format = self.combo_output.currentText()
+        driver = OUTPUT_FORMATS[output_format]
+        settings = QSettings()
+        settings.setValue("error_list_checker/output_format", output_format)
+        render_optimized = self.check_render.isChecked()
+        settings.setValue("error_list_checker/render_optimized", render_optimized)
+        settings.setValue("error_list_checker/cluster_threshold", self.spin_cluster.value())
+        if driver is None:
+            return MemoryErrorListWriter(render_optimized)
+
+        path = self.output_file.filePath()
+        if not path:
+            QMessageBox.warning(self, "Warning", "Please choose where to save the error list.")
+            return None
+        extension = "." + OUTPUT_EXTENSIONS[driver]
+        if not path.lower().endswith(extension):
+            path += extension
+        settings.setValue("error_list_checker/output_path", path)
+        try:
+            return FileErrorListWriter(path, driver, QgsProject.instance().transformContext(), render_optimized)
+        except IOError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return None
+
     def run_error_check(self):
-        layer = self.combo_layers.currentData()
-        if not layer:
+        if self.task:
+            QMessageBox.warning(self, "Warning", "An error check is already running.")
+            return
+
+        if self.check_all_layers.isChecked():
+            layers = [self.combo_layers.itemData(index) for index in range(self.combo_layers.count())]
+        else:
+            layers = [self.combo_layers.currentData()] if self.combo_layers.currentData() else []
+        if not layers:
             QMessageBox.warning(self, "Warning", "Please select a layer.")
             return
 
-        # Define the path to the JSON file within the plugin folder
-        plugin_path = os.path.dirname(__file__)
-        json_file_path = os.path.join(plugin_path, "validation_criteria.json")
+        metrics = RunMetrics(layers=[layer.name() for layer in layers], workers=self.spin_workers.value())
 
-        # Load validation criteria from the JSON file
+        # Load validation criteria from the JSON file within the plugin folder
         try:
-            with open(json_file_path, 'r') as json_file:
-                validation_criteria = json.load(json_file)
+            with metrics.stage(CRITERIA_LOAD):
+                criteria = load_plugin_criteria()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load JSON file: {e}")
             return
 
-        # Define the attribute fields
-        cbms_geoid_field = 'cbms_geoid'  # Field for geoid
-        fac_name_field = 'fac_name'  # Replace with actual facility name field
-        sector_field = 'sector'  # Replace with actual sector field
-
-        # Create a new temporary memory layer for storing the error list
-        error_layer = QgsVectorLayer("Point?crs=EPSG:4326", "Error List", "memory")
-        provider = error_layer.dataProvider()
-
-        # Add fields for CBMS geoid, recommended category, and remark
-        provider.addAttributes([
-            QgsField("cbms_geoid", QVariant.String),
-            QgsField("recommended_sector", QVariant.String),
-            QgsField("remark", QVariant.String)
-        ])
-        error_layer.updateFields()
-
-        error_count = 0  # Initialize error count
-
-        # Iterate through features in the selected layer
-        for feature in layer.getFeatures():
-            fac_name_value = feature[fac_name_field]  # Facility name from the layer
-            sector_value = feature[sector_field]  # Sector from the layer
-            cbms_geoid = feature[cbms_geoid_field]  # Geoid from the layer
-
-            matched_sector = None  # Variable to store the recommended sector based on keywords
-            keyword_matched = None  # Track which keyword caused the match
-
-            # Check against all validation criteria
-            for category in validation_criteria['categories']:
-                for keyword in category['keywords']:
-                    if keyword.lower() in str(fac_name_value).lower():
-                        matched_sector = category['sector']
-                        keyword_matched = keyword
-                        break
-                if matched_sector:
-                    break
-
-            # If a match is found but the sector is incorrect, update it and add to error list
-            if matched_sector and matched_sector != sector_value:
-                # Create a new feature for the error list
-                error_feature = QgsFeature()
-
-                # Set the CBMS geoid, the recommended category (sector from JSON), and the remark
-                error_feature.setFields(error_layer.fields())
-                error_feature.setAttribute("cbms_geoid", cbms_geoid)
-                error_feature.setAttribute("recommended_sector", matched_sector)
-                error_feature.setAttribute(
-                    "remark", 
-                    f"Incorrect sector: '{sector_value}'. Recommended sector is '{matched_sector}' based on the keyword '{keyword_matched}'. Please verify and update the sector."
-                )
-
-                # Optionally, add geometry if needed (e.g., point at feature's centroid)
-                if feature.hasGeometry():
-                    geom = feature.geometry().centroid()
-                    error_feature.setGeometry(geom)
-
-                # Add the feature to the error layer
-                provider.addFeature(error_feature)
-                error_count += 1  # Increment the error count
-
-        # Add the error layer to the QGIS project
-        QgsProject.instance().addMapLayer(error_layer)
+        # Error lists kept live only need the features touched by a criteria edit
+        if self.apply_criteria_delta(layers, criteria):
+            return
+
+        try:
+            with metrics.stage(BACKEND_SELECTION):
+                backend = self.matcher_backend(criteria, layers)
+        except ValueError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        metrics.info['backend'] = backend.name
+
+        writer = self.create_writer()
+        if writer is None:
+            return
+
+        # Scan and match in the background so QGIS stays responsive
+        try:
+            workers = self.spin_workers.value()
+            QSettings().setValue("error_list_checker/workers", workers)
+            QSettings().setValue("error_list_checker/fingerprints", self.check_fingerprints.isChecked())
+            QSettings().setValue("error_list_checker/fts", self.check_fts.isChecked())
+            fingerprint_store = FingerprintStore(fingerprint_store_path()) if self.check_fingerprints.isChecked() else None
+            task = ErrorCheckTask(
+                layers, criteria, writer, self.match_cache, workers, fingerprint_store, metrics, backend,
+                self.check_fts.isChecked())
+        except ValueError as e:
+            writer.discard()
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        task.progressChanged.connect(lambda progress: self.progress_bar.setValue(int(progress)))
+        task.statusChanged.connect(self.status_label.setText)
+        task.taskCompleted.connect(lambda: self.on_check_completed(task))
+        task.taskTerminated.connect(lambda: self.on_check_terminated(task))
+        self.set_running(True)
+        self.task = task
+        QgsApplication.taskManager().addTask(task)
+
+    def cancel_error_check(self):
+        if self.task:
+            self.task.cancel()
+
+    def set_running(self, running):
+        """Toggle the widgets between the idle and running states."""
+        self.run_button.setEnabled(not running)
+        self.combo_layers.setEnabled(not running and not self.check_all_layers.isChecked())
+        self.check_all_layers.setEnabled(not running)
+        self.combo_output.setEnabled(not running)
+        self.output_file.setEnabled(not running)
+        self.spin_workers.setEnabled(not running)
+        self.combo_backend.setEnabled(not running)
+        self.check_live.setEnabled(not running)
+        self.check_render.setEnabled(not running)
+        self.spin_cluster.setEnabled(not running and self.check_render.isChecked())
+        self.check_fingerprints.setEnabled(not running)
+        self.check_fts.setEnabled(not running)
+        self.metrics_file.setEnabled(not running)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(running)
+        self.status_label.setVisible(running)
+        self.cancel_button.setVisible(running)
+        if running:
+            self.status_label.setText("Starting...")
+
+    def find_error_layer(self, layers):
+        """Return the error layer of an earlier check of ``layers``, if still in the project."""
+        key = sources_key(layers)
+        for layer in QgsProject.instance().mapLayers().values():
+            if layer.customProperty(SOURCES_PROPERTY) == key:
+                return layer
+        return None
+
+    def place_error_layer(self, task):
+        """Put the errors of ``task`` in the project, reusing the previous error layer.
+
+        A temporary error list of the same layers is updated in place with a
+        keyed diff; a file error list reading the same file is pointed back
+        at it once the new file is in place. Otherwise the new layer is added
+        and replaces the previous one.
+        """
+        project = QgsProject.instance()
+        existing = self.find_error_layer(task.layers)
+        if existing is not None and existing.isEditable():
+            # Leave an error list being edited alone
+            existing = None
+        if (existing is not None and existing.providerType() == "memory"
+                and OUTPUT_FORMATS[self.combo_output.currentText()] is None
+                and existing.fields().names() == task.writer.fields.names()):
+            diff = update_error_list(existing, task.writer.take_features())
+            QgsMessageLog.logMessage(
+                f"Error list updated in place: {len(diff.inserts)} added, {len(diff.deletes)} resolved, "
+                f"{len(diff.updates)} changed",
+                "Error List Checker", Qgis.Info)
+            return existing
+
+        released = None
+        if existing is not None and existing.providerType() == "ogr":
+            # Let go of the previous file so the new one can replace it
+            released = existing.source()
+            existing.setDataSource(f"Point?crs={ERROR_LAYER_CRS}", existing.name(), "memory")
+        try:
+            error_layer = task.writer.create_layer()
+        except IOError:
+            if released is not None:
+                existing.setDataSource(released, existing.name(), "ogr")
+            raise
+        if released is not None and released == error_layer.source():
+            existing.setDataSource(released, existing.name(), "ogr")
+            existing.triggerRepaint()
+            return existing
+        if existing is not None:
+            project.removeMapLayer(existing.id())
+        error_layer.setCustomProperty(SOURCES_PROPERTY, sources_key(task.layers))
+        project.addMapLayer(error_layer)
+        return error_layer
+
+    def start_live_validation(self, task, error_layer):
+        """Attach a LiveValidator to each checked layer, replacing older ones.
+
+        Error lists whose rows cannot be edited (FlatGeobuf) are left alone.
+        """
+        if not supports_live_validation(error_layer):
+            QgsMessageLog.logMessage(
+                f"{error_layer.name()} cannot be updated while editing; rerun the check after edits",
+                "Error List Checker", Qgis.Warning)
+            return
+        for layer in task.layers:
+            previous = self.live_validators.pop(layer.id(), None)
+            if previous:
+                previous.stop()
+            self.live_validators[layer.id()] = LiveValidator(layer, error_layer, task.criteria, task.match_cache)
+
+    def matcher_backend(self, criteria, layers):
+        """Return the matcher backend chosen in the dialog.
+
+        With "auto", the backends are timed once per criteria version on a
+        sample of the layers' names and the fastest one is kept.
+
+        :raises ValueError: The chosen backend does not support the criteria.
+        """
+        name = self.combo_backend.currentText()
+        QSettings().setValue("error_list_checker/matcher_backend", name)
+        if name != AUTO:
+            return create_backend(name, criteria)
+        backend = self.auto_backends.get(criteria.version)
+        if backend is None:
+            names = []
+            for layer in layers:
+                names += sample_names(layer, layer.fields(), max(1, SAMPLE_SIZE // len(layers)))
+            backend, timings = select_backend(criteria, names)
+            self.auto_backends = {criteria.version: backend}
+            QgsMessageLog.logMessage(
+                f"Matcher backend: {backend.name} (timings on {len(names)} names: "
+                + ", ".join(f"{key} {seconds * 1000:.1f} ms" for key, seconds in timings.items()) + ")",
+                "Error List Checker", Qgis.Info)
+        return backend
+
+    def apply_criteria_delta(self, layers, criteria):
+        """Patch live error lists for changed criteria instead of rescanning.
+
+        Only applies when every layer has a live error list and the criteria
+        differ from the ones it was built with.
+
+        :returns: True if the error lists were patched.
+        """
+        validators = [self.live_validators.get(layer.id()) for layer in layers]
+        if not all(validator and validator.source_layer is not None for validator in validators):
+            return False
+        if all(validator.criteria.version == criteria.version for validator in validators):
+            return False
+        revalidated = sum(validator.apply_criteria(criteria) for validator in validators)
+        errors = sum(len(validator.rows) for validator in validators)
+        QgsMessageLog.logMessage(
+            f"Criteria changed: re-validated {revalidated} affected features instead of rescanning",
+            "Error List Checker", Qgis.Info)
+        QMessageBox.information(
+            self, "Error Check Complete",
+            f"Validation criteria changed: {revalidated} affected features re-validated. "
+            f"{errors} errors in the error list.")
+        return True
+
+    def report_metrics(self, metrics):
+        """Log the stage timings of a run, and append them to the metrics file if set."""
+        QgsMessageLog.logMessage(f"Run metrics:\n{metrics.summary()}", "Error List Checker", Qgis.Info)
+        path = self.metrics_file.filePath()
+        QSettings().setValue("error_list_checker/metrics_path", path)
+        if not path:
+            return
+        try:
+            metrics.write_jsonl(path)
+        except OSError as e:
+            QgsMessageLog.logMessage(f"Failed to write run metrics: {e}", "Error List Checker", Qgis.Warning)
+
+    def on_check_terminated(self, task):
+        self.task = None
+        self.set_running(False)
+        task.writer.discard()
+        if task.exception:
+            QMessageBox.critical(self, "Error", f"Error check failed: {task.exception}")
+        else:
+            QMessageBox.information(self, "Cancelled", "Error check cancelled.")
+
+    def on_check_completed(self, task):
+        self.task = None
+        self.set_running(False)
+
+        metrics = task.metrics
+
+        # Load the written error list as the "Error List" layer, or update
+        # the one of the previous check of the same layers
+        try:
+            with metrics.stage(LAYER_ADD):
+                error_layer = self.place_error_layer(task)
+        except IOError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        error_count = task.error_count
+
+        lookups = task.cache_hits + task.cache_misses
+        info = self.match_cache.info()
+        QgsMessageLog.logMessage(
+            f"Match cache: {task.cache_hits} hits, {task.cache_misses} misses "
+            f"({100.0 * task.cache_hits / lookups if lookups else 0.0:.1f}% hit rate), "
+            f"{info.currsize} / {info.maxsize} names cached",
+            "Error List Checker", Qgis.Info)
+        if self.check_fingerprints.isChecked():
+            QgsMessageLog.logMessage(
+                f"Fingerprints: {task.reused} unchanged features reused their previous verdict",
+                "Error List Checker", Qgis.Info)
+
+        # Rows of a reused error list changed under its live validators
+        for layer_id, validator in list(self.live_validators.items()):
+            if validator.error_layer is error_layer:
+                validator.stop()
+                del self.live_validators[layer_id]
+
+        # Follow later edits of the source layers in this error list
+        QSettings().setValue("error_list_checker/live", self.check_live.isChecked())
+        if self.check_live.isChecked():
+            self.start_live_validation(task, error_layer)
 
         # # Optional: Zoom to the error layer
         # self.iface.mapCanvas().setExtent(error_layer.extent())
         # self.iface.mapCanvas().refresh()
 
-        # Automatically apply QML styling from the built-in QML file
-        qml_path = os.path.join(os.path.dirname(__file__), "error-list-style.qml")
+        # Style from the built-in QML file, parsed once per session
+        try:
+            with metrics.stage(STYLING):
+                style_error_layer(
+                    error_layer, error_count,
+                    self.spin_cluster.value() if self.check_render.isChecked() else None)
+        except IOError as e:
+            QMessageBox.critical(self, "Error", str(e))
 
-        # Check if the QML file exists and apply it
-        if os.path.exists(qml_path):
-            error_layer.loadNamedStyle(qml_path)
-            error_layer.triggerRepaint()
-        else:
-            QMessageBox.critical(self, "Error", "Failed to find the QML style file.")
+        self.report_metrics(metrics)
 
         # Show the total count in the message box
         QMessageBox.information(self, "Errors", f"Errors detected: {error_count}. Please update the errors accordingly.")
@@ -0,0 +1,23 @@
+from qgis.core import QgsProcessingProvider
+
+from .error_list_checker_algorithm import ErrorListCheckAlgorithm
+from .plugin_icon import plugin_icon
+
+
+class ErrorListCheckerProvider(QgsProcessingProvider):
+    """Processing provider exposing the Error List Checker algorithms."""
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(ErrorListCheckAlgorithm())
+
+    def id(self):
+        return 'errorlistchecker'
+
+    def name(self):
+        return 'Error List Checker'
+
+    def icon(self):
+        return plugin_icon()
+
+    def longName(self):
+        return self.name()
@@ -0,0 +1,271 @@
+from qgis.core import Qgis, QgsFeatureRequest, QgsFeatureSink, QgsMessageLog, QgsVectorDataProvider
+from qgis.PyQt.QtCore import QObject, pyqtSignal
+
+from .check_engine import plain_value
+from .core.delta import NameIndex, changed_keywords
+from .core.diff import keyed_diff
+from .core.engine import CBMS_GEOID_FIELD, CHECKED_FIELDS, FAC_NAME_FIELD, SECTOR_FIELD, iter_errors
+from .error_layer import ERROR_BATCH_SIZE, ERROR_LABEL_FIELD, RECOMMEND_LABEL_FIELD, error_feature, label_text
+
+
+# Provider capabilities needed to keep an error list in step with edits
+LIVE_CAPABILITIES = (
+    QgsVectorDataProvider.AddFeatures | QgsVectorDataProvider.DeleteFeatures
+    | QgsVectorDataProvider.ChangeAttributeValues | QgsVectorDataProvider.ChangeGeometries)
+
+
+def supports_live_validation(error_layer):
+    """Return True if the rows of ``error_layer`` can be added, changed and deleted.
+
+    Not the case for FlatGeobuf files, which can only be written once.
+    """
+    return error_layer.dataProvider().capabilities() & LIVE_CAPABILITIES == LIVE_CAPABILITIES
+
+
+def error_key(feature):
+    """Return the key pairing the rows of two runs of the same check."""
+    return plain_value(feature["source_layer"]), plain_value(feature[CBMS_GEOID_FIELD])
+
+
+def update_error_list(error_layer, features):
+    """Bring an existing memory error list to ``features`` in place.
+
+    Rows are paired by :func:`error_key` (see core/diff.py): new errors are
+    added, resolved ones deleted and paired rows whose attributes or point
+    changed are updated, so the layer, its style and its place in the
+    layer tree are kept.
+
+    :param error_layer: Error list memory layer with the fields of ``features``.
+    :param features: Error features of the new run.
+    :returns: The changes applied.
+    :rtype: core.diff.ErrorListDiff
+
+    :raises IOError: The provider refused one of the changes.
+    """
+    def values(feature):
+        return feature.attributes(), feature.geometry().asWkb()
+
+    diff = keyed_diff(
+        ((feature.id(), error_key(feature), values(feature)) for feature in error_layer.getFeatures()),
+        ((error_key(feature), values(feature), feature) for feature in features))
+    provider = error_layer.dataProvider()
+    ok = not diff.deletes or provider.deleteFeatures(diff.deletes)
+    for start in range(0, len(diff.inserts), ERROR_BATCH_SIZE):
+        ok = provider.addFeatures(diff.inserts[start:start + ERROR_BATCH_SIZE], QgsFeatureSink.FastInsert)[0] and ok
+    if diff.updates:
+        ok = provider.changeAttributeValues({
+            fid: dict(enumerate(feature.attributes())) for fid, feature in diff.updates}) and ok
+        ok = provider.changeGeometryValues({
+            fid: feature.geometry() for fid, feature in diff.updates if feature.hasGeometry()}) and ok
+    error_layer.updateExtents()
+    error_layer.triggerRepaint()
+    if not ok:
+        raise IOError(f"Failed to update {error_layer.name()}: {'; '.join(provider.errors())}")
+    return diff
+
+
+class LiveValidator(QObject):
+    """Keeps an existing Error List in sync with edits of its source layer.
+
+    Instead of rerunning the whole check after each fix, the validator
+    listens to the source layer's edit signals, re-validates only the touched
+    features and adds, updates or removes their rows in the error layer
+    through its data provider. Rows are matched to source features through
+    the error list's source_layer and source_fid fields. Changes the
+    provider refuses are logged and leave the validator's rows as they were.
+    """
+
+    # Number of rows in the error list for this source layer after an update
+    errorsChanged = pyqtSignal(int)
+
+    def __init__(self, source_layer, error_layer, criteria, match_cache):
+        """Constructor.
+
+        :raises ValueError: The rows of ``error_layer`` cannot be edited,
+            see supports_live_validation().
+        """
+        if not supports_live_validation(error_layer):
+            raise ValueError(f"{error_layer.name()} cannot be updated while editing")
+        super().__init__()
+        self.source_layer = source_layer
+        self.error_layer = error_layer
+        self.source_name = source_layer.name()
+        self.criteria = criteria
+        self.match_cache = match_cache
+        self.match_cache.bind(criteria)
+
+        fields = source_layer.fields()
+        self.checked_indexes = {fields.indexOf(name) for name in CHECKED_FIELDS}
+        error_fields = error_layer.fields()
+        self.error_fields = error_fields
+        self.remark_indexes = [
+            error_fields.indexOf(name) for name in ("cbms_geoid", "recommended_sector", "remark")]
+        # Stored label text of render-optimized error lists, kept in step
+        self.label_indexes = [
+            index for index in (error_fields.indexOf(ERROR_LABEL_FIELD), error_fields.indexOf(RECOMMEND_LABEL_FIELD))
+            if index >= 0]
+
+        # source fid -> error list feature id
+        self.rows = {}
+        # Built by the first apply_criteria call, then kept in sync with edits
+        self.name_index = None
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes(["source_layer", "source_fid"], error_fields)
+        for feature in error_layer.getFeatures(request):
+            if feature["source_layer"] == self.source_name:
+                self.rows[feature["source_fid"]] = feature.id()
+
+        source_layer.attributeValueChanged.connect(self.on_attribute_changed)
+        source_layer.featureAdded.connect(self.validate)
+        source_layer.featureDeleted.connect(self.on_feature_deleted)
+        source_layer.geometryChanged.connect(self.on_geometry_changed)
+        source_layer.committedFeaturesAdded.connect(self.on_committed_features_added)
+        source_layer.willBeDeleted.connect(self.stop)
+        error_layer.willBeDeleted.connect(self.stop)
+
+    def stop(self):
+        """Disconnect from both layers; the validator can then be dropped."""
+        if self.source_layer is None:
+            return
+        for signal, slot in (
+                (self.source_layer.attributeValueChanged, self.on_attribute_changed),
+                (self.source_layer.featureAdded, self.validate),
+                (self.source_layer.featureDeleted, self.on_feature_deleted),
+                (self.source_layer.geometryChanged, self.on_geometry_changed),
+                (self.source_layer.committedFeaturesAdded, self.on_committed_features_added),
+                (self.source_layer.willBeDeleted, self.stop),
+                (self.error_layer.willBeDeleted, self.stop)):
+            try:
+                signal.disconnect(slot)
+            except TypeError:
+                pass
+        self.source_layer = None
+        self.error_layer = None
+        self.name_index = None
+
+    def set_criteria(self, criteria):
+        """Use other criteria for the following edits."""
+        self.criteria = criteria
+        self.match_cache.bind(criteria)
+
+    def build_name_index(self):
+        """Index the facility names of the source layer, edits included."""
+        request = QgsFeatureRequest()
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes([FAC_NAME_FIELD], self.source_layer.fields())
+        self.name_index = NameIndex(
+            (feature.id(), plain_value(feature[FAC_NAME_FIELD]))
+            for feature in self.source_layer.getFeatures(request))
+
+    def apply_criteria(self, criteria):
+        """Switch to new criteria, re-validating only the affected features.
+
+        :returns: Number of features re-validated.
+        :rtype: int
+        """
+        if self.source_layer is None:
+            return 0
+        if criteria.version == self.criteria.version:
+            return 0
+        keywords = changed_keywords(self.criteria, criteria)
+        if self.name_index is None:
+            self.build_name_index()
+        fids = self.name_index.fids_matching(keywords)
+        self.set_criteria(criteria)
+        for fid in fids:
+            self.validate(fid)
+        return len(fids)
+
+    def on_attribute_changed(self, fid, index, value):
+        if index in self.checked_indexes:
+            self.validate(fid)
+
+    def on_feature_deleted(self, fid):
+        if self.name_index is not None:
+            self.name_index.remove(fid)
+        self.remove(fid)
+
+    def on_geometry_changed(self, fid, geometry):
+        if fid in self.rows and not geometry.isNull():
+            if not self.error_layer.dataProvider().changeGeometryValues({self.rows[fid]: geometry.centroid()}):
+                self.failed("move")
+                return
+            self.error_layer.triggerRepaint()
+
+    def on_committed_features_added(self, layer_id, features):
+        # Added features get their final fid on commit: drop the rows of the
+        # temporary (negative) fids and validate the committed features
+        self.remove_many([fid for fid in self.rows if fid < 0])
+        if self.name_index is not None:
+            for fid in list(self.name_index.fids()):
+                if fid < 0:
+                    self.name_index.remove(fid)
+        for feature in features:
+            self.validate(feature.id())
+
+    def validate(self, fid):
+        """Re-validate one source feature and update its error row."""
+        if self.source_layer is None:
+            return
+        request = QgsFeatureRequest(fid)
+        request.setSubsetOfAttributes(CHECKED_FIELDS, self.source_layer.fields())
+        feature = next(self.source_layer.getFeatures(request), None)
+        if feature is None or not feature.isValid():
+            self.on_feature_deleted(fid)
+            return
+
+        record = (fid, plain_value(feature[CBMS_GEOID_FIELD]),
+                  plain_value(feature[FAC_NAME_FIELD]), plain_value(feature[SECTOR_FIELD]))
+        if self.name_index is not None:
+            self.name_index.add(fid, record[2])
+        error = next(iter_errors([record], self.match_cache.match), None)
+        provider = self.error_layer.dataProvider()
+        if error is None:
+            self.remove(fid)
+            return
+        if fid in self.rows:
+            values = [error.cbms_geoid, error.recommended_sector, error.remark]
+            if self.label_indexes:
+                values += [
+                    label_text("ERROR: ", error.cbms_geoid), label_text("RECOMMEND: ", error.recommended_sector)]
+            if not provider.changeAttributeValues({self.rows[fid]: dict(zip(
+                    self.remark_indexes + self.label_indexes, values))}):
+                self.failed("update")
+                return
+        else:
+            geometry = feature.geometry().centroid() if feature.hasGeometry() else None
+            ok, added = provider.addFeatures([error_feature(self.error_fields, error, self.source_name, geometry)])
+            if not ok or not added:
+                self.failed("add")
+                return
+            self.rows[fid] = added[0].id()
+            self.error_layer.updateExtents()
+        self.changed()
+
+    def remove(self, fid):
+        """Remove the error row of a source feature, if it has one."""
+        self.remove_many([fid])
+
+    def remove_many(self, fids):
+        fids = [fid for fid in fids if fid in self.rows]
+        if not fids or self.error_layer is None:
+            return
+        if not self.error_layer.dataProvider().deleteFeatures([self.rows[fid] for fid in fids]):
+            self.failed("delete")
+            return
+        for fid in fids:
+            del self.rows[fid]
+        self.changed()
+
+    def failed(self, action):
+        """Log a change of the error list refused by its provider."""
+        errors = self.error_layer.dataProvider().errors()
+        QgsMessageLog.logMessage(
+            f"Live validation could not {action} rows of {self.error_layer.name()}"
+            + (f": {errors[-1]}" if errors else ""),
+            "Error List Checker", Qgis.Warning)
+
+    def changed(self):
+        self.error_layer.triggerRepaint()
+        self.errorsChanged.emit(len(self.rows))
@@ -0,0 +1,22 @@
+from qgis.PyQt.QtCore import QSize
+from qgis.PyQt.QtGui import QIcon
+import os
+
+ICON_DIR = os.path.join(os.path.dirname(__file__), "icons")
+# Pre-scaled copies of the plugin icon in icons/, also compiled into resources.py
+ICON_SIZES = (16, 24, 32, 64)
+
+
+def plugin_icon():
+    """Return the plugin icon with one pixmap file per size.
+
+    Qt draws the file closest to the size it needs (menu, toolbar,
+    Processing toolbox), so no large image is decoded and scaled. The files
+    are read from disk, so resources.py does not have to be registered;
+    import it only where ``:/plugins/error_list_checker/icons/...`` paths
+    are used.
+    """
+    icon = QIcon()
+    for size in ICON_SIZES:
+        icon.addFile(os.path.join(ICON_DIR, f"icon_{size}.png"), QSize(size, size))
+    return icon
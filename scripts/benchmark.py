@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Throughput and memory benchmarks of the check engine.
+
+Generates (or reuses) synthetic ``_SF`` GeoPackages of the requested sizes
+with generate_cbms_data.py, then times each stage of the ``core`` engine
+and the whole check, and measures its peak Python memory. Results can be
+saved as JSON and compared with an earlier run to catch regressions.
+
+Usage::
+
+    python scripts/benchmark.py [--sizes 10k,100k,1M,10M] [--workers 4]
+        [--data-dir DIR] [--output results.json]
+        [--baseline previous.json --tolerance 0.15]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Also puts the plugin folder on sys.path for the core imports below
+from generate_cbms_data import DEFAULT_CRITERIA, generate, parse_size
+
+from core.backends import BACKENDS
+from core.cache import MatchCache
+from core.criteria import clear_cache, load_criteria
+from core.engine import check_gpkg, iter_errors, iter_gpkg_records
+from core.fts import FtsIndex, check_gpkg_indexed, fts5_available
+from core.parallel import parallel_check_gpkg
+
+DEFAULT_SIZES = '10k,100k'
+
+
+def timed(function, repeat=1, setup=None):
+    """Return the best wall time of ``function()`` and its last result.
+
+    ``setup()``, if given, runs untimed before each repeat.
+    """
+    best, result = None, None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def remove_file(path):
+    """Delete ``path`` if it exists."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def peak_memory(function):
+    """Return the peak traced Python memory of ``function()`` in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_dataset(path, rows, criteria_path, workers=1, repeat=1):
+    """Benchmark every stage on one dataset and return the results."""
+    stages = {}
+
+    def record(stage, seconds, count=rows):
+        stages[stage] = {'seconds': round(seconds, 4), 'rows_per_second': round(count / seconds if seconds else 0.0)}
+
+    def compile_criteria():
+        clear_cache()
+        return load_criteria(criteria_path)
+
+    seconds, criteria = timed(compile_criteria, repeat)
+    stages['criteria_load'] = {'seconds': round(seconds, 4)}
+
+    # Reading only: SQLite and row decoding, the I/O side of a run
+    seconds, records = timed(lambda: list(iter_gpkg_records(path)), repeat)
+    record('read', seconds)
+
+    # Matching only, without the memo cache: the keyword scan itself
+    names = [record_[2] for record_ in records]
+    seconds, matches = timed(lambda: [criteria.match(name) for name in names], repeat)
+    record('match', seconds)
+    # The same for each matcher backend supporting the criteria
+    for name, backend in BACKENDS.items():
+        if backend.supports(criteria):
+            match = backend(criteria).match
+            seconds, _ = timed(lambda: [match(value) for value in names], repeat)
+            record('match_' + name, seconds)
+
+    # Error construction only: matches are looked up from the previous stage
+    results = dict(zip(names, matches))
+    seconds, errors = timed(lambda: list(iter_errors(records, results.get)), repeat)
+    record('errors', seconds)
+    del records, names, matches, results
+
+    seconds, errors = timed(lambda: check_gpkg(path, criteria, match_cache=MatchCache()), repeat)
+    record('end_to_end', seconds)
+    seconds, _ = timed(lambda: check_gpkg(path, criteria, match_cache=MatchCache(), pushdown=True), repeat)
+    record('end_to_end_pushdown', seconds)
+    if fts5_available():
+        # Building the full-text index from scratch, then checks through it.
+        # The sidecar is deleted before each repeat, which would otherwise
+        # only compare it with the table
+        index = FtsIndex(path)
+        seconds, _ = timed(index.sync, repeat, setup=lambda: remove_file(index.index_path))
+        record('index_build', seconds)
+        seconds, _ = timed(lambda: check_gpkg_indexed(path, criteria, match_cache=MatchCache()), repeat)
+        record('end_to_end_fts', seconds)
+    if workers > 1:
+        seconds, _ = timed(lambda: parallel_check_gpkg(path, criteria, workers=workers), repeat)
+        record('end_to_end_parallel', seconds)
+
+    return {
+        'rows': rows,
+        'errors': len(errors),
+        'file_bytes': os.path.getsize(path),
+        'peak_memory_bytes': peak_memory(lambda: check_gpkg(path, criteria, match_cache=MatchCache())),
+        'stages': stages,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return messages for the stages slower than ``baseline`` by more than ``tolerance``."""
+    regressions = []
+    for size, result in results['datasets'].items():
+        previous = baseline.get('datasets', {}).get(size)
+        if not previous:
+            continue
+        for stage, timing in result['stages'].items():
+            before = previous['stages'].get(stage, {}).get('rows_per_second')
+            after = timing.get('rows_per_second')
+            if before and after is not None and after < before * (1 - tolerance):
+                regressions.append('%s %s: %d rows/s, was %d' % (size, stage, after, before))
+        before, after = previous.get('peak_memory_bytes'), result['peak_memory_bytes']
+        if before and after > before * (1 + tolerance):
+            regressions.append('%s peak memory: %.1f MB, was %.1f MB' % (size, after / 1e6, before / 1e6))
+    return regressions
+
+
+def print_results(results):
+    for size, result in results['datasets'].items():
+        print('%s rows (%d errors, %.1f MB file, %.1f MB peak memory)' % (
+            size, result['errors'], result['file_bytes'] / 1e6, result['peak_memory_bytes'] / 1e6))
+        for stage, timing in result['stages'].items():
+            rate = timing.get('rows_per_second')
+            print('  %-20s %9.3f s%s' % (stage, timing['seconds'], '  %12s rows/s' % format(rate, ',') if rate else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the error check engine.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma separated row counts, e.g. 10k,100k,1M,10M')
+    parser.add_argument('--criteria', default=DEFAULT_CRITERIA, help='validation criteria JSON file')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'error_list_checker_benchmark'),
+                        help='where generated datasets are kept between runs')
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=1, help='also time the multi-process scan')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per stage; the best time is kept')
+    parser.add_argument('--output', help='JSON file to save the results to')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown before failing')
+    arguments = parser.parse_args(argv)
+
+    os.makedirs(arguments.data_dir, exist_ok=True)
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'datasets': {},
+    }
+    for size in arguments.sizes.split(','):
+        rows = parse_size(size)
+        path = os.path.join(arguments.data_dir, 'synthetic_%d_%g_SF.gpkg' % (rows, arguments.error_rate))
+        if not os.path.exists(path):
+            print('Generating %s...' % path, file=sys.stderr)
+            generate(path + '.part', rows, arguments.criteria, arguments.error_rate)
+            os.replace(path + '.part', path)
+        results['datasets'][size] = benchmark_dataset(
+            path, rows, arguments.criteria, arguments.workers, arguments.repeat)
+    print_results(results)
+
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+    if arguments.baseline:
+        with open(arguments.baseline, encoding='utf-8') as baseline:
+            regressions = compare(results, json.load(baseline), arguments.tolerance)
+        for regression in regressions:
+            print('REGRESSION: ' + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Generate synthetic CBMS-style facility data for benchmarks.
+
+Writes an ``_SF`` GeoPackage point layer (readable by QGIS and by the
+``core`` engine) or a plain CSV table with English and Filipino facility
+names, PSGC-like geoids and sectors, a configurable share of which are
+wrong for the keyword in the name.
+
+Usage::
+
+    python scripts/generate_cbms_data.py 1M synthetic_SF.gpkg
+        [--error-rate 0.05] [--match-rate 0.6] [--seed 1]
+"""
+
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import struct
+import sys
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PLUGIN_DIR)
+
+from core.criteria import load_criteria  # noqa: E402
+
+DEFAULT_CRITERIA = os.path.join(PLUGIN_DIR, 'validation_criteria.json')
+DEFAULT_TABLE = 'synthetic_SF'
+BATCH_SIZE = 50000
+
+PREFIXES = ['', 'Brgy.', 'Barangay', 'Sitio', 'Purok', 'Municipal', 'City',
+            'Provincial', 'Bagong', 'New', "St. Mary's", 'Holy Family']
+PLACES = ['San Isidro', 'Santa Cruz', 'Poblacion', 'Bagumbayan', 'Malabon',
+          'San Roque', 'Mabini', 'Rizal', 'Maligaya', 'Dela Paz', 'Santo Nino',
+          'Bayanihan', 'Masagana', 'Tagumpay', 'Malinis', 'Luzviminda',
+          'Del Pilar', 'Magsaysay', 'San Jose', 'Villanueva']
+SUFFIXES = ['', '', '', 'Inc.', 'Annex', 'Main', 'Extension', 'ng Bayan',
+            'Phase 2', '1', '2']
+# Names that usually match no keyword; checked against the criteria below
+OTHER_NAMES = ['Sari-sari Store', 'Carinderia', 'Tindahan', 'Panaderya',
+               'Bakery', 'Hardware', 'Vulcanizing Shop', 'Barber Shop',
+               'Karinderya', 'Talyer', 'Residence', 'Bahay', 'Boarding House',
+               'Chapel', 'Kapilya', 'Mini Mart', 'Computer Shop', 'Laundry',
+               'Water Refilling', 'Bigasan', 'Parlor', 'Tailoring']
+
+SIZES = {'k': 10 ** 3, 'm': 10 ** 6}
+
+
+def parse_size(value):
+    """Parse row counts such as ``10000``, ``100k`` or ``10M``."""
+    value = value.strip().lower()
+    if value[-1:] in SIZES:
+        return int(float(value[:-1]) * SIZES[value[-1]])
+    return int(value)
+
+
+def gpkg_point(lon, lat, srs_id=4326):
+    """Return a GeoPackage geometry blob for a point."""
+    return b'GP\x00\x01' + struct.pack('<i', srs_id) + struct.pack('<bIdd', 1, 1, lon, lat)
+
+
+def iter_rows(rows, criteria, error_rate=0.05, match_rate=0.6, seed=1):
+    """Yield ``(cbms_geoid, fac_name, sector, lon, lat)`` rows.
+
+    :param rows: Number of rows.
+    :param criteria: Compiled criteria used to pick and label keywords.
+    :param error_rate: Share of rows whose sector is wrong for their name.
+    :param match_rate: Share of rows whose name contains a keyword.
+    :param seed: Random seed, so that datasets are reproducible.
+    """
+    if not 0 <= error_rate <= match_rate <= 1:
+        raise ValueError('Expected 0 <= error rate <= match rate <= 1')
+    generator = random.Random(seed)
+    keywords = [(sector, keyword) for sector, keywords in criteria.categories for keyword in keywords]
+    sectors = criteria.sectors
+    others = [name for name in OTHER_NAMES if criteria.match(name) is None]
+    wrong_rate = error_rate / match_rate if match_rate else 0.0
+    for index in range(rows):
+        place = generator.choice(PLACES)
+        prefix = generator.choice(PREFIXES)
+        if generator.random() < match_rate:
+            keyword = generator.choice(keywords)[1]
+            body = keyword.title() if generator.random() < 0.7 else keyword.upper()
+        else:
+            body = generator.choice(others)
+        name = ' '.join(part for part in (prefix, place, body, generator.choice(SUFFIXES)) if part)
+        result = criteria.match(name)
+        if result is None:
+            sector = generator.choice(sectors) if generator.random() < 0.5 else None
+        elif generator.random() < wrong_rate:
+            sector = generator.choice([None] + [other for other in sectors if other != result[0]])
+        else:
+            sector = result[0]
+        geoid = '%02d%02d%02d%03d%06d' % (
+            generator.randint(1, 17), generator.randint(1, 99), generator.randint(1, 50),
+            generator.randint(1, 999), index % 1000000)
+        yield (geoid, name, sector,
+               round(generator.uniform(117.0, 126.5), 6), round(generator.uniform(5.0, 19.5), 6))
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_gpkg(path, rows, table=DEFAULT_TABLE):
+    """Write rows from :func:`iter_rows` to a new GeoPackage point layer."""
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        'PRAGMA application_id = 1196444487; PRAGMA user_version = 10200;'
+        'PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;'
+        'CREATE TABLE gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, '
+        'organization TEXT NOT NULL, organization_coordsys_id INTEGER NOT NULL, '
+        'definition TEXT NOT NULL, description TEXT);'
+        'CREATE TABLE gpkg_contents (table_name TEXT PRIMARY KEY, data_type TEXT NOT NULL, '
+        'identifier TEXT UNIQUE, description TEXT DEFAULT \'\', last_change DATETIME, '
+        'min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER);'
+        'CREATE TABLE gpkg_geometry_columns (table_name TEXT NOT NULL, column_name TEXT NOT NULL, '
+        'geometry_type_name TEXT NOT NULL, srs_id INTEGER NOT NULL, z TINYINT NOT NULL, '
+        'm TINYINT NOT NULL, PRIMARY KEY (table_name, column_name));'
+        'CREATE TABLE "%s" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom POINT, '
+        'cbms_geoid TEXT, fac_name TEXT, sector TEXT);' % table)
+    connection.executemany('INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)', [
+        ('Undefined cartesian SRS', -1, 'NONE', -1, 'undefined', None),
+        ('Undefined geographic SRS', 0, 'NONE', 0, 'undefined', None),
+        ('WGS 84 geodetic', 4326, 'EPSG', 4326,
+         'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563]],'
+         'PRIMEM["Greenwich",0],UNIT["degree",0.0174532925199433]]', None),
+    ])
+    connection.execute(
+        "INSERT INTO gpkg_contents VALUES (?, 'features', ?, '', strftime('%Y-%m-%dT%H:%M:%fZ', 'now'), "
+        "117.0, 5.0, 126.5, 19.5, 4326)", (table, table))
+    connection.execute(
+        "INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'POINT', 4326, 0, 0)", (table,))
+    insert = 'INSERT INTO "%s" (geom, cbms_geoid, fac_name, sector) VALUES (?, ?, ?, ?)' % table
+    for batch in _batches(rows):
+        connection.executemany(insert, [
+            (gpkg_point(lon, lat), geoid, name, sector) for geoid, name, sector, lon, lat in batch])
+    connection.commit()
+    connection.close()
+
+
+def write_csv(path, rows):
+    """Write rows from :func:`iter_rows` as a plain table with lon/lat columns."""
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(['cbms_geoid', 'fac_name', 'sector', 'lon', 'lat'])
+        writer.writerows(rows)
+
+
+def generate(path, rows, criteria_path=DEFAULT_CRITERIA, error_rate=0.05, match_rate=0.6, seed=1,
+             table=DEFAULT_TABLE):
+    """Generate a dataset; the format follows the extension of ``path``."""
+    criteria = load_criteria(criteria_path)
+    data = iter_rows(rows, criteria, error_rate, match_rate, seed)
+    if path.lower().endswith('.csv'):
+        write_csv(path, data)
+    else:
+        write_gpkg(path, data, table)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic CBMS facility data.')
+    parser.add_argument('rows', type=parse_size, help='number of rows, e.g. 10k, 100k, 1M, 10M')
+    parser.add_argument('output', help='.gpkg or .csv file to write')
+    parser.add_argument('--criteria', default=DEFAULT_CRITERIA, help='validation criteria JSON file')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='share of rows with a wrong sector')
+    parser.add_argument('--match-rate', type=float, default=0.6, help='share of names containing a keyword')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--table', default=DEFAULT_TABLE, help='GeoPackage table name')
+    arguments = parser.parse_args(argv)
+    generate(arguments.output, arguments.rows, arguments.criteria, arguments.error_rate,
+             arguments.match_rate, arguments.seed, arguments.table)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
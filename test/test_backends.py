@@ -0,0 +1,96 @@
+# coding=utf-8
+"""Matcher backends test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import json
+import os
+import unittest
+
+from core.backends import AUTO, BACKENDS, choose_backend, create_backend, select_backend
+from core.cache import MatchCache
+from core.criteria import CompiledCriteria
+
+NAMES = [
+    'Barangay Health Center', 'CENTRAL ELEMENTARY SCHOOL', 'School Clinic', 'Rizal Park',
+    'Parking Lot', 'Business Hub', 'City Bus Terminal', 'Fire Station 2', 'Agro-Industry Coop',
+    'Sari-sari Store', None, '',
+]
+
+
+class BackendTest(unittest.TestCase):
+    """Test that every backend gives the reference results."""
+
+    def setUp(self):
+        """Runs before each test."""
+        path = os.path.join(
+            os.path.dirname(__file__), os.pardir, 'validation_criteria.json')
+        with open(path, 'r') as json_file:
+            self.validation_criteria = json.load(json_file)
+
+    def mixed_criteria(self):
+        """The shipped criteria with some whole-word keywords."""
+        categories = self.validation_criteria['categories']
+        categories[2]['keywords'][2] = {'keyword': 'park', 'match': 'token'}
+        categories[3]['match'] = 'token'
+        return CompiledCriteria(self.validation_criteria)
+
+    def assert_same_results(self, criteria):
+        for name, backend in BACKENDS.items():
+            if not backend.supports(criteria):
+                continue
+            matcher = backend(criteria)
+            for value in NAMES:
+                self.assertEqual(matcher.match(value), criteria.match(value), (name, value))
+
+    def test_substring_criteria(self):
+        self.assert_same_results(CompiledCriteria(self.validation_criteria))
+
+    def test_mixed_criteria(self):
+        self.assert_same_results(self.mixed_criteria())
+
+    def test_token_index_support(self):
+        criteria = CompiledCriteria(self.validation_criteria)
+        with self.assertRaises(ValueError):
+            create_backend('token-index', criteria)
+        for category in self.validation_criteria['categories']:
+            category['match'] = 'token'
+        criteria = CompiledCriteria(self.validation_criteria)
+        self.assertEqual(create_backend('token-index', criteria).name, 'token-index')
+        self.assert_same_results(criteria)
+
+    def test_select_backend(self):
+        """Auto-selection only times backends agreeing with the reference."""
+        criteria = self.mixed_criteria()
+        backend, timings = select_backend(criteria, NAMES * 10, repeat=1)
+        self.assertIn(backend.name, timings)
+        self.assertEqual(set(timings), {'aho-corasick', 'regex', 'naive'})
+        backend, timings = choose_backend(AUTO, criteria)
+        self.assertEqual((backend.name, timings), ('aho-corasick', {}))
+        self.assertEqual(choose_backend('regex', criteria)[0].name, 'regex')
+
+    def test_match_cache_keeps_results(self):
+        """Switching backends keeps the memoized results."""
+        criteria = CompiledCriteria(self.validation_criteria)
+        cache = MatchCache()
+        cache.bind(criteria)
+        cache.match('Rizal Park')
+        cache.bind(criteria, create_backend('naive', criteria))
+        self.assertEqual(cache.backend.name, 'naive')
+        self.assertEqual(cache.match('Rizal Park'), criteria.match('Rizal Park'))
+        self.assertEqual(cache.info().hits, 1)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(BackendTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,190 @@
+# coding=utf-8
+"""QGIS check engine test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from qgis.core import (
+    QgsFeature,
+    QgsGeometry,
+    QgsPointXY,
+    QgsProject,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsVectorLayerFeatureSource,
+)
+
+from utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+# The engine uses package-relative imports: load it as QGIS does
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+check_engine = importlib.import_module(PACKAGE + '.check_engine')
+cache_module = importlib.import_module(PACKAGE + '.core.cache')
+criteria_module = importlib.import_module(PACKAGE + '.core.criteria')
+engine_module = importlib.import_module(PACKAGE + '.core.engine')
+INDEX_SYNC = importlib.import_module(PACKAGE + '.core.metrics').INDEX_SYNC
+error_layer = importlib.import_module(PACKAGE + '.error_layer')
+error_check_task = importlib.import_module(PACKAGE + '.error_check_task')
+
+CRITERIA = {'categories': [
+    {'keywords': ['hospital', 'health'], 'sector': '01_HEALTHCARE'},
+    {'keywords': ['school'], 'sector': '02_EDUCATION AND LITERACY'},
+]}
+
+ROWS = [
+    ('0001', 'Barangay Health Center', '01_HEALTHCARE'),
+    ('0002', 'Elementary School', '01_HEALTHCARE'),
+    ('0003', 'Sari-sari Store', '09_TRANSPORT'),
+    ('0004', 'School Hospital', None),
+    ('0005', None, None),
+]
+
+
+def memory_layer(rows, name='facilities_SF'):
+    """Return a memory layer holding ``rows`` as points."""
+    memory = QgsVectorLayer(
+        'Point?crs=EPSG:4326&field=cbms_geoid:string&field=fac_name:string&field=sector:string',
+        name, 'memory')
+    features = []
+    for index, row in enumerate(rows):
+        feature = QgsFeature(memory.fields())
+        feature.setAttributes(list(row))
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(121.0 + index * 0.001, 14.0)))
+        features.append(feature)
+    memory.dataProvider().addFeatures(features)
+    return memory
+
+
+def write_gpkg(path, rows):
+    """Write ``rows`` as points to a GeoPackage and return it as a layer."""
+    memory = memory_layer(rows)
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = 'GPKG'
+    options.layerName = 'facilities_SF'
+    QgsVectorFileWriter.writeAsVectorFormatV3(memory, path, QgsProject.instance().transformContext(), options)
+    return QgsVectorLayer(f'{path}|layername=facilities_SF', 'facilities_SF', 'ogr')
+
+
+class ErrorCheckEngineTest(unittest.TestCase):
+    """Test the engine on a GeoPackage layer."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'facilities_SF.gpkg')
+        self.layer = write_gpkg(self.path, ROWS)
+        self.criteria = criteria_module.CompiledCriteria(CRITERIA)
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.layer = None
+        shutil.rmtree(self.temp_dir)
+
+    def create_engine(self, writer, **options):
+        return check_engine.ErrorCheckEngine(
+            QgsVectorLayerFeatureSource(self.layer), self.layer.fields(), self.criteria, writer,
+            source_name=self.layer.name(), feature_count=self.layer.featureCount(), **options)
+
+    def run_engine(self, **options):
+        writer = error_layer.MemoryErrorListWriter()
+        engine = self.create_engine(writer, **options)
+        self.assertTrue(engine.run())
+        return engine, [feature['cbms_geoid'] for feature in writer.features]
+
+    def test_plain_scan(self):
+        """Every feature is read and the errors are those of core.engine."""
+        engine, errors = self.run_engine()
+        self.assertEqual(engine.processed, len(ROWS))
+        self.assertEqual(errors, [error.cbms_geoid for error in engine_module.check_gpkg(self.path, self.criteria)])
+
+    def test_full_text_index(self):
+        """A single-process run through the index gives the same errors."""
+        fts_index = check_engine.full_text_index(self.layer)
+        self.assertIsNotNone(fts_index)
+        engine, errors = self.run_engine(fts_index=fts_index)
+        self.assertEqual(engine.processed, len(ROWS))
+        self.assertEqual(errors, self.run_engine()[1])
+        self.assertNotIn('index_error', engine.metrics.info)
+        # The index sync is one of the stages making up the elapsed time
+        self.assertIn(INDEX_SYNC, engine.metrics.stages)
+        self.assertAlmostEqual(sum(engine.metrics.stages.values()), engine.elapsed, places=3)
+
+    def test_full_text_index_progress_and_cancel(self):
+        """Candidates read through the index are counted, and the run can stop."""
+        interval = check_engine.REPORT_INTERVAL
+        check_engine.REPORT_INTERVAL = 1
+        try:
+            progress = []
+            engine = self.create_engine(
+                error_layer.MemoryErrorListWriter(), fts_index=check_engine.full_text_index(self.layer))
+            self.assertTrue(engine.run(on_progress=lambda processed, elapsed: progress.append(processed)))
+            # Two candidates, then the row count once the run is over
+            self.assertEqual(progress, [1, 2, len(ROWS)])
+            engine = self.create_engine(
+                error_layer.MemoryErrorListWriter(), fts_index=check_engine.full_text_index(self.layer))
+            self.assertFalse(engine.run(lambda: True))
+        finally:
+            check_engine.REPORT_INTERVAL = interval
+
+    def test_modified_layer_is_not_read_from_file(self):
+        """Unsaved edits keep a layer off the paths reading the file directly."""
+        self.assertEqual(check_engine.gpkg_source(self.layer), (self.path, 'facilities_SF'))
+        self.layer.startEditing()
+        self.layer.changeAttributeValue(next(self.layer.getFeatures()).id(), 1, 'Health Office')
+        self.assertIsNone(check_engine.gpkg_source(self.layer))
+        self.assertIsNone(check_engine.full_text_index(self.layer))
+        self.layer.rollBack()
+
+
+class ErrorCheckTaskTest(unittest.TestCase):
+    """Test checks of several layers into one error list."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.criteria = criteria_module.CompiledCriteria(CRITERIA)
+        self.layers = [
+            memory_layer(ROWS, 'north_SF'),
+            memory_layer([('1001', 'National High School', '01_HEALTHCARE')], 'south_SF')]
+
+    def test_merged_list(self):
+        """Errors of every layer reach the shared writer with their source layer."""
+        writer = error_layer.MemoryErrorListWriter()
+        task = error_check_task.ErrorCheckTask(self.layers, self.criteria, writer, cache_module.MatchCache())
+        self.assertIsInstance(task.writer, error_layer.SharedErrorListWriter)
+        self.assertTrue(task.run())
+        self.assertEqual(task.error_count, 3)
+        self.assertEqual(
+            sorted((feature['source_layer'], feature['cbms_geoid']) for feature in writer.features),
+            [('north_SF', '0002'), ('north_SF', '0004'), ('south_SF', '1001')])
+        self.assertEqual(task.cache_hits + task.cache_misses, len(ROWS) + 1)
+
+    def test_workers_are_shared(self):
+        """Layers checked at the same time split the worker processes."""
+        task = error_check_task.ErrorCheckTask(
+            self.layers, self.criteria, error_layer.MemoryErrorListWriter(), cache_module.MatchCache(), workers=5)
+        self.assertEqual([engine.workers for engine in task.engines], [2, 2])
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ErrorCheckEngineTest)
+    suite.addTests(unittest.makeSuite(ErrorCheckTaskTest))
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
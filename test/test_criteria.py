@@ -0,0 +1,163 @@
+# coding=utf-8
+"""Compiled criteria cache test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from core import criteria as criteria_module
+from core.cache import MatchCache
+from core.criteria import CompiledCriteria, clear_cache, load_criteria
+
+
+class CompiledCriteriaTest(unittest.TestCase):
+    """Test loading and caching of the compiled criteria."""
+
+    def setUp(self):
+        """Runs before each test."""
+        clear_cache()
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.path = os.path.join(self.temp_dir, 'validation_criteria.json')
+        self.write_criteria(['hospital'])
+
+    def tearDown(self):
+        """Runs after each test."""
+        clear_cache()
+        shutil.rmtree(self.temp_dir)
+
+    def write_criteria(self, keywords, mtime=None):
+        """Write a one-category criteria file."""
+        with open(self.path, 'w') as json_file:
+            json.dump({'categories': [
+                {'keywords': keywords, 'sector': '01_HEALTHCARE'}]},
+                json_file)
+        if mtime is not None:
+            os.utime(self.path, ns=(mtime, mtime))
+
+    def test_reused_while_unchanged(self):
+        """The same object is returned while the file is unchanged."""
+        first = load_criteria(self.path, self.cache_dir)
+        self.assertIs(load_criteria(self.path, self.cache_dir), first)
+        self.assertEqual(first.match('District Hospital'),
+                         ('01_HEALTHCARE', 'hospital'))
+
+    def test_touch_without_change_keeps_version(self):
+        """A new mtime with identical content does not recompile."""
+        first = load_criteria(self.path, self.cache_dir)
+        self.write_criteria(['hospital'], mtime=10 ** 18)
+        self.assertIs(load_criteria(self.path, self.cache_dir), first)
+
+    def test_recompiled_on_change(self):
+        """Editing the keywords invalidates the cache."""
+        first = load_criteria(self.path, self.cache_dir)
+        self.write_criteria(['hospital', 'clinic'], mtime=10 ** 18)
+        second = load_criteria(self.path, self.cache_dir)
+        self.assertNotEqual(first.version, second.version)
+        self.assertEqual(second.match('Clinic'), ('01_HEALTHCARE', 'clinic'))
+
+    def test_disk_cache_used_by_new_session(self):
+        """A fresh process loads the pickled criteria instead of compiling."""
+        first = load_criteria(self.path, self.cache_dir)
+        self.assertTrue(os.listdir(self.cache_dir))
+        clear_cache()
+
+        class NoJson:
+            """Fails the test if the JSON is parsed again."""
+            @staticmethod
+            def loads(_):
+                raise AssertionError('criteria were recompiled')
+
+        original = criteria_module.json
+        criteria_module.json = NoJson
+        try:
+            second = load_criteria(self.path, self.cache_dir)
+        finally:
+            criteria_module.json = original
+        self.assertEqual(second.version, first.version)
+
+
+class MatchModeTest(unittest.TestCase):
+    """Test substring and whole-word keywords in the same criteria."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.criteria = CompiledCriteria({'categories': [
+            {'keywords': ['health center', {'keyword': 'park', 'match': 'token'}],
+             'sector': '03_PUBLIC BUILDING AND OPEN SPACE'},
+            {'keywords': ['bus', 'fire station'], 'sector': '09_TRANSPORT', 'match': 'token'},
+            {'keywords': ['park'], 'sector': '10_OTHER'},
+        ]})
+
+    def test_token_keywords(self):
+        self.assertEqual(self.criteria.match('Rizal Park'), ('03_PUBLIC BUILDING AND OPEN SPACE', 'park'))
+        self.assertEqual(self.criteria.match('City Bus Terminal'), ('09_TRANSPORT', 'bus'))
+        self.assertIsNone(self.criteria.match('Business Hub'))
+
+    def test_priority_across_modes(self):
+        """Substring and token keywords keep one file order."""
+        self.assertEqual(self.criteria.match('Parking Lot'), ('10_OTHER', 'park'))
+        self.assertEqual(self.criteria.match('Bus Stop Health Center'),
+                         ('03_PUBLIC BUILDING AND OPEN SPACE', 'health center'))
+        self.assertEqual(self.criteria.match_normalized('bus park'),
+                         ('03_PUBLIC BUILDING AND OPEN SPACE', 'park'))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            CompiledCriteria({'categories': [
+                {'keywords': ['park'], 'sector': 'A', 'match': 'fuzzy'}]})
+
+
+class MatchCacheTest(unittest.TestCase):
+    """Test the per-name match memoization."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.criteria = CompiledCriteria({'categories': [
+            {'keywords': ['school'], 'sector': '02_EDUCATION AND LITERACY'}]})
+
+    def test_hits_and_misses(self):
+        """Repeated names (in any case) are served from the cache."""
+        cache = MatchCache(maxsize=10)
+        cache.bind(self.criteria)
+        for name in ['Elementary School', 'ELEMENTARY SCHOOL', 'Store']:
+            cache.match(name)
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 2, 2))
+        self.assertEqual(cache.match('Elementary School'),
+                         ('02_EDUCATION AND LITERACY', 'school'))
+
+    def test_rebinding_new_version_clears(self):
+        """Binding different criteria drops the memoized results."""
+        cache = MatchCache(maxsize=10)
+        cache.bind(self.criteria)
+        cache.match('Day Care Center')
+        cache.bind(self.criteria)
+        self.assertEqual(cache.info().currsize, 1)
+
+        other = CompiledCriteria({'categories': [
+            {'keywords': ['day care'], 'sector': '01_HEALTHCARE'}]})
+        cache.bind(other)
+        self.assertEqual(cache.info().currsize, 0)
+        self.assertEqual(cache.match('Day Care Center'),
+                         ('01_HEALTHCARE', 'day care'))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(CompiledCriteriaTest)
+    suite.addTests(unittest.makeSuite(MatchModeTest))
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,141 @@
+# coding=utf-8
+"""Criteria delta and name index test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import random
+import unittest
+
+from core.criteria import SUBSTRING, TOKEN, CompiledCriteria
+from core.delta import NameIndex, changed_keywords
+
+CRITERIA = {'categories': [
+    {'keywords': ['hospital', 'clinic'], 'sector': '01_HEALTHCARE'},
+    {'keywords': ['school', 'day care'], 'sector': '02_EDUCATION AND LITERACY'},
+]}
+
+NAMES = {
+    1: 'District Hospital',
+    2: 'Elementary School',
+    3: 'Barangay Day Care Center',
+    4: 'Sari-sari Store',
+    5: 'School Clinic',
+}
+
+
+def criteria_with(*categories):
+    return CompiledCriteria({'categories': [
+        {'keywords': list(keywords), 'sector': sector} for sector, keywords in categories]})
+
+
+class ChangedKeywordsTest(unittest.TestCase):
+    """Test the keywords reported by changed_keywords."""
+
+    def test_unchanged(self):
+        self.assertEqual(changed_keywords(CompiledCriteria(CRITERIA), CompiledCriteria(CRITERIA)), set())
+
+    def test_added_and_removed(self):
+        old = CompiledCriteria(CRITERIA)
+        new = criteria_with(
+            ('01_HEALTHCARE', ['hospital', 'clinic', 'Botika']),
+            ('02_EDUCATION AND LITERACY', ['school']))
+        self.assertEqual(changed_keywords(old, new), {(SUBSTRING, 'botika'), (SUBSTRING, 'day care')})
+
+    def test_moved_between_sectors(self):
+        old = CompiledCriteria(CRITERIA)
+        new = criteria_with(
+            ('01_HEALTHCARE', ['hospital']),
+            ('02_EDUCATION AND LITERACY', ['school', 'day care', 'clinic']))
+        self.assertEqual(changed_keywords(old, new), {(SUBSTRING, 'clinic')})
+
+    def test_reordered(self):
+        old = CompiledCriteria(CRITERIA)
+        new = criteria_with(
+            ('02_EDUCATION AND LITERACY', ['school', 'day care']),
+            ('01_HEALTHCARE', ['hospital', 'clinic']))
+        # Swapping the categories changes which of them wins for names
+        # holding a keyword of each
+        self.assertEqual(len(changed_keywords(old, new)), 2)
+
+    def test_covers_changed_verdicts(self):
+        old = CompiledCriteria(CRITERIA)
+        new = criteria_with(
+            ('02_EDUCATION AND LITERACY', ['school', 'day care']),
+            ('01_HEALTHCARE', ['hospital', 'clinic', 'store']))
+        index = NameIndex(NAMES.items())
+        affected = index.fids_matching(changed_keywords(old, new))
+        for fid, name in NAMES.items():
+            if old.match(name) != new.match(name):
+                self.assertIn(fid, affected)
+        self.assertIn(5, affected)
+        self.assertIn(4, affected)
+
+    def test_multi_word_token_keywords(self):
+        """Whole-word keywords reach names where their words are split differently."""
+        names = {1: 'Barangay Health-Center', 2: 'Health  Center', 3: 'Health Center', 4: 'Health Office'}
+        old = CompiledCriteria(CRITERIA)
+        new = CompiledCriteria({'categories': CRITERIA['categories'] + [
+            {'keywords': [{'keyword': 'health center', 'match': 'token'}], 'sector': '01_HEALTHCARE'}]})
+        self.assertEqual(changed_keywords(old, new), {(TOKEN, 'health center')})
+        self.assertEqual(NameIndex(names.items()).fids_matching(changed_keywords(old, new)), {1, 2, 3})
+
+    def test_random_edits(self):
+        """Every verdict changed by a random criteria edit is re-validated."""
+        generator = random.Random(11)
+        words = ['health', 'center', 'school', 'day', 'care', 'bus', 'park']
+        names = {
+            fid: generator.choice([' ', '-', '  ', '/']).join(generator.sample(words, generator.randint(1, 3)))
+            for fid in range(200)}
+        index = NameIndex(names.items())
+
+        def random_criteria():
+            return CompiledCriteria({'categories': [
+                {'keywords': [
+                    {'keyword': ' '.join(generator.sample(words, generator.randint(1, 2))),
+                     'match': generator.choice([SUBSTRING, TOKEN])}
+                    for _ in range(generator.randint(1, 3))],
+                 'sector': sector}
+                for sector in generator.sample(['A', 'B', 'C'], 3)]})
+
+        for _ in range(100):
+            old, new = random_criteria(), random_criteria()
+            affected = index.fids_matching(changed_keywords(old, new))
+            stale = [fid for fid, name in names.items() if old.match(name) != new.match(name) and fid not in affected]
+            self.assertEqual(stale, [])
+
+
+class NameIndexTest(unittest.TestCase):
+    """Test the n-gram name index."""
+
+    def test_lookup(self):
+        index = NameIndex(NAMES.items())
+        self.assertEqual(index.fids_containing(['school']), {2, 5})
+        self.assertEqual(index.fids_containing(['day care', 'hospital']), {1, 3})
+        self.assertEqual(index.fids_containing(['sa']), {4})
+        self.assertEqual(index.fids_containing(['pharmacy']), set())
+
+    def test_edits(self):
+        index = NameIndex(NAMES.items())
+        index.add(4, 'Village Pharmacy')
+        index.remove(2)
+        index.add(6, 'Elementary School')
+        self.assertEqual(index.fids_containing(['school']), {5, 6})
+        self.assertEqual(index.fids_containing(['pharmacy']), {4})
+        self.assertEqual(index.fids_containing(['store']), set())
+        self.assertEqual(len(index), 5)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ChangedKeywordsTest)
+    suite.addTests(unittest.makeSuite(NameIndexTest))
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,77 @@
+# coding=utf-8
+"""Error list diff test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import random
+import unittest
+
+from core.diff import ErrorListDiff, keyed_diff
+
+OLD = [
+    (10, ('facilities_SF', '0001'), ('01_HEALTHCARE', 'remark 1')),
+    (11, ('facilities_SF', '0002'), ('02_EDUCATION AND LITERACY', 'remark 2')),
+    (12, ('facilities_SF', '0003'), ('01_HEALTHCARE', 'remark 3')),
+    (13, ('schools_SF', '0001'), ('02_EDUCATION AND LITERACY', 'remark 4')),
+]
+
+
+class KeyedDiffTest(unittest.TestCase):
+    """Test bringing an error list up to date in place."""
+
+    def test_insert_delete_update(self):
+        """New errors are inserted, resolved ones deleted, changed ones updated."""
+        new = [
+            (('facilities_SF', '0001'), ('01_HEALTHCARE', 'remark 1'), 'a'),
+            (('facilities_SF', '0003'), ('09_TRANSPORT', 'remark 3b'), 'b'),
+            (('schools_SF', '0001'), ('02_EDUCATION AND LITERACY', 'remark 4'), 'c'),
+            (('schools_SF', '0009'), ('01_HEALTHCARE', 'remark 5'), 'd'),
+        ]
+        self.assertEqual(keyed_diff(OLD, new), ErrorListDiff(['d'], [11], [(12, 'b')]))
+
+    def test_unchanged(self):
+        """Rerunning with the same errors changes nothing."""
+        new = [(key, values, row_id) for row_id, key, values in reversed(OLD)]
+        self.assertEqual(keyed_diff(OLD, new), ErrorListDiff([], [], []))
+
+    def test_duplicate_keys(self):
+        """Rows sharing a key are paired in order, the rest inserted or deleted."""
+        key = ('facilities_SF', None)
+        old = [(1, key, 'x'), (2, key, 'y'), (3, key, 'z')]
+        self.assertEqual(
+            keyed_diff(old, [(key, 'x', 'a'), (key, 'z', 'b')]),
+            ErrorListDiff([], [3], [(2, 'b')]))
+        self.assertEqual(
+            keyed_diff(old[:1], [(key, 'x', 'a'), (key, 'x', 'b')]),
+            ErrorListDiff(['b'], [], []))
+
+    def test_applying_the_diff(self):
+        """Applying the diff to the old rows gives the new values per key."""
+        generator = random.Random(7)
+        for _ in range(50):
+            old = [(row_id, generator.randrange(8), generator.randrange(3)) for row_id in range(20)]
+            new = [(generator.randrange(8), generator.randrange(3), index) for index in range(20)]
+            diff = keyed_diff(old, new)
+            rows = {row_id: (key, values) for row_id, key, values in old}
+            for row_id in diff.deletes:
+                del rows[row_id]
+            for row_id, index in diff.updates:
+                rows[row_id] = new[index][:2]
+            for index in diff.inserts:
+                rows[('new', index)] = new[index][:2]
+            self.assertEqual(sorted(rows.values()), sorted(row[:2] for row in new))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(KeyedDiffTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,254 @@
+# coding=utf-8
+"""QGIS-free engine test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from core.criteria import CompiledCriteria
+from core.engine import ErrorRow, build_remark, check_gpkg, check_rows
+from core.parallel import (
+    fid_partitions, parallel_check_gpkg, parallel_iter_errors,
+    parallel_iter_gpkg_errors)
+from core.pushdown import candidate_filter
+
+CRITERIA = {'categories': [
+    {'keywords': ['hospital', 'health'], 'sector': '01_HEALTHCARE'},
+    {'keywords': ['school'], 'sector': '02_EDUCATION AND LITERACY'},
+]}
+
+ROWS = [
+    ('0001', 'Barangay Health Center', '01_HEALTHCARE'),
+    ('0002', 'Elementary School', '01_HEALTHCARE'),
+    ('0003', 'Sari-sari Store', '09_TRANSPORT'),
+    ('0004', 'School Hospital', None),
+]
+
+
+def create_gpkg(path, rows, table='facilities_SF'):
+    """Write ``rows`` to a minimal GeoPackage feature table."""
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        'CREATE TABLE gpkg_contents (table_name TEXT PRIMARY KEY, '
+        'data_type TEXT NOT NULL);'
+        'CREATE TABLE "%s" (fid INTEGER PRIMARY KEY AUTOINCREMENT, '
+        'geom BLOB, cbms_geoid TEXT, fac_name TEXT, sector TEXT);' % table)
+    connection.execute(
+        "INSERT INTO gpkg_contents VALUES (?, 'features')", (table,))
+    connection.executemany(
+        'INSERT INTO "%s" (cbms_geoid, fac_name, sector) VALUES (?, ?, ?)'
+        % table, rows)
+    connection.commit()
+    connection.close()
+
+
+class EngineTest(unittest.TestCase):
+    """Test the QGIS-free check engine."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.criteria = CompiledCriteria(CRITERIA)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Runs after each test."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_check_rows(self):
+        """Only names matching another sector are reported, in row order."""
+        errors = check_rows(ROWS, self.criteria)
+        self.assertEqual(errors, [
+            ErrorRow(1, '0002', '02_EDUCATION AND LITERACY', build_remark(
+                '01_HEALTHCARE', '02_EDUCATION AND LITERACY', 'school')),
+            ErrorRow(3, '0004', '01_HEALTHCARE', build_remark(
+                None, '01_HEALTHCARE', 'hospital')),
+        ])
+
+    def test_remark(self):
+        """The remark wording is unchanged from the dialog."""
+        self.assertEqual(
+            build_remark('01_HEALTHCARE', '09_TRANSPORT', 'bus'),
+            "Incorrect sector: '01_HEALTHCARE'. Recommended sector is "
+            "'09_TRANSPORT' based on the keyword 'bus'. Please verify and "
+            "update the sector.")
+
+    def test_check_gpkg(self):
+        """A GeoPackage is checked with sqlite3 and reports GeoPackage fids."""
+        path = os.path.join(self.temp_dir, 'facilities_SF.gpkg')
+        create_gpkg(path, ROWS)
+        errors = check_gpkg(path, self.criteria)
+        self.assertEqual([(error.fid, error.cbms_geoid) for error in errors],
+                         [(2, '0002'), (4, '0004')])
+
+    def test_check_gpkg_missing_field(self):
+        """A table without the checked fields is rejected."""
+        path = os.path.join(self.temp_dir, 'other.gpkg')
+        connection = sqlite3.connect(path)
+        connection.executescript(
+            "CREATE TABLE gpkg_contents (table_name TEXT, data_type TEXT);"
+            "INSERT INTO gpkg_contents VALUES ('roads', 'features');"
+            "CREATE TABLE roads (fid INTEGER PRIMARY KEY, name TEXT);")
+        connection.close()
+        with self.assertRaises(ValueError):
+            check_gpkg(path, self.criteria)
+
+
+class ParallelEngineTest(unittest.TestCase):
+    """Test the multi-process check gives the single-process result."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.criteria = CompiledCriteria(CRITERIA)
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'facilities_SF.gpkg')
+        create_gpkg(self.path, ROWS * 50)
+
+    def tearDown(self):
+        """Runs after each test."""
+        shutil.rmtree(self.temp_dir)
+
+    def test_partitions_cover_every_fid(self):
+        """Fid ranges are contiguous and cover the whole table."""
+        partitions = fid_partitions(self.path, 7)
+        self.assertEqual(len(partitions), 7)
+        self.assertEqual(partitions[0][0], 1)
+        self.assertEqual(partitions[-1][1], len(ROWS) * 50)
+        for previous, following in zip(partitions, partitions[1:]):
+            self.assertEqual(previous[1] + 1, following[0])
+
+    def test_partitions_with_fid_gaps(self):
+        """Ranges hold about as many rows each when fids have gaps."""
+        connection = sqlite3.connect(self.path)
+        connection.execute('DELETE FROM facilities_SF WHERE fid % 3 = 0 OR fid BETWEEN 50 AND 120')
+        fids = [fid for fid, in connection.execute('SELECT fid FROM facilities_SF ORDER BY fid')]
+        connection.commit()
+        connection.close()
+        partitions = fid_partitions(self.path, 4)
+        sizes = [len([fid for fid in fids if first <= fid <= last]) for first, last in partitions]
+        self.assertEqual(sum(sizes), len(fids))
+        self.assertLessEqual(max(sizes) - min(sizes), 1)
+
+    def test_parallel_gpkg_progress_and_stop(self):
+        """Every range reports its rows, and the check stops when asked to."""
+        rows = []
+        self.assertEqual(
+            list(parallel_iter_gpkg_errors(self.path, self.criteria, workers=2, on_partition=rows.append)),
+            check_gpkg(self.path, self.criteria))
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(sum(rows), len(ROWS) * 50)
+        rows = []
+        errors = list(parallel_iter_gpkg_errors(
+            self.path, self.criteria, workers=2, on_partition=lambda count: rows.append(count) or True))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(errors, [error for error in check_gpkg(self.path, self.criteria) if error.fid <= rows[0]])
+
+    def test_parallel_gpkg_same_as_serial(self):
+        """Fid-range workers return the serial errors in the same order."""
+        self.assertEqual(
+            parallel_check_gpkg(self.path, self.criteria, workers=2),
+            check_gpkg(self.path, self.criteria))
+
+    def test_parallel_records_same_as_serial(self):
+        """Chunked workers return the serial errors in the same order."""
+        records = [(index,) + row for index, row in enumerate(ROWS * 50)]
+        self.assertEqual(
+            list(parallel_iter_errors(
+                records, self.criteria, workers=2, chunk_size=7)),
+            check_rows(ROWS * 50, self.criteria))
+
+
+class PushdownTest(unittest.TestCase):
+    """Test the candidate filters run by the data provider."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'facilities_SF.gpkg')
+        create_gpkg(self.path, ROWS + [
+            ('0005', None, None),
+            ('0006', 'HOSPITAL DE NIÑO', '02_EDUCATION AND LITERACY'),
+            ('0007', 'Schoolbus Depot', '02_EDUCATION AND LITERACY'),
+            ('0008', '100% Health_Mart', '01_HEALTHCARE'),
+        ])
+
+    def tearDown(self):
+        """Runs after each test."""
+        shutil.rmtree(self.temp_dir)
+
+    def candidates(self, criteria):
+        where = candidate_filter(criteria, 'sqlite', 'fac_name', 'sector')
+        connection = sqlite3.connect(self.path)
+        try:
+            return [row[0] for row in connection.execute(
+                'SELECT cbms_geoid FROM facilities_SF WHERE ' + where)]
+        finally:
+            connection.close()
+
+    def assert_same_as_full_scan(self, validation_criteria):
+        criteria = CompiledCriteria(validation_criteria)
+        self.assertEqual(check_gpkg(self.path, criteria, pushdown=True),
+                         check_gpkg(self.path, criteria))
+
+    def test_only_mismatches_are_read(self):
+        """Rows whose sector agrees with their first keyword stay in the database."""
+        self.assertEqual(self.candidates(CompiledCriteria(CRITERIA)), ['0002', '0004', '0006'])
+        self.assert_same_as_full_scan(CRITERIA)
+
+    def test_widened_filters(self):
+        """Whole-word, non-ASCII and NULL-matching keywords give the same errors."""
+        self.assert_same_as_full_scan({'categories': [
+            {'keywords': ['niño', '100%', 'health_'], 'sector': '01_HEALTHCARE'},
+            {'keywords': ['school', 'non'], 'sector': '02_EDUCATION AND LITERACY'},
+        ]})
+        self.assert_same_as_full_scan({'categories': [
+            {'keywords': ['hospital', {'keyword': 'bus', 'match': 'token'}], 'sector': '09_TRANSPORT'},
+            {'keywords': ['school'], 'sector': '02_EDUCATION AND LITERACY'},
+        ]})
+
+    def test_multi_word_token_keywords(self):
+        """Whole-word keywords are found however their words are separated."""
+        create_gpkg(os.path.join(self.temp_dir, 'centers_SF.gpkg'), [
+            ('g1', 'Barangay Health-Center', '02_EDUCATION AND LITERACY'),
+            ('g2', 'Health  Center', None),
+            ('g3', 'Health Center', '09_TRANSPORT'),
+            ('g4', 'Healthy Centerville', None),
+        ])
+        self.path = os.path.join(self.temp_dir, 'centers_SF.gpkg')
+        validation_criteria = {'categories': [
+            {'keywords': [{'keyword': 'health center', 'match': 'token'}], 'sector': '01_HEALTHCARE'}]}
+        self.assert_same_as_full_scan(validation_criteria)
+        self.assertEqual(
+            [error.cbms_geoid for error in check_gpkg(
+                self.path, CompiledCriteria(validation_criteria), pushdown=True)],
+            ['g1', 'g2', 'g3'])
+
+    def test_qgis_expression(self):
+        criteria = CompiledCriteria(CRITERIA)
+        self.assertEqual(
+            candidate_filter(criteria, 'qgis', 'fac_name', 'sector'),
+            'CASE WHEN "fac_name" ILIKE \'%hospital%\' OR "fac_name" ILIKE \'%health%\' '
+            'THEN "sector" IS NULL OR "sector" <> \'01_HEALTHCARE\' '
+            'WHEN "fac_name" ILIKE \'%school%\' '
+            'THEN "sector" IS NULL OR "sector" <> \'02_EDUCATION AND LITERACY\' ELSE FALSE END')
+        # Without escapes in QGIS expressions, such keywords are not pushed down
+        self.assertIsNone(candidate_filter(CompiledCriteria({'categories': [
+            {'keywords': ['100%'], 'sector': 'A'}]}), 'qgis', 'fac_name', 'sector'))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(EngineTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,147 @@
+# coding=utf-8
+"""Error layer style test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from qgis.core import QgsProject, QgsVectorLayer
+
+from utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+from core.engine import ErrorRow
+from error_layer import (
+    ERROR_LABEL_FIELD, LABEL_FIELDS, STYLE_TIERS, FileErrorListWriter, MemoryErrorListWriter, error_feature,
+    error_fields, style_error_layer, style_options, style_template)
+
+
+class ErrorLayerStyleTest(unittest.TestCase):
+    """Test the cached Error List style."""
+
+    def create_layer(self):
+        return QgsVectorLayer("Point?crs=EPSG:4326", "Error List", "memory")
+
+    def test_template_is_parsed_once(self):
+        """The QML is loaded into one template reused by every error layer."""
+        self.assertIs(style_template(), style_template())
+
+    def test_style_is_cloned(self):
+        """Each error layer gets its own copy of the renderer and labeling."""
+        first, second = self.create_layer(), self.create_layer()
+        style_error_layer(first, 10)
+        style_error_layer(second, 10)
+        self.assertIsNot(first.renderer(), second.renderer())
+        self.assertIsNot(first.renderer(), style_template().renderer())
+        self.assertTrue(first.labelsEnabled())
+        self.assertFalse(first.hasScaleBasedVisibility())
+
+    def test_large_outputs(self):
+        """Large error lists get the settings of the largest tier."""
+        minimum, options = STYLE_TIERS[-1]
+        self.assertEqual(style_options(minimum), options)
+        self.assertEqual(style_options(0), STYLE_TIERS[0][1])
+        layer = self.create_layer()
+        style_error_layer(layer, minimum)
+        self.assertTrue(layer.hasScaleBasedVisibility())
+        self.assertEqual(layer.minimumScale(), options.min_scale)
+        for rule in layer.labeling().rootRule().children():
+            self.assertTrue(rule.settings().limitNumLabels)
+            self.assertEqual(rule.settings().maxNumLabels, options.max_labels)
+
+
+class RenderOptimizedTest(unittest.TestCase):
+    """Test error lists with stored labels and clustered points."""
+
+    def create_layer(self, errors):
+        writer = MemoryErrorListWriter(render_optimized=True)
+        writer.add_features([
+            error_feature(writer.fields, error, 'facilities_SF') for error in errors])
+        writer.finish()
+        return writer.create_layer()
+
+    def test_label_fields(self):
+        """The label text is written with the error, NULL values included."""
+        fields = error_fields(labels=True)
+        feature = error_feature(fields, ErrorRow(1, '0001', '01_HEALTHCARE', 'remark'), 'facilities_SF')
+        self.assertEqual(feature['error_label'], 'ERROR: 0001')
+        self.assertEqual(feature['recommend_label'], 'RECOMMEND: 01_HEALTHCARE')
+        feature = error_feature(fields, ErrorRow(2, None, '01_HEALTHCARE', 'remark'), 'facilities_SF')
+        self.assertFalse(feature['error_label'])
+        self.assertEqual(error_fields().indexOf(ERROR_LABEL_FIELD), -1)
+
+    def test_labels_read_from_fields(self):
+        """The label rules use the stored fields instead of expressions."""
+        layer = self.create_layer([ErrorRow(1, '0001', '01_HEALTHCARE', 'remark')])
+        style_error_layer(layer)
+        names = [rule.settings().fieldName for rule in layer.labeling().rootRule().children()]
+        self.assertEqual(sorted(names), sorted(LABEL_FIELDS.values()))
+        self.assertEqual(layer.renderer().type(), 'singleSymbol')
+
+    def test_cluster_threshold(self):
+        """Points are clustered from the configured number of errors."""
+        layer = self.create_layer([
+            ErrorRow(fid, '%04d' % fid, '01_HEALTHCARE', 'remark') for fid in range(3)])
+        style_error_layer(layer, cluster_threshold=3)
+        self.assertEqual(layer.renderer().type(), 'pointCluster')
+        self.assertEqual(layer.renderer().embeddedRenderer().type(), 'singleSymbol')
+        style_error_layer(layer, cluster_threshold=4)
+        self.assertEqual(layer.renderer().type(), 'singleSymbol')
+
+
+class FileErrorListWriterTest(unittest.TestCase):
+    """Test error lists saved to a file."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'errors.gpkg')
+
+    def tearDown(self):
+        """Runs after each test."""
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, errors):
+        writer = FileErrorListWriter(self.path, 'GPKG', QgsProject.instance().transformContext())
+        writer.add_features([error_feature(writer.fields, error, 'facilities_SF') for error in errors])
+        writer.finish()
+        return writer
+
+    def test_rewrite(self):
+        """A rerun is written aside and only replaces the file once complete."""
+        layer = self.write([ErrorRow(1, '0001', '01_HEALTHCARE', 'remark')]).create_layer()
+        writer = self.write([ErrorRow(fid, '%04d' % fid, '01_HEALTHCARE', 'remark') for fid in range(3)])
+        self.assertEqual(layer.featureCount(), 1)
+        # The previous error list lets go of the file, as the dialog does
+        source = layer.source()
+        layer.setDataSource('Point?crs=EPSG:4326', layer.name(), 'memory')
+        self.assertEqual(writer.create_layer().featureCount(), 3)
+        self.assertFalse(os.path.exists(writer.partial_path))
+        layer.setDataSource(source, layer.name(), 'ogr')
+        self.assertEqual(layer.featureCount(), 3)
+
+    def test_discard(self):
+        """A canceled run leaves the previous file alone."""
+        self.write([ErrorRow(1, '0001', '01_HEALTHCARE', 'remark')]).create_layer()
+        writer = self.write([])
+        writer.discard()
+        self.assertFalse(os.path.exists(writer.partial_path))
+        self.assertEqual(QgsVectorLayer(self.path, 'errors', 'ogr').featureCount(), 1)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ErrorLayerStyleTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,103 @@
+# coding=utf-8
+"""Processing algorithm test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from qgis.core import QgsProcessingContext, QgsProcessingFeedback, QgsProject, QgsVectorLayer
+
+from utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+from test_check_engine import CRITERIA, ROWS, write_gpkg
+
+# The algorithm uses package-relative imports: load it as QGIS does
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+algorithm_module = importlib.import_module(PACKAGE + '.error_list_checker_algorithm')
+
+
+class RecordingFeedback(QgsProcessingFeedback):
+    """Feedback keeping the messages pushed by the algorithm."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def pushInfo(self, info):
+        self.messages.append(info)
+
+
+class ErrorListCheckAlgorithmTest(unittest.TestCase):
+    """Test the Processing algorithm on a GeoPackage _SF layer."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.layer = write_gpkg(os.path.join(self.temp_dir, 'facilities_SF.gpkg'), ROWS)
+        self.criteria_path = os.path.join(self.temp_dir, 'criteria.json')
+        with open(self.criteria_path, 'w') as criteria_file:
+            json.dump(CRITERIA, criteria_file)
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.layer = None
+        shutil.rmtree(self.temp_dir)
+
+    def run_algorithm(self, output, **parameters):
+        algorithm = algorithm_module.ErrorListCheckAlgorithm().create()
+        context = QgsProcessingContext()
+        context.setProject(QgsProject.instance())
+        feedback = RecordingFeedback()
+        parameters = dict({
+            'INPUT': self.layer.source(),
+            'CRITERIA': self.criteria_path,
+            'OUTPUT': os.path.join(self.temp_dir, output),
+        }, **parameters)
+        results, ok = algorithm.run(parameters, context, feedback)
+        self.assertTrue(ok)
+        return results, feedback.messages
+
+    def test_error_list(self):
+        """The errors are counted and written to the output layer."""
+        results, _ = self.run_algorithm('errors.gpkg')
+        self.assertEqual(results['ERROR_COUNT'], 2)
+        output = QgsVectorLayer(results['OUTPUT'], 'errors', 'ogr')
+        self.assertEqual(
+            sorted((feature['cbms_geoid'], feature['recommended_sector']) for feature in output.getFeatures()),
+            [('0002', '02_EDUCATION AND LITERACY'), ('0004', '01_HEALTHCARE')])
+        self.assertNotIn('FINGERPRINTS', results)
+
+    def test_fingerprints(self):
+        """A second run with the same store reuses the verdicts of unchanged features."""
+        store = os.path.join(self.temp_dir, 'fingerprints.sqlite')
+        results, _ = self.run_algorithm('first.gpkg', FINGERPRINTS=store)
+        self.assertEqual(results['FINGERPRINTS'], store)
+        self.assertTrue(os.path.isfile(store))
+        results, messages = self.run_algorithm('second.gpkg', FINGERPRINTS=store)
+        self.assertEqual(results['ERROR_COUNT'], 2)
+        self.assertEqual(QgsVectorLayer(results['OUTPUT'], 'errors', 'ogr').featureCount(), 2)
+        self.assertIn(f"Unchanged features reusing their previous verdict: {len(ROWS)}", messages)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(ErrorListCheckAlgorithmTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
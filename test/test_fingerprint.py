@@ -0,0 +1,102 @@
+# coding=utf-8
+"""Fingerprint store test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.criteria import CompiledCriteria
+from core.engine import iter_errors
+from core.fingerprint import FingerprintStore
+
+CRITERIA = {'categories': [
+    {'keywords': ['hospital'], 'sector': '01_HEALTHCARE'},
+    {'keywords': ['school'], 'sector': '02_EDUCATION AND LITERACY'},
+]}
+
+RECORDS = [
+    (1, '0001', 'District Hospital', '02_EDUCATION AND LITERACY'),
+    (2, '0002', 'Elementary School', '02_EDUCATION AND LITERACY'),
+    (3, '0003', 'Sari-sari Store', None),
+]
+
+
+class CountingMatch:
+    """Match callable recording the names it was asked about."""
+
+    def __init__(self, criteria):
+        self.criteria = criteria
+        self.names = []
+
+    def __call__(self, name):
+        self.names.append(name)
+        return self.criteria.match(name)
+
+
+class FingerprintStoreTest(unittest.TestCase):
+    """Test verdict reuse across runs."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = FingerprintStore(
+            os.path.join(self.temp_dir, 'cache', 'fingerprints.sqlite'))
+        self.criteria = CompiledCriteria(CRITERIA)
+
+    def tearDown(self):
+        """Runs after each test."""
+        shutil.rmtree(self.temp_dir)
+
+    def run_check(self, records, criteria=None):
+        """Run one session and return (errors, names matched)."""
+        criteria = criteria or self.criteria
+        match = CountingMatch(criteria)
+        session = self.store.session('layer', criteria)
+        errors = list(session.iter_errors(records, match))
+        session.commit()
+        return errors, match.names
+
+    def test_unchanged_features_are_not_matched_again(self):
+        """A second run reuses every verdict and gives the same errors."""
+        first, names = self.run_check(RECORDS)
+        self.assertEqual(len(names), 3)
+        self.assertEqual(first, list(iter_errors(RECORDS, self.criteria.match)))
+        second, names = self.run_check(RECORDS)
+        self.assertEqual(names, [])
+        self.assertEqual(second, first)
+
+    def test_edited_feature_is_matched_again(self):
+        """Only the feature whose sector changed is re-evaluated."""
+        self.run_check(RECORDS)
+        edited = list(RECORDS)
+        edited[0] = (1, '0001', 'District Hospital', '01_HEALTHCARE')
+        errors, names = self.run_check(edited)
+        self.assertEqual(names, ['District Hospital'])
+        self.assertEqual(errors, [])
+
+    def test_new_criteria_invalidate_verdicts(self):
+        """Changing the criteria version matches everything again."""
+        self.run_check(RECORDS)
+        other = CompiledCriteria({'categories': [
+            {'keywords': ['store'], 'sector': '07_FINANCIAL'}]})
+        errors, names = self.run_check(RECORDS, other)
+        self.assertEqual(len(names), 3)
+        self.assertEqual([error.fid for error in errors], [3])
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(FingerprintStoreTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
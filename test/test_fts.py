@@ -0,0 +1,118 @@
+# coding=utf-8
+"""Full-text index test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from core.criteria import CompiledCriteria
+from core.engine import check_gpkg
+from core.fts import FtsIndex, check_gpkg_indexed, fts5_available
+
+from test_engine import ROWS, create_gpkg
+
+CRITERIA = {'categories': [
+    {'keywords': ['hospital', 'health', 'er'], 'sector': '01_HEALTHCARE'},
+    {'keywords': ['school', {'keyword': 'bus', 'match': 'token'}], 'sector': '02_EDUCATION AND LITERACY'},
+    {'keywords': ['niño', 'non'], 'sector': '09_TRANSPORT'},
+]}
+
+
+@unittest.skipUnless(fts5_available(), 'SQLite without FTS5 trigram tokenizer')
+class FtsIndexTest(unittest.TestCase):
+    """Test checks through the full-text index of facility names."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'facilities_SF.gpkg')
+        create_gpkg(self.path, ROWS + [
+            ('0005', None, None),
+            ('0006', 'HOSPITAL DE NIÑO', '02_EDUCATION AND LITERACY'),
+            ('0007', 'School Bus Depot', '01_HEALTHCARE'),
+            ('0008', 'Water Refilling', None),
+        ])
+        self.criteria = CompiledCriteria(CRITERIA)
+
+    def tearDown(self):
+        """Runs after each test."""
+        shutil.rmtree(self.temp_dir)
+
+    def edit(self, sql, parameters=()):
+        connection = sqlite3.connect(self.path)
+        connection.execute(sql, parameters)
+        connection.commit()
+        connection.close()
+
+    def assert_same_as_full_scan(self, inside):
+        self.assertEqual(
+            check_gpkg_indexed(self.path, self.criteria, inside=inside),
+            check_gpkg(self.path, self.criteria))
+
+    def test_sidecar(self):
+        """The sidecar index gives the errors of a full scan, and follows edits."""
+        self.assert_same_as_full_scan(False)
+        self.assertTrue(os.path.isfile(self.path + '.fts'))
+        self.edit("UPDATE facilities_SF SET fac_name = 'Bus Terminal' WHERE cbms_geoid = '0003'")
+        self.edit("DELETE FROM facilities_SF WHERE cbms_geoid = '0002'")
+        self.edit("INSERT INTO facilities_SF (cbms_geoid, fac_name, sector) VALUES ('0009', 'Health Office', NULL)")
+        self.assert_same_as_full_scan(False)
+
+    def test_inside(self):
+        """Triggers keep an index inside the GeoPackage up to date."""
+        self.assert_same_as_full_scan(True)
+        self.edit("UPDATE facilities_SF SET fac_name = 'Bus Terminal' WHERE cbms_geoid = '0003'")
+        self.edit("DELETE FROM facilities_SF WHERE cbms_geoid = '0002'")
+        self.assert_same_as_full_scan(True)
+        self.assertFalse(os.path.exists(self.path + '.fts'))
+
+    def test_multi_word_token_keywords(self):
+        """Whole-word keywords are found however their words are separated."""
+        self.edit("INSERT INTO facilities_SF (cbms_geoid, fac_name, sector) VALUES "
+                  "('g1', 'Barangay Health-Center', NULL), ('g2', 'Health  Center', NULL), "
+                  "('g3', 'Health Center', NULL), ('g4', 'St. Ann Chapel', NULL), ('g5', 'Stannary', NULL)")
+        self.criteria = CompiledCriteria({'categories': [
+            {'keywords': ['health center', 'st ann'], 'sector': '01_HEALTHCARE', 'match': 'token'}]})
+        self.assert_same_as_full_scan(False)
+        self.assertEqual(
+            [error.cbms_geoid for error in check_gpkg_indexed(self.path, self.criteria)],
+            ['g1', 'g2', 'g3', 'g4'])
+
+    def test_short_non_ascii_keywords(self):
+        """Keywords too short for trigrams find names in another case, as a full scan does."""
+        self.edit("INSERT INTO facilities_SF (cbms_geoid, fac_name, sector) VALUES "
+                  "('g1', 'PARAÑAQUE Market', NULL), ('g2', 'İLOILO Port', NULL), ('g3', 'Paranaque', NULL)")
+        self.criteria = CompiledCriteria({'categories': [
+            {'keywords': ['ñ', 'İ'], 'sector': '09_TRANSPORT'}]})
+        self.assert_same_as_full_scan(False)
+        self.assert_same_as_full_scan(True)
+        self.assertEqual(
+            [error.cbms_geoid for error in check_gpkg_indexed(self.path, self.criteria)], ['0006', 'g1', 'g2'])
+
+    def test_sync_is_incremental(self):
+        """An unchanged GeoPackage is not compared again, an edit re-indexes one row."""
+        index = FtsIndex(self.path)
+        self.assertEqual(index.sync(), 8)
+        self.assertEqual(index.sync(), 0)
+        self.edit("UPDATE facilities_SF SET fac_name = 'Bus Terminal' WHERE cbms_geoid = '0003'")
+        # Only the renamed feature is indexed again
+        self.assertEqual(index.sync(), 1)
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(FtsIndexTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,174 @@
+# coding=utf-8
+"""Live validation test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from qgis.core import QgsFeature, QgsGeometry, QgsPointXY, QgsProject, QgsVectorLayer
+
+from utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+# The validator uses package-relative imports: load it as QGIS does
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+live_validation = importlib.import_module(PACKAGE + '.live_validation')
+cache_module = importlib.import_module(PACKAGE + '.core.cache')
+criteria_module = importlib.import_module(PACKAGE + '.core.criteria')
+engine_module = importlib.import_module(PACKAGE + '.core.engine')
+error_layer = importlib.import_module(PACKAGE + '.error_layer')
+
+CRITERIA = {'categories': [
+    {'keywords': ['hospital', 'health'], 'sector': '01_HEALTHCARE'},
+    {'keywords': ['school'], 'sector': '02_EDUCATION AND LITERACY'},
+]}
+
+ROWS = [
+    ('0001', 'Barangay Health Center', '01_HEALTHCARE'),
+    ('0002', 'Elementary School', '01_HEALTHCARE'),
+    ('0003', 'Sari-sari Store', '09_TRANSPORT'),
+]
+
+FAC_NAME = 1
+SECTOR = 2
+
+
+def source_feature(layer, row, x=121.0):
+    feature = QgsFeature(layer.fields())
+    feature.setAttributes(list(row))
+    feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, 14.0)))
+    return feature
+
+
+def create_source(rows):
+    """Return a memory layer holding ``rows`` of the checked fields."""
+    layer = QgsVectorLayer(
+        'Point?crs=EPSG:4326&field=cbms_geoid:string&field=fac_name:string&field=sector:string',
+        'facilities_SF', 'memory')
+    layer.dataProvider().addFeatures([
+        source_feature(layer, row, 121.0 + index * 0.001) for index, row in enumerate(rows)])
+    return layer
+
+
+def error_features(fields, layer, criteria):
+    """Return the error list features of a full check of ``layer``."""
+    features = list(layer.getFeatures())
+    errors = engine_module.check_rows(
+        [(feature['cbms_geoid'], feature['fac_name'], feature['sector']) for feature in features], criteria)
+    return [
+        error_layer.error_feature(
+            fields, error._replace(fid=features[error.fid].id()), layer.name(),
+            features[error.fid].geometry())
+        for error in errors]
+
+
+class LiveValidatorTest(unittest.TestCase):
+    """Test that edits of the source layer are followed in the error list."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.criteria = criteria_module.CompiledCriteria(CRITERIA)
+        self.source = create_source(ROWS)
+        writer = error_layer.MemoryErrorListWriter()
+        writer.add_features(error_features(writer.fields, self.source, self.criteria))
+        self.errors = writer.create_layer()
+        self.validator = live_validation.LiveValidator(
+            self.source, self.errors, self.criteria, cache_module.MatchCache())
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.validator.stop()
+
+    def listed(self):
+        """Return ``{source fid: cbms_geoid}`` of the error list."""
+        return {feature['source_fid']: feature['cbms_geoid'] for feature in self.errors.getFeatures()}
+
+    def test_edit(self):
+        """Fixing or breaking a sector removes or adds its row."""
+        self.assertEqual(self.listed(), {2: '0002'})
+        self.source.startEditing()
+        self.source.changeAttributeValue(2, SECTOR, '02_EDUCATION AND LITERACY')
+        self.source.changeAttributeValue(1, FAC_NAME, 'Elementary School')
+        self.source.changeAttributeValue(3, FAC_NAME, 'District Hospital')
+        self.assertEqual(self.listed(), {1: '0001', 3: '0003'})
+        self.assertEqual(self.validator.rows.keys(), {1, 3})
+        self.source.rollBack()
+
+    def test_add_delete_commit(self):
+        """Added features are listed, and listed again under their fid once committed."""
+        self.source.startEditing()
+        self.source.addFeature(source_feature(self.source, ('0004', 'Health Office', None)))
+        self.source.deleteFeature(2)
+        listed = self.listed()
+        self.assertEqual(list(listed.values()), ['0004'])
+        self.assertLess(list(listed)[0], 0)
+        self.assertTrue(self.source.commitChanges())
+        self.assertEqual(self.listed(), {4: '0004'})
+        self.assertEqual(self.validator.rows.keys(), {4})
+
+    def test_read_only_error_list(self):
+        """An error list that cannot be edited gets no validator."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            writer = error_layer.FileErrorListWriter(
+                os.path.join(temp_dir, 'errors.fgb'), 'FlatGeobuf', QgsProject.instance().transformContext())
+            writer.finish()
+            layer = writer.create_layer()
+            self.assertFalse(live_validation.supports_live_validation(layer))
+            self.assertTrue(live_validation.supports_live_validation(self.errors))
+            with self.assertRaises(ValueError):
+                live_validation.LiveValidator(self.source, layer, self.criteria, cache_module.MatchCache())
+            layer = None
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class UpdateErrorListTest(unittest.TestCase):
+    """Test that a rerun updates the previous error list in place."""
+
+    def test_keyed_update(self):
+        """Only added, resolved and changed errors touch the layer."""
+        criteria = criteria_module.CompiledCriteria(CRITERIA)
+        source = create_source(ROWS)
+        writer = error_layer.MemoryErrorListWriter()
+        writer.add_features(error_features(writer.fields, source, criteria))
+        errors = writer.create_layer()
+        kept = {feature['cbms_geoid']: feature.id() for feature in errors.getFeatures()}
+
+        source.dataProvider().changeAttributeValues({1: {SECTOR: '09_TRANSPORT'}, 2: {SECTOR: '09_TRANSPORT'}})
+        diff = live_validation.update_error_list(errors, error_features(writer.fields, source, criteria))
+        self.assertEqual((len(diff.inserts), len(diff.deletes), len(diff.updates)), (1, 0, 1))
+        remarks = {feature['cbms_geoid']: feature['remark'] for feature in errors.getFeatures()}
+        self.assertEqual(sorted(remarks), ['0001', '0002'])
+        self.assertIn("'09_TRANSPORT'", remarks['0002'])
+        # The row of the changed error is the same feature as before
+        self.assertEqual(
+            {feature['cbms_geoid']: feature.id() for feature in errors.getFeatures()}['0002'], kept['0002'])
+
+        source.dataProvider().changeAttributeValues({1: {SECTOR: '01_HEALTHCARE'}})
+        diff = live_validation.update_error_list(errors, error_features(writer.fields, source, criteria))
+        self.assertEqual(len(diff.deletes), 1)
+        self.assertEqual([feature['cbms_geoid'] for feature in errors.getFeatures()], ['0002'])
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(LiveValidatorTest)
+    suite.addTests(unittest.makeSuite(UpdateErrorListTest))
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
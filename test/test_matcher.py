@@ -0,0 +1,116 @@
+# coding=utf-8
+"""Keyword matcher test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import json
+import os
+import unittest
+
+from core.matcher import KeywordMatcher
+from core.tokens import TokenMatcher, tokenize
+
+
+def naive_match(validation_criteria, value):
+    """Reference implementation: the original nested keyword loop."""
+    for category in validation_criteria['categories']:
+        for keyword in category['keywords']:
+            if keyword.lower() in str(value).lower():
+                return category['sector'], keyword
+    return None
+
+
+class KeywordMatcherTest(unittest.TestCase):
+    """Test the Aho-Corasick keyword matcher."""
+
+    def setUp(self):
+        """Runs before each test."""
+        path = os.path.join(
+            os.path.dirname(__file__), os.pardir, 'validation_criteria.json')
+        with open(path, 'r') as json_file:
+            self.criteria = json.load(json_file)
+        self.matcher = KeywordMatcher.from_criteria(self.criteria)
+
+    def test_first_category_wins(self):
+        """A name hitting several categories gets the first one in file."""
+        match = self.matcher.match('School Clinic')
+        self.assertEqual(match, ('01_HEALTHCARE', 'clinic'))
+
+    def test_first_keyword_in_category_wins(self):
+        """Within a category the first listed keyword is reported."""
+        match = self.matcher.match('Barangay Health Center')
+        self.assertEqual(match, ('01_HEALTHCARE', 'health'))
+
+    def test_case_insensitive(self):
+        """Names are matched case-insensitively."""
+        match = self.matcher.match('CENTRAL ELEMENTARY SCHOOL')
+        self.assertEqual(match, ('02_EDUCATION AND LITERACY', 'school'))
+
+    def test_no_match(self):
+        """Names without any keyword and NULL names give no match."""
+        self.assertIsNone(self.matcher.match('Sari-sari Store'))
+        self.assertIsNone(self.matcher.match(None))
+
+    def test_overlapping_keywords(self):
+        """Keywords that are suffixes of other keywords are still found."""
+        matcher = KeywordMatcher([('she', 'A'), ('he', 'B'), ('hers', 'C')])
+        self.assertEqual(matcher.match('ushers'), ('A', 'she'))
+        self.assertEqual(matcher.match('ahe'), ('B', 'he'))
+
+    def test_same_as_naive_loop(self):
+        """The automaton agrees with the original nested loop."""
+        keywords = [
+            keyword
+            for category in self.criteria['categories']
+            for keyword in category['keywords']]
+        names = ['%s %s' % (first, second)
+                 for first in keywords for second in ('', 'parking', 'Vegas')]
+        names += [first + second for first in keywords[::7]
+                  for second in keywords[::5]]
+        for name in names:
+            self.assertEqual(
+                self.matcher.match(name),
+                naive_match(self.criteria, name), name)
+
+
+class TokenMatcherTest(unittest.TestCase):
+    """Test the whole-word keyword matcher."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.matcher = TokenMatcher([
+            ('park', 0), ('fire station', 1), ('agro-industry', 2), ('bus', 3), ('', 4)])
+
+    def test_whole_words_only(self):
+        """Keywords inside longer words do not match."""
+        self.assertEqual(self.matcher.match_priority('rizal park'), 0)
+        self.assertIsNone(self.matcher.match_priority('parking lot'))
+        self.assertIsNone(self.matcher.match_priority('business hub'))
+
+    def test_phrases(self):
+        """Multi-word keywords match the same words in sequence."""
+        self.assertEqual(self.matcher.match_priority('central fire station'), 1)
+        self.assertIsNone(self.matcher.match_priority('fire and station'))
+        self.assertEqual(self.matcher.match_priority('agro industry coop'), 2)
+        self.assertEqual(tokenize("st. mary's agro-industry"), ['st', 'mary', 's', 'agro', 'industry'])
+
+    def test_best_priority_below_limit(self):
+        self.assertEqual(self.matcher.match_priority('bus park'), 0)
+        self.assertEqual(self.matcher.match_priority('bus stop', 5), 3)
+        self.assertIsNone(self.matcher.match_priority('bus park', 0))
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(KeywordMatcherTest)
+    suite.addTests(unittest.makeSuite(TokenMatcherTest))
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,75 @@
+# coding=utf-8
+"""Run metrics test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.metrics import CRITERIA_LOAD, FEATURES, ITERATION, MATCHING, RunMetrics
+
+
+class RunMetricsTest(unittest.TestCase):
+    """Test the stage timings of a run."""
+
+    def test_stages_add_up(self):
+        metrics = RunMetrics()
+        metrics.add(MATCHING, 1.5)
+        metrics.add(MATCHING, 0.5)
+        with metrics.stage(CRITERIA_LOAD):
+            pass
+        self.assertEqual(metrics.stages[MATCHING], 2.0)
+        self.assertIn(CRITERIA_LOAD, metrics.stages)
+
+    def test_timed(self):
+        """Iterating through timed() yields every item and records the stage."""
+        metrics = RunMetrics()
+        self.assertEqual(list(metrics.timed(range(5), ITERATION)), [0, 1, 2, 3, 4])
+        self.assertIn(ITERATION, metrics.stages)
+
+    def test_rates_and_merge(self):
+        metrics = RunMetrics()
+        other = RunMetrics()
+        other.add(MATCHING, 2.0)
+        other.add(CRITERIA_LOAD, 0.1)
+        other.count(FEATURES, 1000)
+        metrics.merge(other)
+        metrics.merge(other)
+        self.assertEqual(metrics.counts[FEATURES], 2000)
+        self.assertEqual(metrics.rates(), {MATCHING: 500.0})
+        self.assertIn('matching: 4.000 s (500 features/s)', metrics.summary())
+
+    def test_write_jsonl(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'metrics.jsonl')
+            metrics = RunMetrics(layers=['facilities_SF'])
+            metrics.add(ITERATION, 0.25)
+            metrics.count(FEATURES, 100)
+            metrics.write_jsonl(path)
+            metrics.write_jsonl(path)
+            with open(path, encoding='utf-8') as lines:
+                runs = [json.loads(line) for line in lines]
+        finally:
+            shutil.rmtree(temp_dir)
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(runs[0]['info'], {'layers': ['facilities_SF']})
+        self.assertEqual(runs[0]['stages'][ITERATION], {'seconds': 0.25, 'features_per_second': 400.0})
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(RunMetricsTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -14,8 +14,10 @@ __copyright__ = 'Copyright 2024, PSA'
 
 import unittest
 
+from qgis.PyQt.QtCore import QSize
 from qgis.PyQt.QtGui import QIcon
 
+from plugin_icon import ICON_SIZES, plugin_icon
 
 
 class ErrorListCheckerDialogTest(unittest.TestCase):
@@ -30,10 +32,16 @@ class ErrorListCheckerDialogTest(unittest.TestCase):
         pass
 
     def test_icon_png(self):
-        """Test we can click OK."""
-        path = ':/plugins/ErrorListChecker/icon.png'
-        icon = QIcon(path)
-        self.assertFalse(icon.isNull())
+        """Test the compiled resources hold every icon size."""
+        import resources  # noqa: F401, registers the resources
+        for size in ICON_SIZES:
+            icon = QIcon(f':/plugins/error_list_checker/icons/icon_{size}.png')
+            self.assertFalse(icon.isNull())
+
+    def test_plugin_icon(self):
+        """Test the plugin icon has a pixmap file for each size."""
+        icon = plugin_icon()
+        self.assertEqual(icon.availableSizes(), [QSize(size, size) for size in ICON_SIZES])
 
 if __name__ == "__main__":
     suite = unittest.makeSuite(ErrorListCheckerResourcesTest)
@@ -0,0 +1,106 @@
+# coding=utf-8
+"""Plugin startup test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = 'test@gmail.com'
+__date__ = '2024-10-21'
+__copyright__ = 'Copyright 2024, PSA'
+
+import importlib
+import os
+import sys
+import time
+import unittest
+
+from qgis.PyQt.QtWidgets import QMainWindow
+
+from utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = os.path.basename(PLUGIN_DIR)
+
+# Modules only needed once the user opens the dialog or runs a check
+DEFERRED_MODULES = [
+    'error_list_checker_dialog',
+    'error_check_task',
+    'check_engine',
+    'live_validation',
+    'error_layer',
+    'core.engine',
+    'core.parallel',
+    'core.fingerprint',
+    'core.fts',
+]
+
+# Wall time allowed for classFactory() and initGui(), imports included
+STARTUP_BUDGET = 0.5
+
+
+class StartupInterface:
+    """The part of QgisInterface used while the plugin loads."""
+
+    def __init__(self):
+        self.main_window = QMainWindow()
+
+    def mainWindow(self):
+        return self.main_window
+
+    def addToolBar(self, name):
+        return self.main_window.addToolBar(name)
+
+    def addPluginToMenu(self, menu, action):
+        pass
+
+    def removePluginMenu(self, menu, action):
+        pass
+
+
+class StartupTest(unittest.TestCase):
+    """Test that loading the plugin stays cheap."""
+
+    def setUp(self):
+        """Runs before each test."""
+        # Import the plugin afresh, as QGIS does at startup
+        for name in list(sys.modules):
+            if name == PACKAGE or name.startswith(PACKAGE + '.'):
+                del sys.modules[name]
+        sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+        self.iface = StartupInterface()
+        start = time.perf_counter()
+        self.plugin = importlib.import_module(PACKAGE).classFactory(self.iface)
+        self.plugin.initGui()
+        self.elapsed = time.perf_counter() - start
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.plugin.unload()
+        sys.path.remove(os.path.dirname(PLUGIN_DIR))
+
+    def test_load_is_lazy(self):
+        """Only the toolbar action and the Processing provider are set up."""
+        self.assertIsNone(self.plugin.dialog)
+        loaded = [name for name in DEFERRED_MODULES if PACKAGE + '.' + name in sys.modules]
+        self.assertEqual(loaded, [])
+        self.assertLess(self.elapsed, STARTUP_BUDGET)
+
+    def test_dialog_on_first_use(self):
+        """The dialog is built when the action is first triggered."""
+        self.plugin.run()
+        dialog = self.plugin.dialog
+        self.assertIsNotNone(dialog)
+        self.plugin.run()
+        self.assertIs(self.plugin.dialog, dialog)
+        dialog.close()
+
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(StartupTest)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)